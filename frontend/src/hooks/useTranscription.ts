@@ -17,6 +17,8 @@ export function useTranscription() {
 	const [whisperTranscript, setWhisperTranscript] = useState<string[]>([]);
 	const [speakers, setSpeakers] = useState<unknown[]>([]);
 	const [combinedTranscript, setCombinedTranscript] = useState<string>("");
+	// Seconds the server asked us to wait before retrying a recording it rejected under load
+	const [retryAfter, setRetryAfter] = useState<number | null>(null);
 
 	useEffect(() => {
 		const socket = initSocket();
@@ -32,6 +34,7 @@ export function useTranscription() {
 
 
 		socket.on("transcription", (data: { transcription: string; speakers?: unknown[] }) => {
+			setRetryAfter(null);
 			setWhisperTranscript((prev) => [...prev, data.transcription]);
 			if (data.speakers) {
 				setSpeakers(data.speakers);
@@ -43,8 +46,29 @@ export function useTranscription() {
 			setCombinedTranscript(data.transcript);
 		});
 
-		socket.on("speakers", (data: unknown[]) => {
-			setSpeakers(data);
+		socket.on("speakers", (data: unknown[] | { segments: unknown[]; append: boolean }) => {
+			if (Array.isArray(data)) {
+				setSpeakers(data);
+			} else {
+				// Streaming diarization sends only the newly processed window
+				setSpeakers((prev) => [...prev, ...data.segments]);
+			}
+		});
+
+		socket.on("processing_rejected", (data: { message: string; retry_after: number }) => {
+			// The server keeps the recording; stop_recording retries it
+			setError(`${data.message} You can retry in about ${data.retry_after}s.`);
+			setRetryAfter(data.retry_after);
+		});
+
+		socket.on("backpressure", (data: { state: "ok" | "throttle" | "stop"; reason: string | null; recorded_seconds: number }) => {
+			if (data.state === "stop") {
+				setError(`The server has stopped accepting audio (${data.reason}) after ${data.recorded_seconds}s.`);
+			} else if (data.state === "throttle") {
+				console.warn(`Server is near its audio limit (${data.reason}).`);
+			} else {
+				setError(null);
+			}
 		});
 
 		socket.on("error", (err: unknown) => {
@@ -74,6 +98,7 @@ export function useTranscription() {
 				setWhisperTranscript([]);
 				setSpeakers([]);
 				setCombinedTranscript("");
+				setRetryAfter(null);
 				setIsRecording(true);
 
 				try {
@@ -88,16 +113,29 @@ export function useTranscription() {
 		[isRecording]
 	);
 
-	const stopRecording = useCallback(() => {
+	const stopRecording = useCallback(async () => {
 		if (isRecording) {
 			setIsRecording(false);
-			stopAudioCapture();
+			// The last partial frame is sent before the server finalizes the recording
+			await stopAudioCapture();
 			const socket = getSocket();
 			socket.emit('stop_recording');
 
 		}
 	}, [isRecording, whisperTranscript]);
 
+	const retryProcessing = useCallback(() => {
+		setError(null);
+		setRetryAfter(null);
+		const socket = getSocket();
+		socket.emit("stop_recording");
+	}, []);
+
+	const rediarize = useCallback((diarizationConfig: DiarizationConfig) => {
+		const socket = getSocket();
+		socket.emit("rediarize", diarizationConfig);
+	}, []);
+
 	const combineTranscript = (transcript:string) => {
 		const socket = getSocket();
 		socket.emit("combine_transcripts", {
@@ -114,8 +152,11 @@ export function useTranscription() {
 		whisperTranscript,
 		speakers,
 		combinedTranscript,
+		retryAfter,
 		startRecording,
 		stopRecording,
-		combineTranscript
+		combineTranscript,
+		retryProcessing,
+		rediarize
 	};
 }
\ No newline at end of file
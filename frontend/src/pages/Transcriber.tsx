@@ -13,6 +13,7 @@ import WhisperTranscript from "../components/recording/WhisperTranscript";
 import SpeakerList from "../components/recording/SpeakerList";
 import DiarizationConfig from "../components/recording/DiarizationConfig";
 import { Panel } from "primereact/panel";
+import { Button } from "primereact/button";
 
 interface DiarizationConfigType {
 	num_speakers: number;
@@ -29,7 +30,7 @@ interface SpeakerSegment {
 
 const Transcriber: React.FC = () => {
 	// Our custom hook for server-based transcription
-	const { isRecording, isConnected, error, whisperTranscript, speakers: unknownSpeakers, startRecording, stopRecording, combinedTranscript, combineTranscript } = useTranscription();
+	const { isRecording, isConnected, error, whisperTranscript, speakers: unknownSpeakers, startRecording, stopRecording, combinedTranscript, combineTranscript, rediarize, retryAfter, retryProcessing } = useTranscription();
 	const speakers: SpeakerSegment[] = unknownSpeakers as SpeakerSegment[];
 
 	// Local config for diarization
@@ -101,6 +102,12 @@ const Transcriber: React.FC = () => {
 									config={diarizationConfig}
 									onChange={setDiarizationConfig}
 								/>
+								<Button
+									label="Re-run Diarization"
+									className="mt-2"
+									disabled={isRecording || whisperTranscript.length === 0}
+									onClick={() => rediarize(diarizationConfig)}
+								/>
 							</div>
 
 							{/* Connection Status / Errors */}
@@ -114,6 +121,11 @@ const Transcriber: React.FC = () => {
 									<p className="text-danger m-0">{error}</p>
 								</div>
 							)}
+							{retryAfter !== null && !isRecording && (
+								<div className="flex justify-content-center mb-3">
+									<Button label="Retry processing" onClick={retryProcessing} />
+								</div>
+							)}
 
 							<Divider />
 
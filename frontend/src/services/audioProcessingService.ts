@@ -5,11 +5,18 @@ let audioContext: AudioContext | null = null;
 let audioWorkletNode: AudioWorkletNode | null = null;
 let mediaStream: MediaStream | null = null;
 
-let audioBufferRef: Float32Array[] = [];
-let bufferLengthRef = 0;
+// Framed audio protocol (see voice-backend/app/services/wire_protocol.py)
+const PROTOCOL_VERSION = 1;
+const TARGET_SAMPLE_RATE = 16000;
+const FRAME_DURATION_MS = 250;
+const HEADER_BYTES = 16;
+const CODEC_IDS = { pcm16: 0, mulaw: 1 } as const;
+type Codec = keyof typeof CODEC_IDS;
+const CODEC: Codec = (import.meta.env.VITE_AUDIO_CODEC as Codec) || "mulaw";
 
-const BUFFER_DURATION = 1;
-let sampleRate = 44100;
+let seq = 0;
+let sampleOffset = 0;
+let startTime = 0;
 
 interface DiarizationConfig {
     num_speakers: number;
@@ -17,60 +24,166 @@ interface DiarizationConfig {
     offset: number;
 }
 
-export const startAudioCapture = async (diarizationConfig: DiarizationConfig) => {
-    mediaStream = await navigator.mediaDevices.getUserMedia({ audio: true });
-    audioContext = new (window.AudioContext || (window as unknown as { webkitAudioContext: typeof AudioContext }).webkitAudioContext)();
-    sampleRate = audioContext.sampleRate;
+interface AudioStartAck {
+    accepted: boolean;
+    error?: string;
+}
 
-    // Send config to server
-    getSocket().emit("diarization_config", diarizationConfig);
+// Collects fixed-size frames, encodes them and hands the payload to the main thread
+const workletCode = `
+    function encodePcm16(samples) {
+        const out = new Int16Array(samples.length);
+        for (let i = 0; i < samples.length; i++) {
+            const s = Math.max(-1, Math.min(1, samples[i]));
+            out[i] = s < 0 ? s * 0x8000 : s * 0x7fff;
+        }
+        return new Uint8Array(out.buffer);
+    }
+
+    // G.711 mu-law: 8 bits per sample, decoded on the server with a lookup table
+    function encodeMulaw(samples) {
+        const out = new Uint8Array(samples.length);
+        for (let i = 0; i < samples.length; i++) {
+            const s = Math.max(-1, Math.min(1, samples[i]));
+            let sample = s < 0 ? Math.round(s * 0x8000) : Math.round(s * 0x7fff);
+            const sign = sample < 0 ? 0x80 : 0;
+            if (sign) sample = -sample;
+            sample = Math.min(sample, 32635) + 0x84;
+            let exponent = 7;
+            for (let mask = 0x4000; (sample & mask) === 0 && exponent > 0; mask >>= 1) exponent--;
+            const mantissa = (sample >> (exponent + 3)) & 0x0f;
+            out[i] = ~(sign | (exponent << 4) | mantissa) & 0xff;
+        }
+        return out;
+    }
 
-    // Create a minimal audio worklet
-    const workletCode = `
     class AudioSenderProcessor extends AudioWorkletProcessor {
-        process(inputs, outputs, parameters) {
+        constructor(options) {
+            super();
+            this.codec = options.processorOptions.codec;
+            this.frame = new Float32Array(options.processorOptions.frameSamples);
+            this.filled = 0;
+            this.port.onmessage = (event) => {
+                if (event.data === "flush") {
+                    this.emit();
+                    this.port.postMessage({ flushed: true });
+                }
+            };
+        }
+
+        emit() {
+            if (this.filled === 0) return;
+            const samples = this.frame.subarray(0, this.filled);
+            const payload = this.codec === "mulaw" ? encodeMulaw(samples) : encodePcm16(samples);
+            this.port.postMessage({ payload: payload.buffer, samples: this.filled }, [payload.buffer]);
+            this.filled = 0;
+        }
+
+        process(inputs) {
             const input = inputs[0];
             if (input.length > 0) {
                 const channelData = input[0];
-                this.port.postMessage(channelData);
+                let read = 0;
+                while (read < channelData.length) {
+                    const count = Math.min(channelData.length - read, this.frame.length - this.filled);
+                    this.frame.set(channelData.subarray(read, read + count), this.filled);
+                    this.filled += count;
+                    read += count;
+                    if (this.filled === this.frame.length) this.emit();
+                }
             }
             return true;
         }
     }
     registerProcessor('audio-sender-processor', AudioSenderProcessor);
-  `;
+`;
+
+function createAudioContext(sampleRate?: number): AudioContext {
+    const AudioContextClass = window.AudioContext || (window as unknown as { webkitAudioContext: typeof AudioContext }).webkitAudioContext;
+    return sampleRate ? new AudioContextClass({ sampleRate }) : new AudioContextClass();
+}
+
+function sendFrame(payload: ArrayBuffer, samples: number) {
+    const frame = new Uint8Array(HEADER_BYTES + payload.byteLength);
+    const header = new DataView(frame.buffer);
+    header.setUint8(0, PROTOCOL_VERSION);
+    header.setUint8(1, CODEC_IDS[CODEC]);
+    header.setUint16(2, 0, true);
+    header.setUint32(4, seq, true);
+    header.setUint32(8, sampleOffset, true);
+    header.setUint32(12, Math.round(performance.now() - startTime), true);
+    frame.set(new Uint8Array(payload), HEADER_BYTES);
+    getSocket().emit("audio_frame", frame.buffer);
+    seq += 1;
+    sampleOffset += samples;
+}
+
+export const startAudioCapture = async (diarizationConfig: DiarizationConfig) => {
+    mediaStream = await navigator.mediaDevices.getUserMedia({ audio: true });
+
+    // Let the browser resample the microphone to 16 kHz; some browsers cannot
+    // connect a stream to a context at a different rate, so fall back to native.
+    let source: MediaStreamAudioSourceNode;
+    try {
+        audioContext = createAudioContext(TARGET_SAMPLE_RATE);
+        source = audioContext.createMediaStreamSource(mediaStream);
+    } catch (err) {
+        console.warn("16 kHz capture unavailable, sending at the native rate:", err);
+        if (audioContext) audioContext.close();
+        audioContext = createAudioContext();
+        source = audioContext.createMediaStreamSource(mediaStream);
+    }
+    const sampleRate = audioContext.sampleRate;
+
+    // Send config to server
+    const socket = getSocket();
+    socket.emit("diarization_config", diarizationConfig);
+
+    // Negotiate the stream format once instead of repeating it in every chunk
+    const ack = await new Promise<AudioStartAck>((resolve) => {
+        socket.emit("audio_start", { version: PROTOCOL_VERSION, codec: CODEC, sample_rate: sampleRate, channels: 1 }, resolve);
+    });
+    if (!ack.accepted) {
+        throw new Error(ack.error || "The server rejected the audio format.");
+    }
+    seq = 0;
+    sampleOffset = 0;
+    startTime = performance.now();
 
     const blob = new Blob([workletCode], { type: "application/javascript" });
     const blobURL = URL.createObjectURL(blob);
 
     await audioContext.audioWorklet.addModule(blobURL);
-    audioWorkletNode = new AudioWorkletNode(audioContext, "audio-sender-processor");
-
-    audioWorkletNode.port.onmessage = (event: MessageEvent<Float32Array>) => {
-        const channelData = event.data;
-        audioBufferRef.push(new Float32Array(channelData));
-        bufferLengthRef += channelData.length;
-
-        const currentBufferDuration = bufferLengthRef / sampleRate;
-        if (currentBufferDuration >= BUFFER_DURATION) {
-            // Flatten
-            const concatBuffer = flattenFloat32Array(audioBufferRef);
-            audioBufferRef = [];
-            bufferLengthRef = 0;
-            // Convert to Int16
-            const int16Buffer = convertFloat32ToInt16(concatBuffer);
-            // Emit through socket
-            getSocket().emit("audio_data", sampleRate, int16Buffer.buffer);
+    audioWorkletNode = new AudioWorkletNode(audioContext, "audio-sender-processor", {
+        processorOptions: { codec: CODEC, frameSamples: Math.round((sampleRate * FRAME_DURATION_MS) / 1000) },
+    });
+
+    audioWorkletNode.port.onmessage = (event: MessageEvent<{ payload?: ArrayBuffer; samples?: number }>) => {
+        if (event.data.payload && event.data.samples) {
+            sendFrame(event.data.payload, event.data.samples);
         }
     };
 
-    const source = audioContext.createMediaStreamSource(mediaStream);
     source.connect(audioWorkletNode);
     audioWorkletNode.connect(audioContext.destination);
 };
 
-export const stopAudioCapture = () => {
+// Send the partially filled last frame before tearing down
+const flushWorklet = (node: AudioWorkletNode) =>
+    new Promise<void>((resolve) => {
+        const timeout = setTimeout(resolve, 200);
+        node.port.addEventListener("message", (event: MessageEvent<{ flushed?: boolean }>) => {
+            if (event.data.flushed) {
+                clearTimeout(timeout);
+                resolve();
+            }
+        });
+        node.port.postMessage("flush");
+    });
+
+export const stopAudioCapture = async () => {
     if (audioWorkletNode) {
+        await flushWorklet(audioWorkletNode);
         audioWorkletNode.port.close();
         audioWorkletNode.disconnect();
         audioWorkletNode = null;
@@ -83,31 +196,4 @@ export const stopAudioCapture = () => {
         mediaStream.getTracks().forEach((track) => track.stop());
         mediaStream = null;
     }
-    audioBufferRef = [];
-    bufferLengthRef = 0;
 };
-
-// ---- Utils
-function flattenFloat32Array(bufferArray: Float32Array[]): Float32Array {
-    let totalLength = 0;
-    bufferArray.forEach((buf) => {
-        totalLength += buf.length;
-    });
-    const result = new Float32Array(totalLength);
-    let offset = 0;
-    bufferArray.forEach((buf) => {
-        result.set(buf, offset);
-        offset += buf.length;
-    });
-    return result;
-}
-
-function convertFloat32ToInt16(buffer: Float32Array): Int16Array {
-    const l = buffer.length;
-    const out = new Int16Array(l);
-    for (let i = 0; i < l; i++) {
-        const s = Math.max(-1, Math.min(1, buffer[i]));
-        out[i] = s < 0 ? s * 0x8000 : s * 0x7fff;
-    }
-    return out;
-}
@@ -7,7 +7,7 @@ class Config:
     PYANNOTE_TOKEN = os.getenv("PYANNOTE_TOKEN")
     BUFFER_FLUSH_INTERVAL = int(os.getenv("BUFFER_FLUSH_INTERVAL", 10))
     LOG_LEVEL=os.getenv("LOG_LEVEL")
-    LANGUAGE=os.getenv("LANGUAGE")
+    LANGUAGE=os.getenv("LANGUAGE", "en")
     WHISPER_MODELS = os.getenv("WHISPER_MODELS", "base,medium,large-v2").split(",")
     WHISPER_MODEL_PRIORITIES = {
         "tiny": 1,
@@ -17,5 +17,96 @@ class Config:
         "large": 5,
         "large-v2": 6
     }
-    OVERLAP_DURATION=os.getenv("OVERLAP_DURATION")
+    # "cascade" escalates low-confidence segments to larger models, "ensemble" runs every model
+    WHISPER_SELECTION_MODE = os.getenv("WHISPER_SELECTION_MODE", "cascade")
+    # Recordings longer than LONG_AUDIO_CHUNK_SECONDS are cut at the quietest point within
+    # LONG_AUDIO_SEARCH_SECONDS of each boundary and overlapped. LONG_AUDIO_WORKERS chunks run at a time
+    # across the whisper worker processes (INFERENCE_MODE=process), through WHISPER_BATCHED_INFERENCE or on
+    # thread-safe engines (faster-whisper); a single torch model instance runs them in turn
+    LONG_AUDIO_CHUNK_SECONDS = float(os.getenv("LONG_AUDIO_CHUNK_SECONDS", 600))
+    LONG_AUDIO_SEARCH_SECONDS = float(os.getenv("LONG_AUDIO_SEARCH_SECONDS", 15))
+    LONG_AUDIO_OVERLAP_SECONDS = float(os.getenv("LONG_AUDIO_OVERLAP_SECONDS", 1))
+    LONG_AUDIO_WORKERS = int(os.getenv("LONG_AUDIO_WORKERS", 2))
+    CASCADE_LOGPROB_THRESHOLD = float(os.getenv("CASCADE_LOGPROB_THRESHOLD", -1.0))
+    CASCADE_NO_SPEECH_THRESHOLD = float(os.getenv("CASCADE_NO_SPEECH_THRESHOLD", 0.6))
+    CASCADE_COMPRESSION_RATIO_THRESHOLD = float(os.getenv("CASCADE_COMPRESSION_RATIO_THRESHOLD", 2.4))
+    # Transcript combiner: "llm" merges aligned windows with FLAN-T5, "align" merges the word alignment directly
+    COMBINER_MODE = os.getenv("COMBINER_MODE", "llm")
+    COMBINER_WINDOW_WORDS = int(os.getenv("COMBINER_WINDOW_WORDS", 150))
+    COMBINER_BATCH_SIZE = int(os.getenv("COMBINER_BATCH_SIZE", 8))
+    COMBINER_NUM_BEAMS = int(os.getenv("COMBINER_NUM_BEAMS", 3))
+    # Session audio: newest SESSION_MEMORY_SECONDS in memory per session, older audio spilled to disk
+    SESSION_MEMORY_SECONDS = float(os.getenv("SESSION_MEMORY_SECONDS", 60))
+    SESSION_STORE_MEMORY_MB = float(os.getenv("SESSION_STORE_MEMORY_MB", 256))
+    SESSION_STORE_DISK_MB = float(os.getenv("SESSION_STORE_DISK_MB", 8192))
+    SESSION_MAX_SECONDS = float(os.getenv("SESSION_MAX_SECONDS", 4 * 3600))
+    SESSION_SPILL_DIR = os.getenv("SESSION_SPILL_DIR", "./cache/sessions")
+    # Batch transcription jobs (POST /jobs): sqlite queue, uploaded files and worker threads
+    JOBS_DB = os.getenv("JOBS_DB", "./cache/jobs.sqlite")
+    JOBS_DIR = os.getenv("JOBS_DIR", "./cache/jobs")
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", 1))
+    JOBS_MAX_UPLOAD_MB = float(os.getenv("JOBS_MAX_UPLOAD_MB", 1024))
+    JOBS_KEEP_UPLOADS = os.getenv("JOBS_KEEP_UPLOADS", "false").lower() == "true"
+    # Content-addressed cache of Whisper, diarization and combiner results (empty dir = memory only)
+    RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+    RESULT_CACHE_MEMORY_MB = float(os.getenv("RESULT_CACHE_MEMORY_MB", 256))
+    RESULT_CACHE_DIR = os.getenv("RESULT_CACHE_DIR", "./cache/results")
+    RESULT_CACHE_DISK_MB = float(os.getenv("RESULT_CACHE_DISK_MB", 2048))
+    # Inference engine per model: "torch" (fp16 on CUDA, fp32 on CPU), "int8" (CPU dynamic
+    # quantization of Linear layers) or "faster-whisper" (Whisper only, optional package).
+    # INFERENCE_ENGINES overrides the default per model, e.g. "base=int8,medium=faster-whisper,combiner=int8"
+    INFERENCE_ENGINE = os.getenv("INFERENCE_ENGINE", "torch")
+    INFERENCE_ENGINES = dict(
+        pair.split("=", 1) for pair in os.getenv("INFERENCE_ENGINES", "").split(",") if "=" in pair
+    )
+    FASTER_WHISPER_COMPUTE_TYPE = os.getenv("FASTER_WHISPER_COMPUTE_TYPE", "int8")
+    # Torch intra-op threads per inference (0 = one per core). With several concurrent
+    # sessions, cores / MAX_THREADS_FOR_PROCESSING avoids oversubscription.
+    TORCH_NUM_THREADS = int(os.getenv("TORCH_NUM_THREADS", 0))
+    # "thread" runs inference in the server process; "process" moves every model into a pool of
+    # worker processes and leaves the server to Socket.IO and HTTP I/O. WORKERS_PER_MODEL sets
+    # the processes per model family, e.g. "whisper=2,pyannote=1,combiner=1" (unlisted = 1)
+    INFERENCE_MODE = os.getenv("INFERENCE_MODE", "thread")
+    WORKERS_PER_MODEL = {
+        name: int(count) for name, count in
+        (pair.split("=", 1) for pair in os.getenv("WORKERS_PER_MODEL", "").split(",") if "=" in pair)
+    }
+    # Batch 30 s decode windows across sessions through the InferenceScheduler. Log-mel features
+    # are computed once per audio buffer and shared by every model; FEATURE_CACHE_SIZE buffers are kept.
+    # Batching covers calls without word timestamps (partials, the minimal tier); the rest decode per call.
+    FEATURE_CACHE_SIZE = int(os.getenv("FEATURE_CACHE_SIZE", 4))
+    WHISPER_BATCHED_INFERENCE = os.getenv("WHISPER_BATCHED_INFERENCE", "false").lower() == "true"
+    INFERENCE_MAX_BATCH_SIZE = int(os.getenv("INFERENCE_MAX_BATCH_SIZE", 8))
+    INFERENCE_MAX_WAIT_MS = int(os.getenv("INFERENCE_MAX_WAIT_MS", 50))
+    # Audio longer than one window is decoded in windows overlapping by this much, split at the middle of each overlap
+    BATCHED_WINDOW_OVERLAP_SECONDS = float(os.getenv("BATCHED_WINDOW_OVERLAP_SECONDS", 5))
+    # Default for the per-session streaming denoiser; sessions can toggle it with processing_config
+    NOISE_REDUCTION = os.getenv("NOISE_REDUCTION", "true").lower() == "true"
+    # Skip silence before Whisper and pyannote with the energy/zero-crossing VAD
+    VAD_ENABLED = os.getenv("VAD_ENABLED", "true").lower() == "true"
+    # RAM/VRAM budget for resident models; idle ones are evicted least recently used first (0 = unlimited)
+    MODEL_MEMORY_BUDGET_MB = float(os.getenv("MODEL_MEMORY_BUDGET_MB", 0))
+    # Models loaded in the background at startup and required by /readyz, e.g. "whisper:base,pyannote".
+    # Empty means the streaming Whisper model and pyannote.
+    MODEL_PRELOAD = [name for name in os.getenv("MODEL_PRELOAD", "").split(",") if name]
+    # Admission control of post-recording processing: jobs are degraded to cheaper models (and
+    # optional stages skipped) when their projected latency would exceed LATENCY_SLO_SECONDS, and
+    # rejected with a retry-after hint when the wait alone would exceed ADMISSION_MAX_WAIT_SECONDS.
+    # ADMISSION_INITIAL_RTF is the assumed processing seconds per audio second of the largest model
+    # until real jobs have been measured.
+    ADMISSION_CONTROL = os.getenv("ADMISSION_CONTROL", "true").lower() == "true"
+    LATENCY_SLO_SECONDS = float(os.getenv("LATENCY_SLO_SECONDS", 30))
+    ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", 300))
+    ADMISSION_INITIAL_RTF = float(os.getenv("ADMISSION_INITIAL_RTF", 0.5))
+    # Per-session spans of every pipeline stage at /traces/{sid}, for the most recent sessions
+    TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+    TRACE_MAX_SESSIONS = int(os.getenv("TRACE_MAX_SESSIONS", 100))
+    # Recordings whose segmentation/embeddings are kept for fast re-diarization
+    DIARIZATION_CACHE_SIZE = int(os.getenv("DIARIZATION_CACHE_SIZE", 8))
+    OVERLAP_DURATION = int(os.getenv("OVERLAP_DURATION", 2))
+    STREAMING_TRANSCRIPTION = os.getenv("STREAMING_TRANSCRIPTION", "true").lower() == "true"
+    # Diarize each flush window and keep speaker labels stable with a per-session registry
+    STREAMING_DIARIZATION = os.getenv("STREAMING_DIARIZATION", "true").lower() == "true"
+    # Model used for the periodic partial transcripts; defaults to the cheapest loaded model
+    STREAMING_WHISPER_MODEL = os.getenv("STREAMING_WHISPER_MODEL")
     
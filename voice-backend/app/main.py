@@ -1,20 +1,11 @@
 # app/main.py
 
-import os
-import asyncio
 import socketio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
-from app.routes.socket_events import router, sio
 from app.utils.logger import setup_logger
 
-# Initialize logger
-logger = setup_logger()
-
-# Initialize FastAPI
-app = FastAPI()
-
 # Configure CORS
 origins = [
     "*",
@@ -23,19 +14,36 @@ origins = [
     "http://10.0.0.10:3000", 
 ]
 
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Initialize Socket.IO server
-app.mount("/socket.io", socketio.ASGIApp(sio))
-
-# Include routes
-app.include_router(router)
+def create_app() -> FastAPI:
+    """
+    Build the application: services, models and routes. Run by uvicorn as a factory
+    in the server process only. Spawned inference workers re-import this module as
+    __mp_main__ under `python -m app.main`, so importing it must not set anything up.
+    """
+    from app.routes.socket_events import router, sio
+    from app.routes.jobs import router as jobs_router
+
+    # Initialize logger
+    setup_logger()
+
+    # Initialize FastAPI
+    app = FastAPI()
+
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=origins,
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+
+    # Initialize Socket.IO server
+    app.mount("/socket.io", socketio.ASGIApp(sio))
+
+    # Include routes
+    app.include_router(router)
+    app.include_router(jobs_router)
+    return app
 
 if __name__ == "__main__":
-    uvicorn.run("app.main:app", host="0.0.0.0", port=5000)
+    uvicorn.run("app.main:create_app", factory=True, host="0.0.0.0", port=5000)
@@ -1,53 +1,227 @@
 # models/diarization_pipeline.py
 
 from pyannote.audio import Pipeline
+from pyannote.audio.core.io import Audio
+from pyannote.audio.utils.signal import binarize
+from pyannote.core import Annotation, SlidingWindowFeature
+from collections import OrderedDict
+import copy
 import logging
 import os
+import threading
+import numpy as np
 import torch
 from app.config import Config
+from app.models.model_registry import ModelRegistry
+from app.utils.hashing import fingerprint_audio
+from app.utils.metrics import DIARIZATION_SECONDS
 
 logger = logging.getLogger(__name__)
 
+class DiarizationFeatures:
+    """Segmentation and speaker-embedding outputs for one audio buffer."""
+
+    def __init__(self, segmentations, binarized_segmentations, count):
+        self.segmentations = segmentations
+        self.binarized_segmentations = binarized_segmentations
+        self.count = count
+        self.embeddings = None  # extracted on first use; not needed for single-speaker runs
+
 class DiarizationPipeline:
-    def __init__(self, device: str):
-        hf_token = Config.PYANNOTE_TOKEN
-        if not hf_token:
+    REGISTRY_KEY = "pyannote"
+
+    def __init__(self, device: str, registry: ModelRegistry, cache_size: int = Config.DIARIZATION_CACHE_SIZE):
+        if not Config.PYANNOTE_TOKEN:
             logger.error("Hugging Face token not found. Please set PYANNOTE_TOKEN environment variable.")
             raise ValueError("Hugging Face token not found. Please set PYANNOTE_TOKEN environment variable.")
+        self.device = device
+        self.registry = registry
+        self.registry.register(self.REGISTRY_KEY, loader=self.load_pipeline, warm_up=self.warm_up, size_hint_mb=100)
+        self._default_config = None
+        self.cache_size = cache_size
+        self.features = OrderedDict()
+        self.features_lock = threading.Lock()
+
+    def load_pipeline(self):
         try:
             logger.info("Loading pyannote pipeline...")
-            self.pipeline = Pipeline.from_pretrained(
+            pipeline = Pipeline.from_pretrained(
                 "pyannote/speaker-diarization-3.1",
-                use_auth_token=hf_token
+                use_auth_token=Config.PYANNOTE_TOKEN
             )
-            self.default_config = self.pipeline.parameters(instantiated=True)
-            self.pipeline.to(torch.device(device))
+            self._default_config = pipeline.parameters(instantiated=True)
+            pipeline.to(torch.device(self.device))
             logger.info("Pyannote pipeline loaded.")
+            return pipeline
         except Exception as e:
             logger.error(f"Failed to load pyannote pipeline: {e}")
             raise e
 
-    def diarize(self, wav_path: str, config: dict):
-        logger.info(f"Performing speaker diarization on {wav_path}.")
-        
-        pipeline_config = dict(self.default_config)
-        
-        # Update only the parameters we want to change
-        if "min_duration_off" in config:
-            pipeline_config["segmentation"]["min_duration_off"] = config["min_duration_off"]
-            
+    def warm_up(self, pipeline):
+        # Segmentation of a few seconds of silence; embeddings are skipped since nobody speaks
+        file = Audio.validate_file({"waveform": torch.zeros(1, 5 * 16000), "sample_rate": 16000})
+        pipeline.get_segmentations(file)
+
+    @property
+    def default_config(self) -> dict:
+        if self._default_config is None:
+            self.registry.get(self.REGISTRY_KEY)
+        return self._default_config
+
+    def diarize(self, audio: np.ndarray, config: dict, sample_rate: int = 16000, return_embeddings: bool = False,
+                cache: bool = True):
+        """
+        Diarize `audio` with the session's parameters. The segmentation and embedding
+        passes are cached per audio buffer, so a retry with a different `num_speakers`,
+        `offset` (clustering threshold) or `min_duration_off` only re-runs clustering.
+        The shared pipeline is never re-instantiated, which keeps concurrent sessions
+        with different configs isolated.
+
+        With `return_embeddings`, also returns one centroid embedding per speaker in
+        `diarization.labels()` order. With `cache=False` (streaming windows, which are
+        never diarized twice) the passes are not stored, so they cannot push out the
+        whole recordings that re-diarization reuses.
+        """
+        logger.info(f"Performing speaker diarization on {len(audio) / sample_rate:.1f}s of audio.")
+        # pyannote accepts in-memory audio as a (channel, time) tensor
+        file = Audio.validate_file({
+            "waveform": torch.from_numpy(audio).unsqueeze(0),
+            "sample_rate": sample_rate
+        })
+        with DIARIZATION_SECONDS.time(), self.registry.acquire(self.REGISTRY_KEY) as pipeline:
+            features = self.get_features(pipeline, fingerprint_audio(audio), file, cache)
+            result = self.cluster(pipeline, features, file, config, return_embeddings)
+        logger.info("Speaker diarization completed.")
+        return result
+
+    def diarize_turns(self, audio: np.ndarray, config: dict, return_embeddings: bool = False, cache: bool = True) -> dict:
+        """
+        `diarize` reduced to plain data: (start, end, label) turns, the labels, speech
+        duration per label and, when requested, the centroid embeddings.
+        """
+        if return_embeddings:
+            diarization, centroids = self.diarize(audio, config, return_embeddings=True, cache=cache)
+        else:
+            diarization = self.diarize(audio, config, cache=cache)
+            centroids = None
+        labels = diarization.labels()
+        return {
+            "turns": [(turn.start, turn.end, speaker) for turn, _, speaker in diarization.itertracks(yield_label=True)],
+            "labels": labels,
+            "durations": np.array([diarization.label_duration(label) for label in labels]),
+            "centroids": centroids
+        }
+
+    def get_features(self, pipeline: Pipeline, key: str, file: dict, cache: bool = True) -> DiarizationFeatures:
+        with self.features_lock:
+            if key in self.features:
+                self.features.move_to_end(key)
+                logger.info("Reusing cached segmentation and embeddings.")
+                return self.features[key]
+
+        segmentations = pipeline.get_segmentations(file)
+        if pipeline._segmentation.model.specifications.powerset:
+            binarized_segmentations = segmentations
+        else:
+            binarized_segmentations = binarize(
+                segmentations,
+                onset=self.default_config["segmentation"]["threshold"],
+                initial_state=False,
+            )
+        count = pipeline.speaker_count(
+            binarized_segmentations,
+            pipeline._segmentation.model.receptive_field,
+            warm_up=(0.0, 0.0),
+        )
+        features = DiarizationFeatures(segmentations, binarized_segmentations, count)
+        if not cache:
+            return features
+
+        with self.features_lock:
+            self.features[key] = features
+            while len(self.features) > self.cache_size:
+                self.features.popitem(last=False)
+        return features
+
+    def make_clustering(self, pipeline: Pipeline, config: dict):
+        # A private clustering instance per call: hyperparameters never leak between sessions
+        parameters = copy.deepcopy(self.default_config["clustering"])
         if "offset" in config:
-            pipeline_config["clustering"]["threshold"] = config["offset"]
-    
-        # First instantiate with the base config
-        self.pipeline.instantiate(pipeline_config)
-
-        # num_speakers is passed separately to the __call__ method
-        diarization = self.pipeline(
-            wav_path, 
-            num_speakers=config.get("num_speakers", 2)
+            parameters["threshold"] = config["offset"]
+        clustering = type(pipeline.clustering)(metric=pipeline._embedding.metric)
+        clustering.instantiate(parameters)
+        return clustering
+
+    def embeddings(self, pipeline: Pipeline, features: DiarizationFeatures, file: dict) -> np.ndarray:
+        if features.embeddings is None:
+            features.embeddings = pipeline.get_embeddings(
+                file,
+                features.binarized_segmentations,
+                exclude_overlap=pipeline.embedding_exclude_overlap,
+            )
+        return features.embeddings
+
+    def cluster(self, pipeline: Pipeline, features: DiarizationFeatures, file: dict, config: dict, return_embeddings: bool = False):
+        num_speakers, min_speakers, max_speakers = pipeline.set_num_speakers(
+            num_speakers=config.get("num_speakers", 2),
+            min_speakers=config.get("min_speakers"),
+            max_speakers=config.get("max_speakers"),
         )
-        diarization = self.pipeline(wav_path, num_speakers=config.get("num_speakers", 2))
+        segmentations = features.segmentations
+        binarized_segmentations = features.binarized_segmentations
+        num_chunks, _, local_num_speakers = segmentations.data.shape
 
-        logger.info("Speaker diarization completed.")
-        return diarization
+        if np.nanmax(features.count.data) == 0.0:
+            diarization = Annotation(uri=file["uri"])
+            if return_embeddings:
+                return diarization, np.zeros((0, pipeline._embedding.dimension))
+            return diarization
+
+        if max_speakers < 2:
+            hard_clusters = np.zeros((num_chunks, local_num_speakers), dtype=np.int8)
+            centroids = None
+            if return_embeddings:
+                embeddings = self.embeddings(pipeline, features, file)
+                active = np.sum(binarized_segmentations.data, axis=1) > 0
+                centroids = np.nanmean(embeddings[active], axis=0, keepdims=True)
+        else:
+            hard_clusters, _, centroids = self.make_clustering(pipeline, config)(
+                embeddings=self.embeddings(pipeline, features, file),
+                segmentations=binarized_segmentations,
+                num_clusters=num_speakers,
+                min_clusters=min_speakers,
+                max_clusters=max_speakers,
+                file=file,
+                frames=pipeline._segmentation.model.receptive_field,
+            )
+
+        # Cap instantaneous speakers without touching the cached count
+        count = SlidingWindowFeature(
+            np.minimum(features.count.data, max_speakers).astype(np.int8),
+            features.count.sliding_window,
+        )
+        inactive_speakers = np.sum(binarized_segmentations.data, axis=1) == 0
+        hard_clusters[inactive_speakers] = -2
+        discrete_diarization = pipeline.reconstruct(segmentations, hard_clusters, count)
+
+        diarization = pipeline.to_annotation(
+            discrete_diarization,
+            min_duration_on=0.0,
+            min_duration_off=config.get("min_duration_off", self.default_config["segmentation"]["min_duration_off"]),
+        )
+        diarization.uri = file["uri"]
+        mapping = {
+            label: expected_label
+            for label, expected_label in zip(diarization.labels(), pipeline.classes())
+        }
+        diarization = diarization.rename_labels(mapping=mapping)
+        if not return_embeddings:
+            return diarization
+
+        # Align centroids with diarization.labels(), padding speakers that only
+        # appear through overcounting (same as pyannote's own apply())
+        if len(diarization.labels()) > centroids.shape[0]:
+            centroids = np.pad(centroids, ((0, len(diarization.labels()) - centroids.shape[0]), (0, 0)))
+        inverse_mapping = {label: index for index, label in mapping.items()}
+        centroids = centroids[[inverse_mapping[label] for label in diarization.labels()]]
+        return diarization, centroids
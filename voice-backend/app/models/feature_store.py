@@ -0,0 +1,135 @@
+# app/models/feature_store.py
+
+import threading
+import numpy as np
+import whisper
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.fft import rfft
+from scipy.signal import get_window
+
+HOP_LENGTH = whisper.audio.HOP_LENGTH
+N_FFT = whisper.audio.N_FFT
+N_FRAMES = whisper.audio.N_FRAMES
+# log10 of Whisper's 1e-10 power floor: a frame of pure zero padding
+SILENCE = -10.0
+
+class LogMelFeatures:
+    """
+    Whisper's log-mel frames of an audio stream, computed as samples are appended.
+    Only the samples short of a full STFT frame are held back between appends, so
+    every sample is transformed once however many models or passes read the frames.
+
+    Frames are the raw log10 mel power, matching `whisper.log_mel_spectrogram` over
+    the whole stream (reflect padding at the start, zero padding after `finish`)
+    before its dynamic-range clamp; decoders apply the clamp with `floor`, as
+    `whisper.transcribe` does with the global maximum. Frame `i` is centred on
+    sample `origin + i * HOP_LENGTH`.
+
+    Storage keeps at least one window of SILENCE beyond the last frame, so a 30 s
+    window of computed frames is a view, not a copy. With `keep_frames`, frames
+    older than that many are dropped as the store grows, for live sessions.
+    """
+
+    def __init__(self, n_mels: int = 80, origin: int = 0, keep_frames: int = None):
+        self.n_mels = n_mels
+        self.origin = origin
+        self.keep_frames = keep_frames
+        self.filters = whisper.audio.mel_filters("cpu", n_mels).numpy()
+        # Periodic Hann window, as torch.hann_window
+        self.window_function = get_window("hann", N_FFT).astype(np.float32)
+        self.buffer = np.full((n_mels, 2 * N_FRAMES), SILENCE, dtype=np.float32)
+        self.first = 0  # frame stored in buffer column 0
+        self.frames = 0
+        self.samples = 0
+        self.pending = np.zeros(0, dtype=np.float32)
+        self.started = False
+        self.finished = False
+        self.max = SILENCE
+        self.lock = threading.Lock()
+
+    @property
+    def end_sample(self) -> int:
+        return self.origin + self.samples
+
+    @property
+    def floor(self) -> float:
+        """Whisper's clamp: nothing more than 80 dB below the loudest frame."""
+        return self.max - 8.0
+
+    def append(self, samples: np.ndarray):
+        """Add 16 kHz float32 samples and compute the frames they complete."""
+        samples = np.asarray(samples, dtype=np.float32)
+        with self.lock:
+            if self.finished:
+                raise ValueError("Cannot append to finished log-mel features.")
+            self.samples += len(samples)
+            pending = np.concatenate((self.pending, samples))
+            if not self.started:
+                if len(pending) <= N_FFT // 2:
+                    self.pending = pending
+                    return
+                # Centred frames: reflect the stream around its first sample, as torch.stft does
+                pending = np.concatenate((pending[N_FFT // 2:0:-1], pending))
+                self.started = True
+            self._compute(pending)
+
+    def finish(self):
+        """End of the stream: compute the last frames against zero padding, as Whisper pads."""
+        with self.lock:
+            if self.finished:
+                return
+            pending = self.pending
+            if not self.started:
+                # Too short to reflect
+                pending = np.concatenate((np.zeros(N_FFT // 2, dtype=np.float32), pending))
+                self.started = True
+            self._compute(np.concatenate((pending, np.zeros(N_FFT, dtype=np.float32))))
+            self.finished = True
+
+    def _compute(self, pending: np.ndarray):
+        count = (len(pending) - N_FFT) // HOP_LENGTH + 1 if len(pending) >= N_FFT else 0
+        if count:
+            frames = sliding_window_view(pending, N_FFT)[::HOP_LENGTH][:count]
+            spectrum = rfft(frames * self.window_function, axis=-1)
+            power = spectrum.real ** 2 + spectrum.imag ** 2
+            mel = np.log10(np.maximum(power @ self.filters.T, 1e-10)).T
+            self._reserve(count)
+            column = self.frames - self.first
+            self.buffer[:, column:column + count] = mel
+            self.frames += count
+            self.max = max(self.max, float(mel.max()))
+        # The overlap the next frames still need
+        self.pending = pending[count * HOP_LENGTH:].copy()
+
+    def _reserve(self, count: int):
+        if self.frames + count + N_FRAMES - self.first <= self.buffer.shape[1]:
+            return
+        first = self.first
+        if self.keep_frames is not None:
+            first = min(max(first, self.frames + count - self.keep_frames), self.frames)
+        kept = self.frames - first
+        # Windows already handed out keep the old buffer alive and unchanged
+        buffer = np.full((self.n_mels, 2 * (kept + count) + N_FRAMES), SILENCE, dtype=np.float32)
+        buffer[:, :kept] = self.buffer[:, first - self.first:self.frames - self.first]
+        self.buffer = buffer
+        self.first = first
+
+    def window(self, start: int, stop: int = None) -> np.ndarray:
+        """
+        The (n_mels, N_FRAMES) window of frames from `start`, with frames at or after
+        `stop` (default: the end of the stream) as padding. A view when the window is
+        entirely computed audio, or runs to the end of a finished stream; otherwise a
+        copy, since later appends fill the storage beyond the last frame.
+        """
+        with self.lock:
+            if start < self.first:
+                raise ValueError(f"Frame {start} was dropped; frames from {self.first} are kept.")
+            end = self.frames if stop is None else min(stop, self.frames)
+            column = start - self.first
+            view = self.buffer[:, column:column + N_FRAMES]
+            # After `finish`, frames past the stream's own frame count are its zero padding
+            if start + N_FRAMES <= end or (self.finished and end >= self.samples // HOP_LENGTH):
+                return view
+            window = np.full_like(view, SILENCE)
+            window[:, :max(end - start, 0)] = view[:, :max(end - start, 0)]
+            return window
@@ -0,0 +1,154 @@
+# app/models/inference_engine.py
+
+import logging
+import numpy as np
+import torch
+import whisper
+from transformers import AutoModelForSeq2SeqLM
+from app.config import Config
+
+# Optional engine: pip install faster-whisper
+try:
+    from faster_whisper import WhisperModel as CTranslate2WhisperModel
+except ImportError:
+    CTranslate2WhisperModel = None
+
+logger = logging.getLogger(__name__)
+
+def configure_threads(num_threads: int = None):
+    """Apply TORCH_NUM_THREADS to torch's intra-op pool (0 keeps torch's default of one per core)."""
+    num_threads = num_threads or Config.TORCH_NUM_THREADS
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    logger.info(f"Torch intra-op threads: {torch.get_num_threads()}")
+
+def plain_linears(module: torch.nn.Module) -> torch.nn.Module:
+    """
+    Swap nn.Linear subclasses (Whisper's dtype-casting Linear) for plain nn.Linear
+    sharing the same weights; dynamic quantization only matches the exact type.
+    """
+    for name, child in module.named_children():
+        if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+            linear = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+            linear.weight = child.weight
+            linear.bias = child.bias
+            setattr(module, name, linear)
+        else:
+            plain_linears(child)
+    return module
+
+class TorchEngine:
+    """PyTorch eager inference: fp16 on CUDA, fp32 on CPU."""
+
+    name = "torch"
+    # Models expose whisper's decode() interface, so the batching scheduler can drive them
+    batched_decode = True
+    # Each decode installs kv-cache hooks on the shared decoder modules, so concurrent
+    # decodes on one model overwrite each other's cache
+    thread_safe = False
+
+    def __init__(self, device: str):
+        self.device = device
+
+    def load_whisper(self, name: str, model_dir: str):
+        return whisper.load_model(name, device=self.device, download_root=model_dir)
+
+    def warm_up_whisper(self, model):
+        # One short decode of silence compiles the kernels before the first real request
+        mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(np.zeros(whisper.audio.SAMPLE_RATE, dtype=np.float32)),
+                                          model.dims.n_mels).to(model.device)
+        whisper.decode(model, mel, whisper.DecodingOptions(
+            language="en", without_timestamps=True, sample_len=4, fp16=model.device.type == "cuda"
+        ))
+
+    def load_seq2seq(self, repo: str, model_dir: str):
+        dtype = torch.float16 if self.device == "cuda" else torch.float32
+        return AutoModelForSeq2SeqLM.from_pretrained(repo, cache_dir=model_dir, torch_dtype=dtype).to(self.device)
+
+class Int8Engine(TorchEngine):
+    """
+    PyTorch on CPU with the Linear layers dynamically quantized to int8. Weights
+    are stored as int8 and activations are quantized per batch, which cuts memory
+    about 4x for the Linear-heavy transformer blocks and speeds up CPU matmuls.
+    """
+
+    name = "int8"
+
+    def __init__(self, device: str):
+        if device != "cpu":
+            logger.warning("int8 dynamic quantization runs on CPU only; loading on CPU.")
+        super().__init__("cpu")
+
+    def quantize(self, model: torch.nn.Module) -> torch.nn.Module:
+        return torch.ao.quantization.quantize_dynamic(plain_linears(model), {torch.nn.Linear}, dtype=torch.qint8)
+
+    def load_whisper(self, name: str, model_dir: str):
+        return self.quantize(super().load_whisper(name, model_dir))
+
+    def load_seq2seq(self, repo: str, model_dir: str):
+        return self.quantize(super().load_seq2seq(repo, model_dir))
+
+class FasterWhisperModel:
+    """Adapts a faster-whisper (CTranslate2) model to openai-whisper's transcribe() result."""
+
+    def __init__(self, model):
+        self.model = model
+
+    def transcribe(self, audio: np.ndarray, language: str = None, word_timestamps: bool = False, **kwargs) -> dict:
+        segments, _ = self.model.transcribe(audio, language=language, word_timestamps=word_timestamps)
+        result = []
+        for segment in segments:
+            result.append({
+                "start": segment.start,
+                "end": segment.end,
+                "text": segment.text,
+                "avg_logprob": segment.avg_logprob,
+                "no_speech_prob": segment.no_speech_prob,
+                "compression_ratio": segment.compression_ratio,
+                "words": [{
+                    "word": word.word,
+                    "start": word.start,
+                    "end": word.end,
+                    "probability": word.probability
+                } for word in segment.words or []]
+            })
+        return {"text": "".join(segment["text"] for segment in result), "segments": result}
+
+class FasterWhisperEngine:
+    """CTranslate2 Whisper through faster-whisper, int8 by default. Whisper models only."""
+
+    name = "faster-whisper"
+    batched_decode = False
+    # CTranslate2 queues concurrent calls on its own
+    thread_safe = True
+
+    def __init__(self, device: str):
+        if CTranslate2WhisperModel is None:
+            raise ValueError("The faster-whisper engine requires the faster-whisper package.")
+        self.device = device
+        self.compute_type = Config.FASTER_WHISPER_COMPUTE_TYPE
+
+    def load_whisper(self, name: str, model_dir: str):
+        return FasterWhisperModel(CTranslate2WhisperModel(
+            name, device=self.device, compute_type=self.compute_type,
+            cpu_threads=torch.get_num_threads(), download_root=model_dir
+        ))
+
+    def warm_up_whisper(self, model):
+        model.transcribe(np.zeros(whisper.audio.SAMPLE_RATE, dtype=np.float32), language="en")
+
+    def load_seq2seq(self, repo: str, model_dir: str):
+        raise ValueError("The faster-whisper engine only serves Whisper models.")
+
+ENGINES = {
+    TorchEngine.name: TorchEngine,
+    Int8Engine.name: Int8Engine,
+    FasterWhisperEngine.name: FasterWhisperEngine
+}
+
+def get_engine(model_key: str, device: str):
+    """Engine for `model_key` (a Whisper model name or "combiner") from INFERENCE_ENGINES."""
+    engine_name = Config.INFERENCE_ENGINES.get(model_key, Config.INFERENCE_ENGINE)
+    if engine_name not in ENGINES:
+        raise ValueError(f"Unknown inference engine '{engine_name}' for '{model_key}'. Choose from {list(ENGINES)}.")
+    return ENGINES[engine_name](device)
@@ -0,0 +1,189 @@
+# app/models/model_registry.py
+
+import gc
+import time
+import logging
+import threading
+import contextlib
+from collections import OrderedDict
+import torch
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+def model_size_mb(model, max_depth: int = 4) -> float:
+    """
+    Parameter and buffer memory of every torch module reachable from `model`
+    (a module, a wrapper object holding modules, or a tuple of them).
+    """
+    total = 0
+    seen = set()
+    tensors = set()
+    pending = [(model, 0)]
+    while pending:
+        obj, depth = pending.pop()
+        if id(obj) in seen or depth > max_depth:
+            continue
+        seen.add(id(obj))
+        if isinstance(obj, torch.nn.Module):
+            # state_dict also covers the packed weights of quantized layers
+            for value in obj.state_dict().values():
+                for tensor in value if isinstance(value, tuple) else (value,):
+                    if isinstance(tensor, torch.Tensor) and tensor.data_ptr() not in tensors:
+                        tensors.add(tensor.data_ptr())
+                        total += tensor.numel() * tensor.element_size()
+        elif isinstance(obj, (list, tuple)):
+            pending.extend((item, depth + 1) for item in obj)
+        elif isinstance(obj, dict):
+            pending.extend((item, depth + 1) for item in obj.values())
+        elif hasattr(obj, "__dict__"):
+            pending.extend((item, depth + 1) for item in vars(obj).values())
+    return total / (1024 * 1024)
+
+class ModelEntry:
+    def __init__(self, name: str, loader, warm_up=None, size_hint_mb: float = 0.0):
+        self.name = name
+        self.loader = loader
+        self.warm_up = warm_up
+        self.size_mb = size_hint_mb  # replaced by the measured size after the first load
+        self.model = None
+        self.state = "unloaded"  # unloaded | loading | ready | failed
+        self.error = None
+        self.pinned = False
+        self.in_use = 0
+        self.last_used = 0.0
+        self.loads = 0
+        self.load_lock = threading.Lock()
+
+class ModelRegistry:
+    """
+    Loads models on first use and keeps the resident ones within a memory budget.
+
+    Callers hold a model with `acquire`, which loads it if needed and keeps it from
+    being evicted until released. When a load would exceed `budget_mb`, idle
+    unpinned models are evicted least recently used first. A budget of 0 disables
+    eviction.
+    """
+
+    def __init__(self, budget_mb: float = Config.MODEL_MEMORY_BUDGET_MB):
+        self.budget_mb = budget_mb
+        self.entries = OrderedDict()  # least recently used first
+        self.lock = threading.Lock()
+
+    def register(self, name: str, loader, warm_up=None, size_hint_mb: float = 0.0):
+        with self.lock:
+            if name not in self.entries:
+                self.entries[name] = ModelEntry(name, loader, warm_up, size_hint_mb)
+
+    def pin(self, name: str):
+        with self.lock:
+            self.entries[name].pinned = True
+
+    @contextlib.contextmanager
+    def acquire(self, name: str):
+        entry = self.entries[name]
+        with self.lock:
+            entry.in_use += 1
+            entry.last_used = time.monotonic()
+            self.entries.move_to_end(name)
+        try:
+            yield self._ensure_loaded(entry)
+        finally:
+            with self.lock:
+                entry.in_use -= 1
+                entry.last_used = time.monotonic()
+                over_budget = self.budget_mb and self.resident_mb() > self.budget_mb
+            if over_budget:
+                # Models that were busy during an earlier load can be evicted now
+                self._make_room(0.0, keep=entry)
+
+    def get(self, name: str):
+        """Load `name` if needed and return it without holding it against eviction."""
+        with self.acquire(name) as model:
+            return model
+
+    def _ensure_loaded(self, entry: ModelEntry):
+        model = entry.model
+        if model is not None:
+            return model
+        with entry.load_lock:
+            if entry.model is not None:
+                return entry.model
+            entry.state = "loading"
+            self._make_room(entry.size_mb, keep=entry)
+            started = time.monotonic()
+            try:
+                model = entry.loader()
+                if entry.warm_up is not None:
+                    with torch.no_grad():
+                        entry.warm_up(model)
+            except Exception as e:
+                entry.state = "failed"
+                entry.error = str(e)
+                logger.error(f"Failed to load model '{entry.name}': {e}")
+                raise e
+            entry.size_mb = model_size_mb(model) or entry.size_mb
+            with self.lock:
+                entry.model = model
+                entry.state = "ready"
+                entry.error = None
+                entry.loads += 1
+            logger.info(f"Model '{entry.name}' ready in {time.monotonic() - started:.1f}s ({entry.size_mb:.0f} MB).")
+            # The measured size can exceed the hint
+            self._make_room(0.0, keep=entry)
+            return model
+
+    def resident_mb(self) -> float:
+        return sum(entry.size_mb for entry in self.entries.values() if entry.model is not None)
+
+    def _make_room(self, needed_mb: float, keep: ModelEntry):
+        if not self.budget_mb:
+            return
+        evicted = []
+        with self.lock:
+            resident = self.resident_mb()
+            for entry in list(self.entries.values()):
+                if resident + needed_mb <= self.budget_mb:
+                    break
+                if entry is keep or entry.model is None or entry.pinned or entry.in_use:
+                    continue
+                entry.model = None
+                entry.state = "unloaded"
+                resident -= entry.size_mb
+                evicted.append(entry.name)
+            over_budget = resident + needed_mb > self.budget_mb
+        if evicted:
+            gc.collect()
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+            logger.info(f"Evicted idle models {evicted} to stay within {self.budget_mb:.0f} MB.")
+        if over_budget:
+            logger.warning(f"Models in use exceed the {self.budget_mb:.0f} MB budget ({resident + needed_mb:.0f} MB).")
+
+    def warm_up(self, names: list):
+        """Load `names` one after another; failures are recorded and logged, not raised."""
+        for name in names:
+            try:
+                self.get(name)
+            except Exception:
+                continue
+
+    def is_ready(self, names: list) -> bool:
+        return all(name in self.entries and self.entries[name].state == "ready" for name in names)
+
+    def status(self) -> dict:
+        with self.lock:
+            return {
+                "budget_mb": self.budget_mb,
+                "resident_mb": round(self.resident_mb(), 1),
+                "models": {
+                    entry.name: {
+                        "state": entry.state,
+                        "size_mb": round(entry.size_mb, 1),
+                        "pinned": entry.pinned,
+                        "in_use": entry.in_use,
+                        "loads": entry.loads,
+                        "error": entry.error,
+                    } for entry in self.entries.values()
+                }
+            }
@@ -1,67 +1,176 @@
 import torch
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from transformers import AutoTokenizer
+import difflib
 import logging
+from app.config import Config
+from app.models.model_registry import ModelRegistry
+from app.models.inference_engine import get_engine
+from app.utils.text_utils import normalize_word
 
 logger = logging.getLogger(__name__)
 
+def align_words(real_time_words: list, whisper_words: list) -> list:
+    """difflib opcodes aligning the two word lists, compared case- and punctuation-insensitively."""
+    matcher = difflib.SequenceMatcher(
+        None, [normalize_word(w) for w in real_time_words], [normalize_word(w) for w in whisper_words], autojunk=False
+    )
+    return matcher.get_opcodes()
+
+def merge_aligned(real_time_words: list, whisper_words: list, opcodes: list) -> list:
+    """
+    Merge two aligned transcripts without a model: agreeing words take Whisper's
+    casing and punctuation, disagreements take the real-time words, and words
+    present in only one transcript are kept.
+    """
+    merged = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal" or tag == "insert":
+            merged.extend(whisper_words[j1:j2])
+        else:  # replace or delete
+            merged.extend(real_time_words[i1:i2])
+    return merged
+
+def aligned_windows(opcodes: list, max_words: int) -> list:
+    """
+    Split an alignment into windows of at most `max_words` words per transcript,
+    as (real_time_start, real_time_end, whisper_start, whisper_end) bounds. Cuts
+    fall inside agreeing spans, so no disagreement is split between windows,
+    unless a single disagreement is longer than a window.
+    """
+    cuts = []
+    for tag, i1, i2, j1, j2 in opcodes:
+        if tag == "equal":
+            cuts.extend((i1 + k, j1 + k) for k in range(1, i2 - i1 + 1))
+        else:
+            pieces = -(-max(i2 - i1, j2 - j1) // max_words)
+            cuts.extend((i1 + (i2 - i1) * k // pieces, j1 + (j2 - j1) * k // pieces) for k in range(1, pieces + 1))
+
+    windows = []
+    start = best = (0, 0)
+    for cut in cuts:
+        if max(cut[0] - start[0], cut[1] - start[1]) > max_words and best != start:
+            windows.append((start[0], best[0], start[1], best[1]))
+            start = best
+        best = cut
+    if best != start:
+        windows.append((start[0], best[0], start[1], best[1]))
+    return windows
+
 class TranscriptCombiner:
-    def __init__(self, device: str = None, model_dir: str = "./models"):
+    """
+    Merges the browser's real-time transcript with Whisper's.
+
+    Both transcripts are aligned word by word first. In "align" mode the alignment
+    is merged directly. In "llm" mode it is cut into windows that fit FLAN-T5's
+    context, all windows are generated in padded batches, and the outputs are
+    concatenated, so cost grows linearly with transcript length and nothing is
+    truncated.
+    """
+
+    REGISTRY_KEY = "combiner"
+
+    def __init__(self, registry: ModelRegistry, device: str = None, model_dir: str = "./models",
+                 mode: str = Config.COMBINER_MODE):
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
         self.model_dir = model_dir
-        self.model = None
-        self.tokenizer = None
-        self.load_model()
+        self.mode = mode
+        self.window_words = Config.COMBINER_WINDOW_WORDS
+        self.batch_size = Config.COMBINER_BATCH_SIZE
+        self.num_beams = Config.COMBINER_NUM_BEAMS
+        self.registry = registry
+        self.engine = get_engine(self.REGISTRY_KEY, self.device)
+        # Engines may move the model (int8 runs on CPU)
+        self.device = self.engine.device
+        # FLAN-T5-XL: fp16 on CUDA, fp32 or int8 on CPU
+        self.registry.register(
+            self.REGISTRY_KEY, loader=self.load_model, warm_up=self.warm_up,
+            size_hint_mb=5700 if self.device == "cuda" else 11400
+        )
 
     def load_model(self):
         logger.info("Loading FLAN-T5 model for transcript combination")
         try:
             # Use an instruction-tuned model that excels at following prompts.
-            self.model = AutoModelForSeq2SeqLM.from_pretrained(
-        	    "google/flan-t5-xl",
-        	    cache_dir=self.model_dir,
-        	    torch_dtype=torch.float16 
-        	).to(self.device)
-            self.tokenizer = AutoTokenizer.from_pretrained(
+            model = self.engine.load_seq2seq("google/flan-t5-xl", self.model_dir)
+            tokenizer = AutoTokenizer.from_pretrained(
                 "google/flan-t5-xl",
                 cache_dir=self.model_dir
             )
-            logger.info(f"FLAN-T5 model loaded successfully on {self.device}")
+            logger.info(f"FLAN-T5 model loaded successfully on {self.device} ({self.engine.name} engine)")
+            return model, tokenizer
         except Exception as e:
             logger.error(f"Error loading FLAN-T5 model: {e}")
             raise
 
-    def combine_transcripts(self, real_time_transcript: str, whisper_transcript: str) -> dict:
+    def warm_up(self, loaded):
+        model, tokenizer = loaded
+        inputs = tokenizer("Final Transcript:", return_tensors="pt").to(self.device)
+        model.generate(inputs.input_ids, max_length=4)
+
+    def build_prompt(self, real_time_transcript: str, whisper_transcript: str) -> str:
+        return (
+		    "You are an expert transcriber and editor. Your task is to combine the two transcripts below into one clear, accurate, and coherent final transcript. "
+		    "Both transcripts may contain errors, misinterpretations, or extraneous details, but note that the real-time transcript is generally more reliable. "
+		    "Where there is conflicting information, prioritize the real-time transcript while incorporating any correct or clarifying details from the Whisper transcript. "
+		    "Eliminate redundancies, correct errors, and ensure proper formatting, punctuation, and natural flow. Do not cut off any of the transcript and ensure you are returning the entire final transcript\n\n"
+		    "Transcript 1 (Real-time):\n" + real_time_transcript.strip() + "\n\n"
+		    "Transcript 2 (Whisper):\n" + whisper_transcript.strip() + "\n\n"
+		    "Final Transcript:"
+		)
+
+    def combine_transcripts(self, real_time_transcript: str, whisper_transcript: str, mode: str = None) -> dict:
         try:
-            prompt = (
-			    "You are an expert transcriber and editor. Your task is to combine the two transcripts below into one clear, accurate, and coherent final transcript. "
-			    "Both transcripts may contain errors, misinterpretations, or extraneous details, but note that the real-time transcript is generally more reliable. "
-			    "Where there is conflicting information, prioritize the real-time transcript while incorporating any correct or clarifying details from the Whisper transcript. "
-			    "Eliminate redundancies, correct errors, and ensure proper formatting, punctuation, and natural flow. Do not cut off any of the transcript and ensure you are returning the entire final transcript\n\n"
-			    "Transcript 1 (Real-time):\n" + real_time_transcript.strip() + "\n\n"
-			    "Transcript 2 (Whisper):\n" + whisper_transcript.strip() + "\n\n"
-			    "Final Transcript:"
-			)
-
-
-            inputs = self.tokenizer(
-                prompt,
-                return_tensors="pt",
-                max_length=1024,
-                truncation=True
-            ).to(self.device)
-
-            # Generate with beam search (no sampling) for consistency.
-            outputs = self.model.generate(
-                inputs.input_ids,
-                max_length=512,
-                num_beams=5,
-                early_stopping=True,
-                no_repeat_ngram_size=3,
-            )
+            real_time_words = real_time_transcript.split()
+            whisper_words = whisper_transcript.split()
+            opcodes = align_words(real_time_words, whisper_words)
+            if (mode or self.mode) == "align":
+                combined_text = " ".join(merge_aligned(real_time_words, whisper_words, opcodes))
+                logger.info(f"Combined transcripts by alignment ({len(real_time_words)} + {len(whisper_words)} words)")
+                return {'text': combined_text}
 
-            combined_text = self.tokenizer.decode(outputs[0], skip_special_tokens=True).strip()
-            logger.info("Successfully combined transcripts")
+            windows = aligned_windows(opcodes, self.window_words)
+            outputs = []
+            with self.registry.acquire(self.REGISTRY_KEY) as (model, tokenizer):
+                for first in range(0, len(windows), self.batch_size):
+                    outputs.extend(self.generate_windows(
+                        model, tokenizer, real_time_words, whisper_words, windows[first:first + self.batch_size]
+                    ))
+
+            # A window the model shortened drastically falls back to the aligned merge
+            merged = []
+            for (i1, i2, j1, j2), output in zip(windows, outputs):
+                aligned = merge_aligned(real_time_words[i1:i2], whisper_words[j1:j2],
+                                        align_words(real_time_words[i1:i2], whisper_words[j1:j2]))
+                merged.append(output if len(output.split()) >= len(aligned) // 2 else " ".join(aligned))
+            combined_text = " ".join(text for text in merged if text)
+            logger.info(f"Successfully combined transcripts in {len(windows)} window(s)")
             return {'text': combined_text}
         except Exception as e:
             logger.error(f"Error during transcript combination: {e}")
             raise
+
+    def generate_windows(self, model, tokenizer, real_time_words: list, whisper_words: list, windows: list) -> list:
+        prompts = [
+            self.build_prompt(" ".join(real_time_words[i1:i2]), " ".join(whisper_words[j1:j2]))
+            for i1, i2, j1, j2 in windows
+        ]
+        inputs = tokenizer(
+            prompts,
+            return_tensors="pt",
+            padding=True,
+            max_length=1024,
+            truncation=True
+        ).to(self.device)
+        # Room for the longer side of the largest window with headroom for subword splits
+        longest = max(max(i2 - i1, j2 - j1) for i1, i2, j1, j2 in windows)
+
+        # Generate with beam search (no sampling) for consistency.
+        outputs = model.generate(
+            inputs.input_ids,
+            attention_mask=inputs.attention_mask,
+            max_new_tokens=3 * longest + 16,
+            num_beams=self.num_beams,
+            early_stopping=True,
+            no_repeat_ngram_size=3,
+        )
+        return [tokenizer.decode(output, skip_special_tokens=True).strip() for output in outputs]
@@ -5,58 +5,430 @@ import torch
 import logging
 import difflib
 import os
+import concurrent.futures
+import threading
+import contextlib
+from collections import OrderedDict
 from app.config import Config 
-import soundfile as sf
+from app.models.model_registry import ModelRegistry
+from app.utils.hashing import fingerprint_audio
+from app.models.inference_engine import get_engine
+from app.models.feature_store import LogMelFeatures, HOP_LENGTH, N_FRAMES
+from app.utils.metrics import WHISPER_SECONDS
 import numpy as np
-import tempfile
 
 logger = logging.getLogger(__name__)
 
+# Approximate fp32 footprint, used to make room before a model's first load
+WHISPER_SIZE_HINTS_MB = {
+    "tiny": 150,
+    "base": 290,
+    "small": 970,
+    "medium": 3050,
+    "large": 6200,
+    "large-v2": 6200,
+    "large-v3": 6200
+}
+
+def find_cut_points(audio: np.ndarray, chunk_samples: int, search_samples: int, frame: int = 320) -> list:
+    """
+    Chunk boundaries for long audio, from 0 to len(audio): each cut is the
+    centre of the lowest-energy 20 ms frame within `search_samples` of the
+    nominal position, one `chunk_samples` after the previous cut.
+    """
+    cuts = [0]
+    while len(audio) - cuts[-1] > chunk_samples + search_samples:
+        target = cuts[-1] + chunk_samples
+        start = target - search_samples
+        window = audio[start:target + search_samples]
+        frames = window[:len(window) // frame * frame].reshape(-1, frame)
+        energy = np.einsum("ij,ij->i", frames, frames)
+        cuts.append(start + int(np.argmin(energy)) * frame + frame // 2)
+    cuts.append(len(audio))
+    return cuts
+
+def stitch_segments(segments: list, offset: float, own_start: float, own_end: float) -> list:
+    """
+    Shift a chunk's segments by `offset` seconds and keep only what the chunk owns:
+    words whose midpoint lies in [own_start, own_end), or whole segments by their
+    midpoint when there are no word timestamps.
+    """
+    stitched = []
+    for segment in segments:
+        segment = {**segment, "start": segment["start"] + offset, "end": segment["end"] + offset}
+        words = [
+            {**word, "start": word["start"] + offset, "end": word["end"] + offset} for word in segment.get("words", [])
+        ]
+        if not words:
+            if own_start <= (segment["start"] + segment["end"]) / 2 < own_end:
+                stitched.append(segment)
+            continue
+        kept = [word for word in words if own_start <= (word["start"] + word["end"]) / 2 < own_end]
+        if not kept:
+            continue
+        if len(kept) < len(words):
+            segment["start"], segment["end"] = kept[0]["start"], kept[-1]["end"]
+            segment["text"] = "".join(word["word"] for word in kept)
+        segment["words"] = kept
+        stitched.append(segment)
+    return stitched
+
+def is_long_audio(audio: np.ndarray, chunk_seconds: float = Config.LONG_AUDIO_CHUNK_SECONDS) -> bool:
+    return len(audio) > (chunk_seconds + Config.LONG_AUDIO_SEARCH_SECONDS) * whisper.audio.SAMPLE_RATE
+
+def transcribe_in_chunks(audio: np.ndarray, transcribe_chunk, workers: int = 1,
+                         chunk_seconds: float = Config.LONG_AUDIO_CHUNK_SECONDS,
+                         overlap_seconds: float = Config.LONG_AUDIO_OVERLAP_SECONDS, progress=None) -> dict:
+    """
+    Transcribe a long recording in chunks of about `chunk_seconds`, cut at the
+    quietest point near each boundary and padded by `overlap_seconds` on both
+    sides so no word is clipped. `transcribe_chunk(audio)` runs on up to `workers`
+    chunks at once. Each chunk keeps only the words (or segments) whose midpoint
+    falls between its cut points, which removes the duplicates from the overlaps.
+    `progress(done, total)` is called as each chunk finishes.
+    """
+    sample_rate = whisper.audio.SAMPLE_RATE
+    cuts = find_cut_points(
+        audio, int(chunk_seconds * sample_rate), int(Config.LONG_AUDIO_SEARCH_SECONDS * sample_rate)
+    )
+    overlap = int(overlap_seconds * sample_rate)
+    spans = [(max(start - overlap, 0), min(end + overlap, len(audio))) for start, end in zip(cuts, cuts[1:])]
+    logger.info(f"Transcribing {len(audio) / sample_rate:.0f}s of audio in {len(spans)} chunks on {workers} worker(s).")
+
+    results = [None] * len(spans)
+    if workers <= 1:
+        for index, (start, end) in enumerate(spans):
+            results[index] = transcribe_chunk(audio[start:end])
+            if progress is not None:
+                progress(index + 1, len(spans))
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(transcribe_chunk, audio[start:end]): index for index, (start, end) in enumerate(spans)}
+            for done, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                results[futures[future]] = future.result()
+                if progress is not None:
+                    progress(done, len(spans))
+
+    segments = []
+    for (start, _), own_start, own_end, result in zip(spans, cuts, cuts[1:], results):
+        segments.extend(stitch_segments(
+            result["segments"], start / sample_rate, own_start / sample_rate, own_end / sample_rate
+        ))
+    return {
+        'text': "".join(segment["text"] for segment in segments).strip(),
+        'segments': segments
+    }
+
 class WhisperModels:
-    def __init__(self, device: str, model_dir: str = "./models"):
+    def __init__(self, device: str, registry: ModelRegistry, model_dir: str = "./models"):
         self.device = device
         self.model_dir = model_dir
-        self.models = {}
-        self.load_models()
+        self.registry = registry
+        self.model_names = list(Config.WHISPER_MODELS)
+        # Optional InferenceScheduler; when set, decoding goes through its cross-session batches
+        self.scheduler = None
+        # Log-mel features of recent audio buffers, shared by every model and pass over them
+        self.features = OrderedDict()
+        self.features_lock = threading.Lock()
+        self.engines = {name: get_engine(name, device) for name in self.model_names}
+        self.locks = {name: threading.Lock() for name in self.model_names}
+        self.warned_serial_chunks = False
+        for name in self.model_names:
+            self.registry.register(
+                self.key(name),
+                loader=lambda name=name: self.load_model(name),
+                warm_up=self.engines[name].warm_up_whisper,
+                size_hint_mb=WHISPER_SIZE_HINTS_MB.get(name, 0)
+            )
 
-    def load_models(self):
-        model_names =  Config.WHISPER_MODELS 
-        for name in model_names:
-            logger.info(f"Loading Whisper model: {name}")
-            model = whisper.load_model(name, download_root=self.model_dir).to(self.device)
-            self.models[name] = model
-            logger.info(f"Whisper model '{name}' loaded on {self.device}.")
-        logger.info(f"All Whisper models loaded on {self.device}.")
-
-    def transcribe(self, wav_path: str, language: str = "en", chunk_duration: int = 600) -> dict:
-        audio, sample_rate = sf.read(wav_path)
-        chunk_size = chunk_duration * sample_rate
-        chunks = [audio[i:i + chunk_size] for i in range(0, len(audio), chunk_size)]        
+    def key(self, name: str) -> str:
+        return f"whisper:{name}"
+
+    def acquire(self, name: str):
+        return self.registry.acquire(self.key(name))
+
+    @contextlib.contextmanager
+    def exclusive(self, name: str):
+        """The model for inference: one caller at a time unless its engine is thread-safe."""
+        with self.acquire(name) as model:
+            if self.engines[name].thread_safe:
+                yield model
+            else:
+                with self.locks[name]:
+                    yield model
+
+    def load_model(self, name: str):
+        engine = self.engines[name]
+        logger.info(f"Loading Whisper model: {name} ({engine.name} engine)")
+        model = engine.load_whisper(name, self.model_dir)
+        logger.info(f"Whisper model '{name}' loaded on {engine.device}.")
+        return model
+
+    def settings(self) -> dict:
+        """Everything besides the audio and request that changes a transcription result."""
+        return {
+            "models": self.model_names,
+            "engines": {name: engine.name for name, engine in self.engines.items()},
+            "selection_mode": Config.WHISPER_SELECTION_MODE,
+            "thresholds": (Config.CASCADE_LOGPROB_THRESHOLD, Config.CASCADE_NO_SPEECH_THRESHOLD,
+                           Config.CASCADE_COMPRESSION_RATIO_THRESHOLD),
+            "long_audio": (Config.LONG_AUDIO_CHUNK_SECONDS, Config.LONG_AUDIO_SEARCH_SECONDS,
+                           Config.LONG_AUDIO_OVERLAP_SECONDS),
+            "batched": self.scheduler is not None
+        }
+
+    def fastest_model(self) -> str:
+        return min(self.model_names, key=self.priority)
+
+    def priority(self, name: str) -> int:
+        return Config.WHISPER_MODEL_PRIORITIES.get(name, 0)
+
+    def transcribe(self, audio: np.ndarray, language: str = "en", model_names: list = None,
+                   word_timestamps: bool = False, progress=None) -> dict:
+        # `audio` is a 16 kHz mono float32 waveform; `progress(done, total)` is called as each chunk finishes
+        names = [name for name in self.model_names if model_names is None or name in model_names]
+        if is_long_audio(audio):
+            return self.transcribe_long(audio, language, names, word_timestamps, progress=progress)
+        result = self.transcribe_chunk(audio, language, names, word_timestamps)
+        if progress is not None:
+            progress(1, 1)
+        return result
+
+    def transcribe_chunk(self, audio: np.ndarray, language: str, model_names: list, word_timestamps: bool = False) -> dict:
+        if Config.WHISPER_SELECTION_MODE == "cascade":
+            return self.transcribe_cascade(audio, language, model_names, word_timestamps)
+        return self.transcribe_ensemble(audio, language, model_names, word_timestamps)
+
+    def transcribe_long(self, audio: np.ndarray, language: str, model_names: list, word_timestamps: bool = False,
+                        chunk_seconds: float = Config.LONG_AUDIO_CHUNK_SECONDS, overlap_seconds: float = Config.LONG_AUDIO_OVERLAP_SECONDS,
+                        workers: int = Config.LONG_AUDIO_WORKERS, progress=None) -> dict:
+        """
+        `transcribe_in_chunks` on this process's models. `workers` chunks run at once
+        with batched decoding, where they fill the scheduler's cross-chunk batches, or
+        when every engine is thread-safe. A torch model instance serialises calls
+        behind its lock, so otherwise the chunks run one after another; process mode
+        (RemoteWhisperModels) spreads them over the whisper workers instead.
+        """
+        if workers > 1 and self.scheduler is None and not all(self.engines[name].thread_safe for name in model_names):
+            if not self.warned_serial_chunks:
+                logger.warning(f"LONG_AUDIO_WORKERS={workers} has no effect on one model instance without "
+                               f"WHISPER_BATCHED_INFERENCE or INFERENCE_MODE=process; chunks run one at a time.")
+                self.warned_serial_chunks = True
+            workers = 1
+        return transcribe_in_chunks(
+            audio, lambda chunk: self.transcribe_chunk(chunk, language, model_names, word_timestamps),
+            workers, chunk_seconds, overlap_seconds, progress
+        )
+
+    def run_model(self, name: str, audio: np.ndarray, language: str, offset: float = 0.0, word_timestamps: bool = False,
+                  parent: np.ndarray = None, parent_start: int = 0) -> list:
+        with WHISPER_SECONDS.time(model=name):
+            # Batched decoding yields segment-level timing only; word timestamps (speaker
+            # assignment per word in the assembler) need Whisper's own alignment pass
+            if self.scheduler is not None and self.engines[name].batched_decode and not word_timestamps:
+                return self.decode_windows(name, audio, language, offset, parent, parent_start)
+            with self.exclusive(name) as model:
+                result = model.transcribe(audio, language=language, word_timestamps=word_timestamps)
+        return [{
+            "start": segment["start"] + offset,
+            "end": segment["end"] + offset,
+            "text": segment["text"],
+            "avg_logprob": segment["avg_logprob"],
+            "no_speech_prob": segment["no_speech_prob"],
+            "compression_ratio": segment["compression_ratio"],
+            "words": [{
+                "word": word["word"],
+                "start": word["start"] + offset,
+                "end": word["end"] + offset,
+                "probability": word["probability"]
+            } for word in segment.get("words", [])],
+            "model": name
+        } for segment in result["segments"]]
+
+    def n_mels(self, name: str) -> int:
+        with self.acquire(name) as model:
+            return model.dims.n_mels
+
+    def log_mel(self, audio: np.ndarray, n_mels: int) -> LogMelFeatures:
+        """The log-mel frames of `audio`, computed once for every model and pass that reads them."""
+        key = (fingerprint_audio(audio), n_mels)
+        with self.features_lock:
+            if key in self.features:
+                self.features.move_to_end(key)
+                return self.features[key]
+        features = LogMelFeatures(n_mels)
+        features.append(audio)
+        features.finish()
+        with self.features_lock:
+            self.features[key] = features
+            while len(self.features) > Config.FEATURE_CACHE_SIZE:
+                self.features.popitem(last=False)
+        return features
+
+    def streaming_features(self, name: str, origin: int = 0, keep_seconds: float = None) -> LogMelFeatures:
+        """An incremental store for a live session's audio, keeping the last `keep_seconds` of frames."""
+        keep_frames = int(keep_seconds * whisper.audio.SAMPLE_RATE / HOP_LENGTH) if keep_seconds else None
+        return LogMelFeatures(self.n_mels(name), origin=origin, keep_frames=keep_frames)
+
+    def decode_windows(self, name: str, audio: np.ndarray, language: str, offset: float = 0.0,
+                       parent: np.ndarray = None, parent_start: int = 0) -> list:
+        """
+        Decode `audio` in 30-second windows of its shared log-mel frames. When `audio`
+        is the slice of `parent` from sample `parent_start` (a cascade escalation),
+        the parent's frames are reused from the nearest frame boundary.
+        """
+        n_mels = self.n_mels(name)
+        if parent is None:
+            return self.decode_features(name, self.log_mel(audio, n_mels), 0, len(audio) // HOP_LENGTH, language, offset)
+        start_frame = parent_start // HOP_LENGTH
+        lead = parent_start - start_frame * HOP_LENGTH
+        return self.decode_features(
+            name, self.log_mel(parent, n_mels), start_frame, start_frame + (lead + len(audio)) // HOP_LENGTH,
+            language, offset - lead / whisper.audio.SAMPLE_RATE
+        )
+
+    def decode_features(self, name: str, features: LogMelFeatures, start_frame: int, end_frame: int,
+                        language: str, offset: float = 0.0) -> list:
+        """
+        Decode frames [start_frame, end_frame) through the batching scheduler in
+        30-second windows, turning the timestamp tokens of each result into segments.
+        Consecutive windows overlap by BATCHED_WINDOW_OVERLAP_SECONDS so a word cut
+        at one window's edge is whole in the next; each window keeps the segments
+        whose midpoint falls on its side of the middle of the overlap.
+        """
+        with self.acquire(name) as model:
+            tokenizer = whisper.tokenizer.get_tokenizer(
+                model.is_multilingual, num_languages=model.num_languages, language=language, task="transcribe"
+            )
+        window_seconds = whisper.audio.CHUNK_LENGTH
+        frame_seconds = HOP_LENGTH / whisper.audio.SAMPLE_RATE
+        overlap = min(int(Config.BATCHED_WINDOW_OVERLAP_SECONDS / frame_seconds), N_FRAMES // 2)
+        starts = [start_frame]
+        while starts[-1] + N_FRAMES < end_frame:
+            starts.append(starts[-1] + N_FRAMES - overlap)
+        cuts = [start_frame] + [start + overlap // 2 for start in starts[1:]] + [end_frame]
+        futures = [
+            self.scheduler.submit(name, features.window(start, end_frame), features.floor, language) for start in starts
+        ]
+
+        segments = []
+        for start_index, own_start, own_end, future in zip(starts, cuts, cuts[1:], futures):
+            result = future.result()
+            if (result.no_speech_prob > Config.CASCADE_NO_SPEECH_THRESHOLD
+                    and result.avg_logprob < Config.CASCADE_LOGPROB_THRESHOLD):
+                continue
+            window_start = (start_index - start_frame) * frame_seconds
+            window_end = min(window_seconds, (end_frame - start_index) * frame_seconds)
+            window_segments = []
+            for start, end, tokens in self.split_timestamps(result.tokens, tokenizer.timestamp_begin):
+                text = tokenizer.decode(tokens)
+                if not text.strip():
+                    continue
+                window_segments.append({
+                    "start": start,
+                    "end": min(end if end is not None else window_seconds, window_end),
+                    "text": text,
+                    "avg_logprob": result.avg_logprob,
+                    "no_speech_prob": result.no_speech_prob,
+                    "compression_ratio": result.compression_ratio,
+                    "model": name
+                })
+            segments.extend(stitch_segments(
+                window_segments, window_start + offset,
+                (own_start - start_frame) * frame_seconds + offset, (own_end - start_frame) * frame_seconds + offset
+            ))
+        return segments
+
+    @staticmethod
+    def split_timestamps(tokens: list, timestamp_begin: int):
+        # Text tokens between consecutive timestamp tokens form one segment
+        start, text_tokens = 0.0, []
+        for token in tokens:
+            if token >= timestamp_begin:
+                time = (token - timestamp_begin) * 0.02
+                if text_tokens:
+                    yield start, time, text_tokens
+                    text_tokens = []
+                start = time
+            else:
+                text_tokens.append(token)
+        if text_tokens:
+            yield start, None, text_tokens
+
+    def needs_escalation(self, segment: dict) -> bool:
+        # Whisper's own silence rule: a likely non-speech segment gains nothing from a bigger model
+        if (segment["no_speech_prob"] > Config.CASCADE_NO_SPEECH_THRESHOLD
+                and segment["avg_logprob"] < Config.CASCADE_LOGPROB_THRESHOLD):
+            return False
+        return (segment["avg_logprob"] < Config.CASCADE_LOGPROB_THRESHOLD
+                or segment["compression_ratio"] > Config.CASCADE_COMPRESSION_RATIO_THRESHOLD)
+
+    def transcribe_cascade(self, audio: np.ndarray, language: str, model_names: list, word_timestamps: bool = False) -> dict:
+        """
+        Transcribe with the cheapest model, then re-transcribe only the low-confidence
+        segments with the next model up, until every segment passes or no larger
+        model is left. Adjacent flagged segments are escalated together.
+        """
+        order = sorted(model_names, key=self.priority)
+        segments = self.run_model(order[0], audio, language, word_timestamps=word_timestamps)
+
+        for name in order[1:]:
+            escalated = []
+            run = []
+            for segment in segments + [None]:
+                if segment is not None and self.needs_escalation(segment):
+                    run.append(segment)
+                    continue
+                if run:
+                    start, end = run[0]["start"], run[-1]["end"]
+                    span_start = int(start * whisper.audio.SAMPLE_RATE)
+                    span = audio[span_start:int(end * whisper.audio.SAMPLE_RATE)]
+                    replacement = self.run_model(
+                        name, span, language, offset=start, word_timestamps=word_timestamps,
+                        parent=audio, parent_start=span_start
+                    ) if len(span) else []
+                    escalated.extend(replacement or run)
+                    logger.info(f"Escalated {len(run)} segment(s) [{start:.1f}s-{end:.1f}s] to '{name}'.")
+                    run = []
+                if segment is not None:
+                    escalated.append(segment)
+            if len(escalated) == len(segments) and all(a is b for a, b in zip(escalated, segments)):
+                break
+            segments = escalated
+
+        usage = {}
+        for segment in segments:
+            usage[segment["model"]] = usage.get(segment["model"], 0) + 1
+        logger.info(f"Cascade segments per model: {usage}")
+        return {
+            'text': "".join(segment["text"] for segment in segments).strip(),
+            'segments': segments
+        }
+
+    def transcribe_ensemble(self, audio: np.ndarray, language: str, model_names: list,
+                            word_timestamps: bool = False) -> dict:
         all_transcriptions = {}     
-        for name, model in self.models.items():
-            transcriptions = []
-            for chunk in chunks:
-                with tempfile.NamedTemporaryFile(suffix=".wav") as temp_chunk:
-                    sf.write(temp_chunk.name, chunk, sample_rate)
-                    result = model.transcribe(temp_chunk.name, language=language)
-                    transcriptions.append(result['text'])
-            all_transcriptions[name] = ' '.join(transcriptions)
+        all_segments = {}
+        for name in model_names:
+            segments = self.run_model(name, audio, language, word_timestamps=word_timestamps)
+            all_transcriptions[name] = "".join(segment["text"] for segment in segments).strip()
+            all_segments[name] = segments
     
         # If only one model is loaded, return its transcription
         if len(all_transcriptions) < 2:
-            selected_text = next(iter(all_transcriptions.values()))
+            selected_model, selected_text = next(iter(all_transcriptions.items()))
             logger.info("Only one model available. Selecting its transcription.")
-            return {'text': selected_text}
+            return {'text': selected_text, 'segments': all_segments[selected_model]}
     
         # Compute pairwise similarities
         similarities = {}
-        model_names = list(transcriptions.keys())
+        model_names = list(all_transcriptions.keys())
         for i in range(len(model_names)):
             for j in range(i + 1, len(model_names)):
                 name1 = model_names[i]
                 name2 = model_names[j]
-                text1 = transcriptions[name1]
-                text2 = transcriptions[name2]
+                text1 = all_transcriptions[name1]
+                text2 = all_transcriptions[name2]
                 similarity = difflib.SequenceMatcher(None, text1, text2).ratio()
                 similarities[f"{name1}-{name2}"] = similarity
                 logger.info(f"Similarity between '{name1}' and '{name2}': {similarity:.2f}")
@@ -69,12 +441,11 @@ class WhisperModels:
     
         if average_similarity >= threshold:
             # If transcriptions are generally similar, select the highest priority model's transcription
-            selected_model = max(transcriptions.keys(), key=lambda name: Config.WHISPER_MODEL_PRIORITIES.get(name, 0))
-            selected_text = transcriptions[selected_model]
+            selected_model = max(all_transcriptions.keys(), key=self.priority)
             logger.info(f"Transcriptions are similar. Selecting '{selected_model}' model's transcription based on priority.")
         else:
             # If transcriptions differ, select the longest transcription
-            selected_text = max(transcriptions.values(), key=lambda x: len(x))
+            selected_model = max(all_transcriptions.keys(), key=lambda name: len(all_transcriptions[name]))
             logger.warning("Transcriptions differ significantly. Selecting the longest transcription.")
     
-        return {'text': selected_text}
\ No newline at end of file
+        return {'text': all_transcriptions[selected_model], 'segments': all_segments[selected_model]}
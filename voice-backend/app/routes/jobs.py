@@ -0,0 +1,100 @@
+# app/routes/jobs.py
+
+import os
+import json
+import asyncio
+import uuid
+import logging
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from app.config import Config
+from app.services.job_queue import JobQueue, TERMINAL_STATES
+from app.services.batch_transcriber import BatchTranscriber
+from app.routes.socket_events import transcription_service, diarization_service, voice_activity_detector, admission_controller
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Jobs run on their own threads and share the loaded models with live sessions, taking
+# an admission slot at the lowest tier behind any waiting recording
+batch_transcriber = BatchTranscriber(transcription_service, diarization_service, voice_activity_detector, admission_controller)
+job_queue = JobQueue(batch_transcriber)
+
+@router.on_event("startup")
+async def start_job_workers():
+    os.makedirs(Config.JOBS_DIR, exist_ok=True)
+    batch_transcriber.loop = asyncio.get_running_loop()
+    job_queue.start()
+
+@router.post("/jobs", status_code=202)
+async def create_job(request: Request, filename: str = "upload", priority: int = 0, language: str = None,
+                     num_speakers: int = None, min_speakers: int = None, max_speakers: int = None):
+    """
+    Queue a recording for transcription. The request body is the raw audio file
+    (any format libsndfile reads); it is streamed to disk, never held in memory.
+    """
+    os.makedirs(Config.JOBS_DIR, exist_ok=True)
+    path = os.path.join(Config.JOBS_DIR, f"{uuid.uuid4().hex}{os.path.splitext(filename)[1]}")
+    limit = Config.JOBS_MAX_UPLOAD_MB * 1024 * 1024
+    size = 0
+    try:
+        with open(path, "wb") as upload:
+            async for chunk in request.stream():
+                size += len(chunk)
+                if size > limit:
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds {Config.JOBS_MAX_UPLOAD_MB:.0f} MB.")
+                # Disk writes off the event loop: a large upload must not stall live sessions
+                await run_in_threadpool(upload.write, chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="The request body is empty.")
+    except Exception:
+        os.remove(path)
+        raise
+
+    diarization_config = {
+        key: value for key, value in
+        (("num_speakers", num_speakers), ("min_speakers", min_speakers), ("max_speakers", max_speakers))
+        if value is not None
+    }
+    if diarization_config and num_speakers is None:
+        # Let the bounds decide instead of the pipeline's default of two speakers
+        diarization_config["num_speakers"] = None
+    params = {"language": language, "diarization_config": diarization_config}
+    job_id = job_queue.submit(path, filename, params, priority)
+    logger.info(f"Received {size / 1024 / 1024:.1f} MB upload for job {job_id}.")
+    return {"id": job_id, "status": "queued"}
+
+@router.get("/jobs")
+async def list_jobs(limit: int = 50):
+    return job_queue.list(limit)
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-sent progress events until the job completes or fails."""
+    if job_queue.get(job_id, with_result=False) is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+
+    async def stream():
+        events = job_queue.subscribe(job_id)
+        try:
+            # Subscribe before reading the state so no transition is missed
+            job = job_queue.get(job_id, with_result=False)
+            yield f"data: {json.dumps({key: job[key] for key in ('status', 'progress', 'stage')})}\n\n"
+            status = job["status"]
+            while status not in TERMINAL_STATES:
+                event = await events.get()
+                status = event["status"]
+                yield f"data: {json.dumps(event)}\n\n"
+        finally:
+            job_queue.unsubscribe(job_id, events)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
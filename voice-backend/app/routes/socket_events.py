@@ -6,19 +6,29 @@ import asyncio
 import socketio
 import torch
 from fastapi import APIRouter
-import tempfile
+from fastapi.responses import JSONResponse, PlainTextResponse
 import logging
-import subprocess
-import io
 import concurrent.futures
 
-from app.services.audio_processor import AudioProcessor
+from app.services.audio_processor import AudioProcessor, StreamingResampler, StreamingNoiseReducer, VoiceActivityDetector, TARGET_SAMPLE_RATE
 from app.services.transcription_service import TranscriptionService
-from app.services.diarization_service import DiarizationService
+from app.services.diarization_service import DiarizationService, SpeakerRegistry
+from app.services.inference_scheduler import InferenceScheduler
+from app.services.session_store import SessionAudioStore
+from app.services.wire_protocol import StreamFormat, FrameAssembler, decode_frame
+from app.services.result_cache import ResultCache, cache_key
+from app.services.worker_pool import InferencePool, RemoteWhisperModels, RemoteDiarizationPipeline, RemoteCombiner
+from app.services.transcript_assembler import TranscriptAssembler, words_from_segments
+from app.services.admission_controller import AdmissionController, AdmissionRejected
+from app.models.model_registry import ModelRegistry
+from app.models.inference_engine import configure_threads
 from app.models.whisper_model import WhisperModels
 from app.models.diarization_pipeline import DiarizationPipeline
-from app.utils.ffmpeg_wrapper import convert_pcm_to_wav
 from app.models.transcript_combiner import TranscriptCombiner
+from app.models.feature_store import HOP_LENGTH
+from app.utils.text_utils import dedupe_overlap
+from app.utils import metrics
+from app.config import Config
 
 
 router = APIRouter()
@@ -33,40 +43,205 @@ origins = [
 # Initialize services
 sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins=origins)
 device = "cuda" if torch.cuda.is_available() else "cpu"
-whisper_models = WhisperModels(device=device)
-transcription_service = TranscriptionService(whisper_models=whisper_models)
-diarization_pipeline = DiarizationPipeline(device=device)
-diarization_service = DiarizationService(diarization_pipeline=diarization_pipeline)
-combiner = TranscriptCombiner(device="cuda" if torch.cuda.is_available() else "cpu")
+configure_threads()
+# Models load on first use or in the startup warm-up, never at import
+model_registry = ModelRegistry(budget_mb=Config.MODEL_MEMORY_BUDGET_MB)
+whisper_models = WhisperModels(device=device, registry=model_registry)
+diarization_pipeline = DiarizationPipeline(device=device, registry=model_registry)
+combiner = TranscriptCombiner(registry=model_registry, device="cuda" if torch.cuda.is_available() else "cpu")
+STREAMING_MODEL = Config.STREAMING_WHISPER_MODEL or whisper_models.fastest_model()
+PRELOAD_MODELS = Config.MODEL_PRELOAD or [whisper_models.key(STREAMING_MODEL), DiarizationPipeline.REGISTRY_KEY]
+inference_pool = None
+if Config.INFERENCE_MODE == "process":
+    # Worker processes own the models; the local objects only supply names and settings
+    inference_pool = InferencePool(Config.WORKERS_PER_MODEL, PRELOAD_MODELS, STREAMING_MODEL)
+    whisper_models = RemoteWhisperModels(inference_pool, whisper_models)
+    diarization_pipeline = RemoteDiarizationPipeline(inference_pool, diarization_pipeline)
+    combiner = RemoteCombiner(inference_pool, combiner)
+else:
+    # Used every few seconds by every live session, so never evicted
+    model_registry.pin(whisper_models.key(STREAMING_MODEL))
+    if Config.WHISPER_BATCHED_INFERENCE:
+        whisper_models.scheduler = InferenceScheduler(
+            whisper_models,
+            max_batch_size=Config.INFERENCE_MAX_BATCH_SIZE,
+            max_wait_ms=Config.INFERENCE_MAX_WAIT_MS
+        )
+# Repeat work on identical audio or text becomes a lookup
+result_cache = ResultCache()
+transcription_service = TranscriptionService(whisper_models=whisper_models, cache=result_cache)
+diarization_service = DiarizationService(diarization_pipeline=diarization_pipeline, cache=result_cache)
 audio_processor = AudioProcessor()
+session_store = SessionAudioStore()
+voice_activity_detector = VoiceActivityDetector()
 
 # Safely fetch and convert environment variables to integers
 MAX_THREADS_FOR_PROCESSING = int(os.getenv("MAX_THREADS_FOR_PROCESSING", 5))
-BUFFER_FLUSH_INTERVAL = int(os.getenv("BUFFER_FLUSH_INTERVAL", 10))
-OVERLAP_DURATION = int(os.getenv("OVERLAP_DURATION", 2)) 
+BUFFER_FLUSH_INTERVAL = Config.BUFFER_FLUSH_INTERVAL
+OVERLAP_DURATION = Config.OVERLAP_DURATION
+MIN_PARTIAL_DURATION = 1  # seconds of new audio required before a partial flush
 
 executor = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_THREADS_FOR_PROCESSING)
+# One recording per processing thread; the rest queue, shortest first, or are degraded to meet the SLO
+admission_controller = AdmissionController(
+    whisper_models.model_names, whisper_models.priority, slots=MAX_THREADS_FOR_PROCESSING
+)
 
-# Store raw PCM data per session
+# Per-session state; the audio itself lives in the session store
 audio_buffers = {}
 buffer_locks = {}
 
+def loaded_model_mb():
+    if inference_pool is not None:
+        # The gateway's registry never loads anything; the workers report theirs
+        return {(name,): size_mb for name, size_mb in inference_pool.model_memory_mb().items()}
+    models = model_registry.status()["models"]
+    return {(name,): model["size_mb"] for name, model in models.items() if model["state"] == "loaded"}
+
+# Counted by run_stage as stages are submitted and picked up
+EXECUTOR_QUEUE_DEPTH = metrics.Gauge("executor_queue_depth", "Stages waiting for a processing thread.")
+EXECUTOR_QUEUE_DEPTH.set(0)
+# Read at scrape time
+metrics.Gauge("admission_waiting", "Recordings waiting for admission.", function=lambda: len(admission_controller.waiting))
+metrics.Gauge("active_sessions", "Connected sessions with audio state.", function=lambda: len(audio_buffers))
+metrics.Gauge("session_audio_bytes", "Recorded audio held by live sessions.", ("location",),
+              function=lambda: {(location,): session_store.stats()[f"{location}_bytes"] for location in ("memory", "disk")})
+metrics.Gauge("model_memory_mb", "Estimated memory of each loaded model, summed over inference processes.", ("model",),
+              function=loaded_model_mb)
+
+async def run_stage(sid, name, func, *args, pool=executor):
+    """
+    Run `func(*args)` on `pool` as pipeline stage `name`, recording how long it
+    waited for a thread and how long it ran.
+    """
+    submitted = time.perf_counter()
+    counted = pool is executor
+
+    def timed():
+        if counted:
+            EXECUTOR_QUEUE_DEPTH.dec()
+        metrics.EXECUTOR_WAIT_SECONDS.observe(time.perf_counter() - submitted, stage=name)
+        with metrics.stage(name, sid):
+            return func(*args)
+
+    if not counted:
+        return await asyncio.get_event_loop().run_in_executor(pool, timed)
+    EXECUTOR_QUEUE_DEPTH.inc()
+    future = executor.submit(timed)
+    # A stage cancelled before a thread picked it up never runs `timed`
+    future.add_done_callback(lambda done: EXECUTOR_QUEUE_DEPTH.dec() if done.cancelled() else None)
+    return await asyncio.wrap_future(future)
+
+def new_audio_buffer(sid, sample_rate=None):
+    return {
+        # 16 kHz mono PCM, resampled from the client's `sample_rate` as chunks arrive
+        "audio": session_store.create(sid),
+        # Last backpressure state sent to the client
+        "backpressure": "ok",
+        # Framed protocol: negotiated format and reorder buffer, set by audio_start
+        "stream": None,
+        "frames": None,
+        "sample_rate": sample_rate,
+        "resampler": StreamingResampler(sample_rate) if sample_rate else None,
+        # Per-session noise profile and spectral-gate state; None when disabled or shed under load
+        "noise_reduction": Config.NOISE_REDUCTION,
+        "denoiser": StreamingNoiseReducer() if Config.NOISE_REDUCTION else None,
+        # Streaming state: samples already covered by partial transcripts and the words
+        # of the last partial, used to de-duplicate the overlap at the next seam.
+        "flushed_samples": 0,
+        "partial_words": [],
+        # Batched decoding: (recording, LogMelFeatures) extended with the new audio at each flush
+        "features": None,
+        # Lowest noise floor seen by the VAD; short windows cannot estimate it alone
+        "noise_floor_db": None,
+        # Session-wide speaker centroids that keep streaming speaker labels stable
+        "speaker_registry": SpeakerRegistry()
+    }
+
+@router.on_event("startup")
+async def warm_up_models():
+    if inference_pool is not None:
+        # Each worker loads and warms up its own models
+        inference_pool.start()
+        return
+    # Load in the background so the server accepts connections immediately
+    asyncio.get_event_loop().run_in_executor(None, model_registry.warm_up, PRELOAD_MODELS)
+    logger.info(f"Warming up models in the background: {PRELOAD_MODELS}")
+
+@router.on_event("shutdown")
+async def stop_inference_workers():
+    if inference_pool is not None:
+        inference_pool.shutdown()
+
+@router.get("/healthz")
+async def healthz():
+    return {"status": "ok"}
+
+@router.get("/readyz")
+async def readyz():
+    if inference_pool is not None:
+        ready = inference_pool.is_ready()
+        status = inference_pool.stats()
+    else:
+        ready = model_registry.is_ready(PRELOAD_MODELS)
+        status = model_registry.status()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, **status}
+    )
+
+@router.get("/sessions/memory")
+async def sessions_memory():
+    return session_store.stats()
+
+@router.get("/cache/stats")
+async def cache_stats():
+    return result_cache.stats()
+
+@router.get("/admission/stats")
+async def admission_stats():
+    return admission_controller.stats()
+
+@router.get("/inference/workers")
+async def inference_workers():
+    if inference_pool is None:
+        return {"mode": Config.INFERENCE_MODE}
+    return {"mode": Config.INFERENCE_MODE, **inference_pool.stats()}
+
+@router.get("/metrics")
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/traces/{sid}")
+async def session_trace(sid: str):
+    spans = metrics.tracer.spans(sid)
+    if not spans:
+        return JSONResponse(status_code=404, content={"error": "No trace for this session; is TRACING_ENABLED set?"})
+    return {"sid": sid, "spans": spans}
+
+@router.get("/inference/stats")
+async def inference_stats():
+    if whisper_models.scheduler is None:
+        return {"enabled": False}
+    return {"enabled": True, **whisper_models.scheduler.stats()}
+
 @sio.event
 async def connect(sid, environ):
     logger.info(f"Client connected: {sid}")
-    audio_buffers[sid] = {
-        "data": bytearray(),
-        "sample_rate": None
-    }
+    audio_buffers[sid] = new_audio_buffer(sid)
     buffer_locks[sid] = asyncio.Lock()
-    # asyncio.create_task(flush_buffer_periodically(sid))
+    if Config.STREAMING_TRANSCRIPTION:
+        asyncio.create_task(flush_buffer_periodically(sid))
 
 @sio.event
 async def disconnect(sid):
     logger.info(f"Client disconnected: {sid}")
-    if sid in audio_buffers and audio_buffers[sid]["data"]:
-        await process_audio(sid, bytes(audio_buffers[sid]["data"]), audio_buffers[sid]["sample_rate"])
+    if sid in audio_buffers and len(audio_buffers[sid]["audio"]):
+        await process_audio(sid, await detach_recording(sid))
     if sid in audio_buffers:
+        if "rejected_recording" in audio_buffers[sid]:
+            audio_buffers[sid]["rejected_recording"].close()
+        audio_buffers[sid]["audio"].close()
         del audio_buffers[sid]
     if sid in buffer_locks:
         del buffer_locks[sid]
@@ -78,121 +253,489 @@ async def diarization_config(sid, config):
     E.g., store in a dictionary keyed by `sid`.
     """
     if sid not in audio_buffers:
-        audio_buffers[sid] = {"data": bytearray(), "sample_rate": None}
+        audio_buffers[sid] = new_audio_buffer(sid)
     # Let's store this config as well:
     audio_buffers[sid]["diarization_config"] = config
     logger.info(f"Received diarization config for sid {sid}: {config}")
     
+@sio.event
+async def processing_config(sid, config):
+    """
+    Per-session audio processing options, e.g. {"noise_reduction": false}.
+    Takes effect from the next received chunk.
+    """
+    if sid not in audio_buffers:
+        audio_buffers[sid] = new_audio_buffer(sid)
+    if sid not in buffer_locks:
+        buffer_locks[sid] = asyncio.Lock()
+    async with buffer_locks[sid]:
+        buffer_info = audio_buffers[sid]
+        if "noise_reduction" in config:
+            buffer_info["noise_reduction"] = bool(config["noise_reduction"])
+            set_denoiser(buffer_info, buffer_info["noise_reduction"])
+    logger.info(f"Received processing config for sid {sid}: {config}")
+
+@sio.event
+async def rediarize(sid, config):
+    """
+    Re-run diarization of the last processed recording with a new config. The
+    cached segmentation and embeddings make this a clustering-only pass. Labels
+    come from the session's speaker registry, as in the final transcript, and the
+    utterances are re-assembled with them.
+    """
+    try:
+        buffer_info = audio_buffers.get(sid)
+        if buffer_info is None or buffer_info.get("last_waveform") is None:
+            await sio.emit('error', {'message': 'No processed recording to re-diarize.'}, to=sid)
+            return
+        buffer_info["diarization_config"] = config
+        registry = buffer_info["speaker_registry"] if Config.STREAMING_DIARIZATION else None
+        speakers = await run_stage(
+            sid, "rediarization", diarization_service.diarize_audio, buffer_info["last_waveform"], config, registry
+        )
+        if buffer_info.get("last_timeline") is not None:
+            buffer_info["last_timeline"].map_turns(speakers)
+        await sio.emit('speakers', speakers, to=sid)
+        with metrics.stage("assembly", sid):
+            utterances = assemble_utterances(buffer_info.get("last_segments", []), speakers)
+        await sio.emit('utterances', utterances, to=sid)
+        logger.info(f"Re-diarization completed for sid {sid} with config {config}.")
+    except Exception as e:
+        logger.error(f"Error re-diarizing audio for sid {sid}: {e}")
+        await sio.emit('error', {'message': str(e)}, to=sid)
+
 @sio.event
 async def combine_transcripts(sid, data):
     try:
         real_time = data.get('realTimeTranscript', '')
         whisper = data.get('whisperTranscript', '')
+        # Optional per-request override of COMBINER_MODE ("llm" or "align")
+        mode = data.get('mode')
+        tier = "full"
+        if admission_controller.shedding and (mode or combiner.mode) == "llm":
+            # The LLM merge is optional; under load the word alignment alone is used
+            mode = "align"
+            tier = "minimal"
+
+        key = cache_key("combiner", real_time, whisper, mode or combiner.mode, combiner.engine.name,
+                        combiner.window_words, combiner.num_beams)
 
         # Run the transcript combination in an executor to prevent blocking the event loop.
-        result = await asyncio.get_event_loop().run_in_executor(
-            None, combiner.combine_transcripts, real_time, whisper
+        result = await run_stage(
+            sid, "combiner", result_cache.get_or_compute, key,
+            lambda: combiner.combine_transcripts(real_time, whisper, mode), pool=None
         )
 
         await sio.emit('final_combined_transcript', {
-            'transcript': result['text']
+            'transcript': result['text'],
+            'quality': {'tier': tier, 'mode': mode or combiner.mode}
         }, to=sid)
 
     except Exception as e:
         logger.error(f"Error combining transcripts for sid {sid}: {e}")
         await sio.emit('error', {'message': str(e)}, to=sid)
 
+@sio.event
+async def audio_start(sid, params):
+    """
+    Negotiate the framed audio protocol for this session: protocol version,
+    codec and sample rate are sent once here instead of with every chunk. The
+    return value is the Socket.IO acknowledgement.
+    """
+    try:
+        stream = StreamFormat.negotiate(params)
+    except ValueError as e:
+        logger.warning(f"Rejected audio_start from sid {sid}: {e}")
+        return {"accepted": False, "error": str(e)}
+    if sid not in audio_buffers:
+        audio_buffers[sid] = new_audio_buffer(sid)
+    if sid not in buffer_locks:
+        buffer_locks[sid] = asyncio.Lock()
+    async with buffer_locks[sid]:
+        buffer_info = audio_buffers[sid]
+        if buffer_info["frames"] is not None:
+            for chunk in buffer_info["frames"].flush():
+                append_pcm(buffer_info, buffer_info["stream"].sample_rate, chunk)
+        buffer_info["stream"] = stream
+        buffer_info["frames"] = FrameAssembler()
+    logger.info(f"Audio stream for sid {sid}: {stream.describe()}")
+    return {"accepted": True, **stream.describe()}
+
+@sio.event
+async def audio_frame(sid, data):
+    """One binary frame of the protocol negotiated by audio_start (see app/services/wire_protocol.py)."""
+    try:
+        buffer_info = audio_buffers.get(sid)
+        if buffer_info is None or buffer_info["stream"] is None:
+            await sio.emit('error', {'message': 'audio_frame received before audio_start.'}, to=sid)
+            return
+        frame = decode_frame(data, buffer_info["stream"])
+        async with buffer_locks[sid]:
+            # Frames land at their sample offset; duplicates are dropped and late ones reordered
+            state, reason = session_store.pressure(buffer_info["audio"])
+            for chunk in buffer_info["frames"].push(frame):
+                if state != "stop":
+                    append_pcm(buffer_info, buffer_info["stream"].sample_rate, chunk)
+            changed = state != buffer_info["backpressure"]
+            buffer_info["backpressure"] = state
+        if changed:
+            await emit_backpressure(sid, state, reason)
+    except Exception as e:
+        logger.error(f"Error receiving audio frame: {e}")
+        await sio.emit('error', {'message': 'Failed to receive audio frame.'}, to=sid)
+
+def set_denoiser(buffer_info, enabled):
+    """Start or stop the session's denoiser. Caller holds the lock."""
+    if enabled and buffer_info["denoiser"] is None:
+        buffer_info["denoiser"] = StreamingNoiseReducer()
+    elif not enabled and buffer_info["denoiser"] is not None:
+        # Release the samples the denoiser still holds before dropping it
+        buffer_info["audio"].append(audio_processor.float_to_pcm(buffer_info["denoiser"].flush()))
+        buffer_info["denoiser"] = None
+
+def append_pcm(buffer_info, sample_rate, pcm):
+    """Resample/denoise 16-bit PCM at `sample_rate` and append it to the session recording. Caller holds the lock."""
+    # Noise reduction is optional: it pauses while the processing backlog exceeds the SLO
+    set_denoiser(buffer_info, buffer_info["noise_reduction"] and not admission_controller.shedding)
+    if buffer_info["resampler"] is None or buffer_info["sample_rate"] != sample_rate:
+        if buffer_info["resampler"] is not None:
+            buffer_info["audio"].append(audio_processor.float_to_pcm(buffer_info["resampler"].flush()))
+        buffer_info["sample_rate"] = sample_rate
+        buffer_info["resampler"] = StreamingResampler(sample_rate)
+    buffer_info["audio"].append(audio_processor.ingest_chunk(
+        buffer_info["resampler"], buffer_info["denoiser"], pcm
+    ))
+
+async def emit_backpressure(sid, state, reason):
+    # "throttle": near a cap, "stop": chunks are being dropped, "ok": back to normal
+    await sio.emit('backpressure', {
+        'state': state,
+        'reason': reason,
+        'recorded_seconds': round(audio_buffers[sid]["audio"].seconds, 1)
+    }, to=sid)
+    logger.warning(f"Backpressure for sid {sid}: {state} ({reason}).")
+
 @sio.event
 async def audio_data(sid, *args):
+    """Unframed chunks from older clients: (sample_rate, 16-bit PCM)."""
     try:
         sample_rate, audio_chunk = args
 
         if sid not in audio_buffers:
-            audio_buffers[sid] = {
-                "data": bytearray(),
-                "sample_rate": sample_rate
-            }
+            audio_buffers[sid] = new_audio_buffer(sid, sample_rate)
+        if sid not in buffer_locks:
             buffer_locks[sid] = asyncio.Lock()
 
         async with buffer_locks[sid]:
-            if audio_buffers[sid]["sample_rate"] is None:
-                audio_buffers[sid]["sample_rate"] = sample_rate
-            audio_buffers[sid]["data"] += audio_chunk
+            buffer_info = audio_buffers[sid]
+            state, reason = session_store.pressure(buffer_info["audio"])
+            if state != "stop":
+                append_pcm(buffer_info, sample_rate, audio_chunk)
+            changed = state != buffer_info["backpressure"]
+            buffer_info["backpressure"] = state
+
+        if changed:
+            await emit_backpressure(sid, state, reason)
     except Exception as e:
         logger.error(f"Error receiving audio data: {e}")
         await sio.emit('error', {'message': 'Failed to receive audio data.'}, to=sid)
-        
+
 @sio.event
 async def stop_recording(sid):
     try:
         if sid in audio_buffers:
-            buffer_info = audio_buffers[sid]
-            audio_bytes = bytes(buffer_info["data"])
-            sample_rate = buffer_info["sample_rate"]
-            await process_audio(sid, audio_bytes, sample_rate)
-            audio_buffers[sid]["data"] = bytearray()
+            recording = await detach_recording(sid)
+            # A recording rejected under load is retried by the next stop_recording, together
+            # with anything recorded since: one transcript, and nothing left in the buffer
+            rejected = audio_buffers[sid].pop("rejected_recording", None)
+            if rejected is not None:
+                recording = merge_recordings(rejected, recording)
+            await process_audio(sid, recording)
     except Exception as e:
         logger.error(f"Error processing final audio: {e}")
         await sio.emit('error', {'message': str(e)}, to=sid)
 
 
-async def process_audio(sid, audio_bytes, sample_rate):
-    wav_path = None
-    start_time = time.time()
-    try:
-        diarization_config = audio_buffers[sid].get("diarization_config", {})
-        # Noise reduction
-        denoised_bytes = await asyncio.get_event_loop().run_in_executor(
-            executor, audio_processor.reduce_noise, audio_bytes
-        )
-        logger.info(f"Noise reduction completed for sid {sid}.")
+def merge_recordings(first, second):
+    """Append `second` to `first` and close it; returns `first`."""
+    for piece in second.pieces():
+        first.append(piece)
+    second.close()
+    return first
 
-        # Convert PCM to WAV with the correct sample rate
-        wav_data = await asyncio.get_event_loop().run_in_executor(
-            executor, convert_pcm_to_wav, denoised_bytes, sample_rate
-        )
-        logger.info(f"PCM to WAV conversion completed for sid {sid}.")
 
-        # Save WAV to a temporary file
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_wav:
-            tmp_wav.write(wav_data)
-            wav_path = tmp_wav.name
-        logger.info(f"Temporary WAV file created at {wav_path} for sid {sid}.")
+async def detach_recording(sid):
+    """
+    Hand the session's recording over for processing without copying it; new audio
+    goes to a fresh recording, and the caller closes the returned one. Frames still
+    waiting for reordering and the tails held back by the resampler's filter delay
+    and the denoiser's overlap-add are appended first; the noise profile is kept.
+    """
+    buffer_info = audio_buffers[sid]
+    async with buffer_locks[sid]:
+        recording = buffer_info["audio"]
+        if buffer_info["frames"] is not None:
+            for chunk in buffer_info["frames"].flush():
+                append_pcm(buffer_info, buffer_info["stream"].sample_rate, chunk)
+            logger.info(f"Audio frames for sid {sid}: {buffer_info['frames'].stats()}")
+        if buffer_info["resampler"] is not None:
+            recording.append(audio_processor.flush_ingest(buffer_info["resampler"], buffer_info["denoiser"]))
+        buffer_info["audio"] = session_store.create(sid)
+        buffer_info["flushed_samples"] = 0
+        buffer_info["partial_words"] = []
+        buffer_info["features"] = None
+    return recording
+
 
-        # Transcription
-        transcription_text = await asyncio.get_event_loop().run_in_executor(
-            executor, transcription_service.transcribe_audio, wav_path
+async def flush_buffer_periodically(sid):
+    while sid in audio_buffers:
+        await asyncio.sleep(BUFFER_FLUSH_INTERVAL)
+        if sid not in audio_buffers:
+            break
+        try:
+            await flush_partial(sid)
+        except Exception as e:
+            logger.error(f"Error flushing partial transcription for sid {sid}: {e}")
+    logger.info(f"Stopped periodic flushing for sid {sid}.")
+
+
+async def flush_partial(sid):
+    """
+    Transcribe the audio received since the last flush plus an overlap tail of
+    already-flushed audio, and emit only the words that are new at the seam.
+    The new audio alone is diarized against the session's speaker registry.
+    """
+    buffer_info = audio_buffers.get(sid)
+    lock = buffer_locks.get(sid)
+    if buffer_info is None or lock is None:
+        return
+
+    async with lock:
+        end = len(buffer_info["audio"])
+        flushed = buffer_info["flushed_samples"]
+        if end - flushed < MIN_PARTIAL_DURATION * TARGET_SAMPLE_RATE:
+            return
+        start = max(0, flushed - OVERLAP_DURATION * TARGET_SAMPLE_RATE)
+        # Views stay valid after later appends: the store never overwrites stored samples
+        recording = buffer_info["audio"]
+        samples = recording.read(start, end)
+        buffer_info["flushed_samples"] = end
+        previous_words = buffer_info["partial_words"] if start > 0 else []
+
+    tasks = [flush_transcription(sid, recording, samples, start, flushed, previous_words)]
+    if Config.STREAMING_DIARIZATION:
+        tasks.append(flush_speakers(sid, samples[flushed - start:], flushed / TARGET_SAMPLE_RATE))
+    await asyncio.gather(*tasks)
+
+
+def detect_speech(buffer_info, waveform):
+    timeline = voice_activity_detector.detect(waveform, noise_floor_db=buffer_info["noise_floor_db"])
+    buffer_info["noise_floor_db"] = timeline.noise_floor_db
+    return timeline
+
+
+async def flush_transcription(sid, recording, samples, start, flushed, previous_words):
+    buffer_info = audio_buffers.get(sid)
+    if buffer_info is None:
+        return
+    waveform = audio_processor.pcm_to_waveform(samples)
+    has_speech = True
+    if Config.VAD_ENABLED:
+        timeline = detect_speech(buffer_info, waveform)
+        has_speech = timeline.has_speech
+    if batched_partials():
+        # The session's log-mel frames are extended with the new audio even without speech
+        text = await run_stage(
+            sid, "partial_transcription", transcribe_partial, sid, recording, waveform, start, flushed, has_speech
         )
-        logger.info(f"Transcription completed for sid {sid}: {transcription_text}")
+    elif has_speech:
+        if Config.VAD_ENABLED:
+            waveform = timeline.compact(waveform)
+        text = await run_stage(sid, "partial_transcription", transcribe_waveform, waveform, [STREAMING_MODEL])
+    else:
+        text = None
+    # The client may have disconnected while the model ran
+    if text is None or sid not in audio_buffers:
+        return
+    words = text.split()
+    new_words = dedupe_overlap(previous_words, words)
+    buffer_info["partial_words"] = words
+
+    if new_words:
+        await sio.emit('transcription_partial', {"text": " ".join(new_words)}, to=sid)
+        logger.info(f"Emitted partial transcription of {len(new_words)} words to {sid}.")
+
 
-        # # Diarization
-        # speakers = []
-        speakers = await asyncio.get_event_loop().run_in_executor(
-            executor, diarization_service.diarize_audio, wav_path, diarization_config
+async def flush_speakers(sid, samples, offset):
+    buffer_info = audio_buffers.get(sid)
+    if buffer_info is None:
+        return
+    waveform = audio_processor.pcm_to_waveform(samples)
+    timeline = None
+    if Config.VAD_ENABLED:
+        timeline = detect_speech(buffer_info, waveform)
+        if not timeline.has_speech:
+            return
+        waveform = timeline.compact(waveform)
+    speakers = await run_stage(
+        sid, "partial_diarization", diarization_service.diarize_window, waveform,
+        buffer_info.get("diarization_config", {}), buffer_info["speaker_registry"], 0.0
+    )
+    if sid not in audio_buffers:
+        return
+    if timeline is not None:
+        timeline.map_turns(speakers)
+    for turn in speakers:
+        turn["start"] += offset
+        turn["end"] += offset
+    if speakers:
+        await sio.emit('speakers', {"segments": speakers, "append": True}, to=sid)
+        logger.info(f"Emitted {len(speakers)} streaming speaker segments to {sid}.")
+
+
+def batched_partials():
+    return whisper_models.scheduler is not None and whisper_models.engines[STREAMING_MODEL].batched_decode
+
+
+def transcribe_partial(sid, recording, waveform, start, flushed, has_speech):
+    """
+    Add the audio new since the last flush to the session's log-mel frames and, when
+    there is speech, decode the partial window from them. Only the new audio is
+    transformed; the overlap re-read at each seam reuses its frames. A partial
+    window fits one 30 s decode window, so silence is not cut out first.
+    """
+    buffer_info = audio_buffers.get(sid)
+    if buffer_info is None:
+        return None
+    source, features = buffer_info["features"] or (None, None)
+    if (source is not recording or features.end_sample != flushed
+            or (start - features.origin) // HOP_LENGTH < features.first):
+        # A new recording, or frames this window needs were dropped: start from the window
+        features = whisper_models.streaming_features(
+            STREAMING_MODEL, origin=start, keep_seconds=2 * (BUFFER_FLUSH_INTERVAL + OVERLAP_DURATION)
         )
-        logger.info(f"Diarization completed for sid {sid}.")
+        features.append(waveform)
+    else:
+        features.append(waveform[flushed - start:])
+    buffer_info["features"] = (recording, features)
+    if not has_speech:
+        return None
+    segments = whisper_models.decode_features(
+        STREAMING_MODEL, features, (start - features.origin) // HOP_LENGTH, features.frames, Config.LANGUAGE
+    )
+    return "".join(segment["text"] for segment in segments).strip()
+
+
+def assemble_utterances(segments, speakers):
+    assembler = TranscriptAssembler()
+    assembler.add_words(words_from_segments(segments))
+    assembler.add_turns(speakers)
+    return assembler.utterances()
+
+
+def transcribe_waveform(waveform, model_names=None):
+    return transcription_service.transcribe_audio(
+        waveform, Config.LANGUAGE, model_names=model_names, word_timestamps=False, cache=False
+    )['text']
+
+
+async def process_audio(sid, recording):
+    start_time = time.time()
+    try:
+        ticket = await admission_controller.admit(recording.seconds)
+    except AdmissionRejected as e:
+        # Kept for a retry; a disconnected session has nowhere to keep it
+        if sid in audio_buffers and "rejected_recording" not in audio_buffers[sid]:
+            audio_buffers[sid]["rejected_recording"] = recording
+        else:
+            recording.close()
+        await sio.emit('processing_rejected', {'message': str(e), 'retry_after': round(e.retry_after)}, to=sid)
+        return
+    tier = ticket.tier
+    completed = False
+    try:
+        # Held across the awaits: the session may disconnect and be removed meanwhile
+        buffer_info = audio_buffers.get(sid)
+        if buffer_info is None:
+            recording.close()
+            return
+        diarization_config = buffer_info.get("diarization_config", {})
+        # One shared 16 kHz float32 waveform feeds every stage
+        try:
+            waveform = await run_stage(sid, "pcm_to_waveform", recording.waveform)
+        finally:
+            recording.close()
+        metrics.AUDIO_SECONDS.inc(len(waveform) / TARGET_SAMPLE_RATE)
+        logger.info(f"PCM to waveform conversion completed for sid {sid}.")
+
+        # Voice activity detection: later stages only see the speech regions
+        timeline = None
+        vad_report = None
+        if Config.VAD_ENABLED:
+            timeline = await run_stage(sid, "vad", voice_activity_detector.detect, waveform)
+            vad_report = {
+                "speech_seconds": timeline.speech_samples / TARGET_SAMPLE_RATE,
+                "skipped_percent": round(timeline.skipped_percent, 1)
+            }
+            logger.info(f"VAD skipped {vad_report['skipped_percent']}% of the audio for sid {sid}.")
+            waveform = timeline.compact(waveform)
+
+        # Keep the prepared audio so the session can re-diarize with new parameters
+        buffer_info["last_waveform"] = waveform
+        buffer_info["last_timeline"] = timeline
+
+        if timeline is not None and not timeline.has_speech:
+            transcription = {"text": "", "segments": []}
+            speakers = []
+        else:
+            # Transcription
+            # Degraded tiers cap the models; the minimal tier also skips word timestamps
+            transcription = await run_stage(
+                sid, "transcription", transcription_service.transcribe_audio, waveform, Config.LANGUAGE, tier["models"],
+                tier["optional_stages"]
+            )
+            logger.info(f"Transcription completed for sid {sid}: {len(transcription['segments'])} segments.")
+
+            # # Diarization
+            # speakers = []
+            registry = buffer_info["speaker_registry"] if Config.STREAMING_DIARIZATION else None
+            speakers = await run_stage(
+                sid, "diarization", diarization_service.diarize_audio, waveform, diarization_config, registry
+            )
+            logger.info(f"Diarization completed for sid {sid}.")
+
+            if timeline is not None:
+                timeline.map_segments(transcription["segments"])
+                timeline.map_turns(speakers)
+
+        # Kept with the waveform so re-diarization can re-assemble the utterances
+        buffer_info["last_segments"] = transcription["segments"]
+
+        # Speaker-attributed utterances
+        with metrics.stage("assembly", sid):
+            utterances = assemble_utterances(transcription["segments"], speakers)
+        logger.info(f"Assembled {len(utterances)} utterances for sid {sid}.")
 
         # Emit results back to client
         await sio.emit('transcription', {
-            "transcription": transcription_text,
-            "speakers": speakers
+            "transcription": transcription["text"],
+            "segments": transcription["segments"],
+            "speakers": speakers,
+            "utterances": utterances,
+            "vad": vad_report,
+            "quality": ticket.report()
         }, to=sid)
         logger.info(f"Emitted transcription and speaker data to {sid}.")
 
         processing_time = time.time() - start_time
+        metrics.STAGE_SECONDS.observe(processing_time, stage="total")
+        metrics.tracer.record(sid, "total", start_time, processing_time)
+        completed = True
         logger.info(f"Audio processing for sid {sid} completed in {processing_time:.2f} seconds.")
 
-    except subprocess.CalledProcessError as e:
-        logger.error(f"FFmpeg conversion failed for sid {sid}: {e.stderr.decode()}")
-        await sio.emit('error', {'message': 'Audio format conversion failed.'}, to=sid)
     except Exception as e:
         logger.error(f"Error processing audio for sid {sid}: {e}")
         await sio.emit('error', {'message': str(e)}, to=sid)
     finally:
-        if wav_path and os.path.exists(wav_path):
-            try:
-                os.remove(wav_path)
-                logger.info(f"Temporary file {wav_path} removed.")
-            except Exception as e:
-                logger.error(f"Failed to remove temporary file {wav_path}: {e}")
-
+        # Failed jobs say nothing about the real-time factor
+        admission_controller.release(ticket, completed)
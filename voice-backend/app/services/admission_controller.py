@@ -0,0 +1,199 @@
+# app/services/admission_controller.py
+
+import sys
+import time
+import heapq
+import asyncio
+import logging
+import itertools
+from app.config import Config
+from app.utils.metrics import ADMISSION_DECISIONS
+
+logger = logging.getLogger(__name__)
+
+class AdmissionRejected(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"Server is at capacity; retry in about {retry_after:.0f}s.")
+        self.retry_after = retry_after
+
+class Ticket:
+    def __init__(self, audio_seconds: float, tier: dict, cost: float, key: float, projected_wait: float):
+        self.audio_seconds = audio_seconds
+        self.tier = tier
+        self.cost = cost  # estimated processing seconds at this tier
+        self.key = key
+        self.projected_wait = projected_wait
+        self.enqueued_at = time.monotonic()
+        self.started_at = None
+        self.future = None
+
+    def report(self) -> dict:
+        """What the client is told about how its recording was processed."""
+        return {
+            "tier": self.tier["name"],
+            "models": self.tier["models"],
+            "optional_stages": self.tier["optional_stages"],
+            "queued_seconds": round((self.started_at or time.monotonic()) - self.enqueued_at, 2)
+        }
+
+class AdmissionController:
+    """
+    Admits recordings to the post-recording pipeline at most `slots` at a time,
+    keeping each job's projected latency within `slo_seconds`.
+
+    A job's cost is its audio duration times the measured real-time factor of
+    the largest Whisper model it may use (an EWMA over completed jobs, seeded from
+    `initial_rtf` scaled by model priority). Waiting jobs start in order of
+    arrival time plus cost, so short jobs go first but a long one is not starved.
+    The projected wait is the remaining cost of the running jobs plus the queued
+    jobs ahead, spread over the slots.
+
+    Each job gets the best quality tier whose wait plus cost fits the SLO: every
+    model ("full"), then the largest model dropped one at a time ("degraded"), then
+    the fastest model without word timestamps ("minimal"). A minimal job whose wait
+    alone exceeds `max_wait_seconds` is rejected with a retry-after hint. While the
+    backlog exceeds the SLO, `shedding` is set and sessions skip optional stages
+    (noise reduction, the LLM combiner) until it falls below half the SLO.
+
+    Batch jobs come in through `admit_background`: they take a slot like any
+    recording, so they never add to the processing threads or model calls live
+    sessions see, but always run at the lowest tier and wait behind every queued
+    recording.
+    """
+
+    def __init__(self, model_names: list, priority, slots: int, slo_seconds: float = Config.LATENCY_SLO_SECONDS,
+                 max_wait_seconds: float = Config.ADMISSION_MAX_WAIT_SECONDS, initial_rtf: float = Config.ADMISSION_INITIAL_RTF,
+                 alpha: float = 0.2, enabled: bool = Config.ADMISSION_CONTROL):
+        ordered = sorted(model_names, key=priority)
+        self.tiers = [{
+            "name": "full" if count == len(ordered) else "degraded",
+            "models": ordered[:count],
+            "optional_stages": True
+        } for count in range(len(ordered), 0, -1)]
+        self.tiers.append({"name": "minimal", "models": ordered[:1], "optional_stages": False})
+        # Job seconds per audio second, by the largest model a tier allows
+        largest = max(priority(ordered[-1]), 1)
+        self.rtf = {name: initial_rtf * max(priority(name), 1) / largest for name in ordered}
+        self.slots = slots
+        self.slo_seconds = slo_seconds
+        self.max_wait_seconds = max_wait_seconds
+        self.alpha = alpha
+        self.enabled = enabled
+        self.running = []
+        self.waiting = []  # heap of (key, sequence, ticket)
+        self.sequence = itertools.count()
+        self.shedding = False
+        self.rejected = 0
+
+    def estimate(self, tier: dict, audio_seconds: float) -> float:
+        return audio_seconds * self.rtf[tier["models"][-1]]
+
+    def projected_wait(self, key: float = float("inf")) -> float:
+        """Seconds until a job with ordering `key` would start."""
+        ahead = [ticket for queued_key, _, ticket in self.waiting if queued_key <= key]
+        if len(self.running) + len(ahead) < self.slots:
+            return 0.0
+        now = time.monotonic()
+        remaining = sum(max(ticket.cost - (now - ticket.started_at), 0.0) for ticket in self.running)
+        return (remaining + sum(ticket.cost for ticket in ahead)) / self.slots
+
+    async def admit(self, audio_seconds: float) -> Ticket:
+        """Wait for a slot; returns the ticket to `release` when the job is done."""
+        now = time.monotonic()
+        if not self.enabled:
+            tier = self.tiers[0]
+            ticket = Ticket(audio_seconds, tier, self.estimate(tier, audio_seconds), now, 0.0)
+            self._start(ticket)
+            return ticket
+
+        for tier in self.tiers:
+            cost = self.estimate(tier, audio_seconds)
+            wait = self.projected_wait(now + cost)
+            if wait + cost <= self.slo_seconds:
+                break
+        else:
+            if wait > self.max_wait_seconds:
+                self.rejected += 1
+                ADMISSION_DECISIONS.inc(tier="rejected")
+                logger.warning(f"Rejected {audio_seconds:.0f}s recording: projected wait {wait:.0f}s.")
+                raise AdmissionRejected(wait)
+
+        ticket = Ticket(audio_seconds, tier, cost, now + cost, wait)
+        ADMISSION_DECISIONS.inc(tier=tier["name"])
+        if tier["name"] != "full":
+            logger.info(f"Admitted {audio_seconds:.0f}s recording at tier '{tier['name']}' {tier['models']} "
+                        f"(projected wait {wait:.1f}s, cost {cost:.1f}s).")
+        await self._wait(ticket)
+        return ticket
+
+    async def admit_background(self, audio_seconds: float) -> Ticket:
+        """Like `admit` for a batch job: lowest tier, queued after every recording, never rejected."""
+        tier = self.tiers[-1] if self.enabled else self.tiers[0]
+        ticket = Ticket(audio_seconds, tier, self.estimate(tier, audio_seconds), float("inf"), self.projected_wait())
+        ADMISSION_DECISIONS.inc(tier="background")
+        if not self.enabled:
+            self._start(ticket)
+        else:
+            await self._wait(ticket)
+        return ticket
+
+    async def _wait(self, ticket: Ticket):
+        if len(self.running) < self.slots and not self.waiting:
+            self._start(ticket)
+        else:
+            ticket.future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self.waiting, (ticket.key, next(self.sequence), ticket))
+            self._update_shedding()
+            try:
+                await ticket.future
+            except asyncio.CancelledError:
+                if ticket.started_at is not None:
+                    self.release(ticket, completed=False)
+                else:
+                    self.waiting = [entry for entry in self.waiting if entry[2] is not ticket]
+                    heapq.heapify(self.waiting)
+                raise
+
+    def _start(self, ticket: Ticket):
+        ticket.started_at = time.monotonic()
+        self.running.append(ticket)
+        if ticket.future is not None and not ticket.future.done():
+            ticket.future.set_result(None)
+
+    def release(self, ticket: Ticket, completed: bool = True):
+        """Free the job's slot, learn from its duration and start the next waiting jobs."""
+        if ticket not in self.running:
+            return
+        self.running.remove(ticket)
+        elapsed = time.monotonic() - ticket.started_at
+        # Very short recordings are dominated by fixed costs and would skew the estimate
+        if completed and ticket.audio_seconds >= 1:
+            model = ticket.tier["models"][-1]
+            self.rtf[model] += self.alpha * (elapsed / ticket.audio_seconds - self.rtf[model])
+        while self.waiting and len(self.running) < self.slots:
+            _, _, next_ticket = heapq.heappop(self.waiting)
+            self._start(next_ticket)
+        self._update_shedding()
+
+    def _update_shedding(self):
+        # Queued batch jobs (key inf) are not backlog live recordings wait behind
+        backlog = self.projected_wait(sys.float_info.max)
+        if not self.shedding and backlog > self.slo_seconds:
+            self.shedding = True
+            logger.warning(f"Projected backlog {backlog:.0f}s exceeds the {self.slo_seconds:.0f}s SLO; skipping optional stages.")
+        elif self.shedding and backlog < self.slo_seconds / 2:
+            self.shedding = False
+            logger.info("Backlog back under the SLO; optional stages resumed.")
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "slots": self.slots,
+            "slo_seconds": self.slo_seconds,
+            "running": len(self.running),
+            "waiting": len(self.waiting),
+            "projected_wait_seconds": round(self.projected_wait(), 2),
+            "shedding": self.shedding,
+            "rejected": self.rejected,
+            "rtf": {name: round(value, 4) for name, value in self.rtf.items()}
+        }
@@ -1,38 +1,401 @@
 # app/services/audio_processor.py
 
-import io
 import logging
-import soundfile as sf
-import noisereduce as nr
+from math import gcd
 import numpy as np
+from scipy.ndimage import convolve1d
+from scipy.signal import firwin, get_window
+from app.utils.metrics import stage
 
 logger = logging.getLogger(__name__)
 
+# Whisper and pyannote both operate on 16 kHz mono float32 audio
+TARGET_SAMPLE_RATE = 16000
+
+class StreamingResampler:
+    """
+    Polyphase resampler that converts a stream of chunks to `output_rate`.
+
+    Filter state (the last input samples) is carried across chunk boundaries, so
+    resampling chunk by chunk gives the same output as `scipy.signal.resample_poly`
+    on the whole recording, with the same anti-aliasing filter.
+    """
+
+    def __init__(self, input_rate: int, output_rate: int = TARGET_SAMPLE_RATE, block_size: int = 16384):
+        factor = gcd(input_rate, output_rate)
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.up = output_rate // factor
+        self.down = input_rate // factor
+        self.block_size = block_size
+
+        if self.passthrough:
+            return
+
+        max_rate = max(self.up, self.down)
+        half_len = 10 * max_rate
+        taps = firwin(2 * half_len + 1, 1.0 / max_rate, window=("kaiser", 5.0)) * self.up
+        # Delay the filter so its group delay is a whole number of output samples
+        pre_pad = self.down - half_len % self.down
+        self.pre_remove = (half_len + pre_pad) // self.down
+        self.num_taps = -(-(pre_pad + len(taps)) // self.up)
+        taps = np.pad(taps, (pre_pad, self.num_taps * self.up - len(taps) - pre_pad))
+        # phases[p, j] = taps[j * up + p]
+        self.phases = np.ascontiguousarray(taps.reshape(self.num_taps, self.up).T, dtype=np.float32)
+        self.reset()
+
+    @property
+    def passthrough(self) -> bool:
+        return self.up == self.down
+
+    def reset(self):
+        self.history = np.zeros(self.num_taps - 1, dtype=np.float32)
+        self.seen = 0  # input samples received so far
+        self.next_output = 0
+
+    def _filter(self, chunk: np.ndarray) -> np.ndarray:
+        buffer = np.concatenate((self.history, chunk))
+        buffer_start = self.seen - len(self.history)  # stream index of buffer[0]
+        self.seen += len(chunk)
+        end_output = (self.seen * self.up + self.down - 1) // self.down
+
+        outputs = []
+        for block_start in range(self.next_output, end_output, self.block_size):
+            n = np.arange(block_start, min(block_start + self.block_size, end_output), dtype=np.int64)
+            position = n * self.down
+            local = position // self.up - buffer_start
+            indices = local[:, None] - np.arange(self.num_taps)[None, :]
+            outputs.append(np.einsum("ij,ij->i", self.phases[position % self.up], buffer[indices]))
+        first_output = self.next_output
+        self.next_output = max(self.next_output, end_output)
+        self.history = buffer[len(buffer) - (self.num_taps - 1):].copy()
+
+        result = np.concatenate(outputs) if outputs else np.zeros(0, dtype=np.float32)
+        # Drop the outputs that only cover the filter delay at the start of the stream
+        return result[max(0, self.pre_remove - first_output):]
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        if self.passthrough:
+            return chunk
+        return self._filter(chunk.astype(np.float32, copy=False))
+
+    def flush(self) -> np.ndarray:
+        """Return the samples still held back by the filter delay and reset the stream."""
+        if self.passthrough:
+            return np.zeros(0, dtype=np.float32)
+        expected = self.pre_remove + -(-self.seen * self.up // self.down)
+        delivered = max(self.next_output, self.pre_remove)
+        tail = np.zeros(0, dtype=np.float32)
+        if self.seen > 0 and expected > delivered:
+            # Feed zeros until every output the whole recording maps to has been computed
+            padding = -(-(expected * self.down) // self.up) + self.num_taps - self.seen
+            tail = self._filter(np.zeros(max(padding, 0), dtype=np.float32))[:expected - delivered]
+        self.reset()
+        return tail
+
+
+class StreamingNoiseReducer:
+    """
+    Stationary spectral-gating denoiser that runs chunk by chunk.
+
+    The noise profile (per-bin mean and spread of the dB spectrum) is estimated
+    once from the quietest frames of the first `profile_seconds` of the session.
+    After that, each chunk is gated in the STFT domain and resynthesized with
+    overlap-add. The overlap tail is carried between chunks, so memory is bounded
+    by the chunk size and output lags input by only n_fft - hop samples.
+    """
+
+    def __init__(self, sample_rate: int = TARGET_SAMPLE_RATE, n_fft: int = 512, hop: int = 128,
+                 profile_seconds: float = 1.5, n_std_thresh: float = 1.5, prop_decrease: float = 1.0,
+                 freq_smooth_hz: float = 500.0, release_ms: float = 50.0):
+        self.sample_rate = sample_rate
+        self.n_fft = n_fft
+        self.hop = hop
+        self.profile_samples = int(profile_seconds * sample_rate)
+        self.n_std_thresh = n_std_thresh
+        self.prop_decrease = prop_decrease
+        self.window = get_window("hann", n_fft).astype(np.float32)
+        self.ola_norm = np.sum(self.window ** 2) / hop
+        bins = max(1, int(freq_smooth_hz / (sample_rate / n_fft)))
+        kernel = np.concatenate((np.arange(1, bins + 1), np.arange(bins - 1, 0, -1))).astype(np.float32)
+        self.freq_kernel = kernel / kernel.sum()
+        # Per-frame decay of the gain after the signal drops below the threshold
+        self.release = np.exp(-hop / (sample_rate * release_ms / 1000))
+        self.threshold_db = None
+        self.pending = []  # audio held back until the noise profile is ready
+        self.pending_samples = 0
+        self.reset()
+
+    def reset(self):
+        self.input_tail = np.zeros(self.n_fft - self.hop, dtype=np.float32)
+        self.output_tail = np.zeros(self.n_fft - self.hop, dtype=np.float32)
+        self.previous_gain = None
+        self.received = 0
+        self.delivered = -(self.n_fft - self.hop)  # the primed zeros come out first
+
+    def _spectrum_db(self, spectrum: np.ndarray) -> np.ndarray:
+        return 20 * np.log10(np.abs(spectrum) + 1e-6)
+
+    def _frames(self, signal: np.ndarray) -> np.ndarray:
+        count = (len(signal) - self.n_fft) // self.hop + 1
+        if count <= 0:
+            return np.zeros((0, self.n_fft), dtype=np.float32)
+        return np.lib.stride_tricks.sliding_window_view(signal, self.n_fft)[::self.hop][:count]
+
+    def estimate_profile(self, audio: np.ndarray):
+        frames = self._frames(audio)
+        if len(frames) == 0:
+            return
+        spectrum_db = self._spectrum_db(np.fft.rfft(frames * self.window, axis=1))
+        energy = spectrum_db.mean(axis=1)
+        quiet = spectrum_db[energy <= np.percentile(energy, 50)]
+        self.threshold_db = quiet.mean(axis=0) + self.n_std_thresh * quiet.std(axis=0)
+        logger.info(f"Noise profile estimated from {len(quiet)} quiet frames.")
+
+    def _gate(self, chunk: np.ndarray) -> np.ndarray:
+        signal = np.concatenate((self.input_tail, chunk))
+        frames = self._frames(signal)
+        consumed = len(frames) * self.hop
+        self.input_tail = signal[consumed:].copy()
+        if len(frames) == 0:
+            return np.zeros(0, dtype=np.float32)
+
+        spectrum = np.fft.rfft(frames * self.window, axis=1)
+        mask = (self._spectrum_db(spectrum) > self.threshold_db).astype(np.float32)
+        mask = convolve1d(mask, self.freq_kernel, axis=1, mode="constant")
+        # Causal release smoothing across frames, continued from the previous chunk
+        previous = self.previous_gain
+        for index in range(len(mask)):
+            if previous is not None:
+                mask[index] = np.maximum(mask[index], previous * self.release)
+            previous = mask[index]
+        self.previous_gain = previous
+        gain = 1.0 - self.prop_decrease * (1.0 - mask)
+
+        frames_out = np.fft.irfft(spectrum * gain, n=self.n_fft, axis=1).astype(np.float32)
+        frames_out *= self.window / self.ola_norm
+        output = np.zeros(consumed + self.n_fft - self.hop, dtype=np.float32)
+        output[:len(self.output_tail)] += self.output_tail
+        for index, frame in enumerate(frames_out):
+            output[index * self.hop:index * self.hop + self.n_fft] += frame
+        self.output_tail = output[consumed:].copy()
+        return output[:consumed]
+
+    def _emit(self, chunk: np.ndarray) -> np.ndarray:
+        self.received += len(chunk)
+        output = self._gate(chunk)
+        drop = max(0, -self.delivered)
+        self.delivered += len(output)
+        return output[drop:]
+
+    def process(self, chunk: np.ndarray) -> np.ndarray:
+        chunk = chunk.astype(np.float32, copy=False)
+        if self.threshold_db is None:
+            self.pending.append(chunk)
+            self.pending_samples += len(chunk)
+            if self.pending_samples < self.profile_samples:
+                return np.zeros(0, dtype=np.float32)
+            chunk = np.concatenate(self.pending)
+            self.pending, self.pending_samples = [], 0
+            self.estimate_profile(chunk)
+            if self.threshold_db is None:
+                return chunk
+        return self._emit(chunk)
+
+    def flush(self) -> np.ndarray:
+        """Return the audio still held back and reset the overlap state; the noise profile is kept."""
+        if self.threshold_db is None:
+            held = np.concatenate(self.pending) if self.pending else np.zeros(0, dtype=np.float32)
+            self.pending, self.pending_samples = [], 0
+            if len(held) == 0:
+                return held
+            self.estimate_profile(held)
+            if self.threshold_db is None:
+                return held
+            self.reset()
+            output = self._emit(held)
+        else:
+            output = np.zeros(0, dtype=np.float32)
+        remaining = self.received - max(self.delivered, 0)
+        tail = self._emit(np.zeros(self.n_fft, dtype=np.float32))
+        output = np.concatenate((output, tail))[:len(output) + remaining]
+        self.reset()
+        return output
+
+
+class SpeechTimeline:
+    """
+    Speech regions of a recording and the mapping between the compacted,
+    speech-only audio and the original timeline.
+    """
+
+    def __init__(self, regions: np.ndarray, total_samples: int, sample_rate: int = TARGET_SAMPLE_RATE,
+                 noise_floor_db: float = None):
+        self.noise_floor_db = noise_floor_db
+        self.regions = regions.reshape(-1, 2)  # (start, end) sample pairs, sorted and disjoint
+        self.total_samples = total_samples
+        self.sample_rate = sample_rate
+        lengths = self.regions[:, 1] - self.regions[:, 0]
+        self.compact_starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) / sample_rate
+        self.original_starts = self.regions[:, 0] / sample_rate
+        self.speech_samples = int(lengths.sum())
+
+    @property
+    def has_speech(self) -> bool:
+        return self.speech_samples > 0
+
+    @property
+    def skipped_percent(self) -> float:
+        if self.total_samples == 0:
+            return 0.0
+        return 100.0 * (1 - self.speech_samples / self.total_samples)
+
+    def compact(self, waveform: np.ndarray) -> np.ndarray:
+        return np.concatenate([waveform[start:end] for start, end in self.regions] or [waveform[:0]])
+
+    def to_original(self, times, is_end: bool = False):
+        """Map compacted-audio times (seconds) back to the original recording."""
+        times = np.asarray(times, dtype=np.float64)
+        # A time on a region boundary belongs to the end of the earlier region when it closes an interval
+        index = np.searchsorted(self.compact_starts, times, side="left" if is_end else "right") - 1
+        index = np.clip(index, 0, len(self.compact_starts) - 1)
+        return times - self.compact_starts[index] + self.original_starts[index]
+
+    def map_segments(self, segments: list) -> list:
+        for segment in segments:
+            segment["start"] = float(self.to_original(segment["start"]))
+            segment["end"] = float(self.to_original(segment["end"], is_end=True))
+            for word in segment.get("words", []):
+                word["start"] = float(self.to_original(word["start"]))
+                word["end"] = float(self.to_original(word["end"], is_end=True))
+        return segments
+
+    def map_turns(self, turns: list) -> list:
+        for turn in turns:
+            turn["start"] = float(self.to_original(turn["start"]))
+            turn["end"] = float(self.to_original(turn["end"], is_end=True))
+        return turns
+
+
+class VoiceActivityDetector:
+    """
+    Energy / zero-crossing voice activity detector. Runs vectorized on CPU and
+    needs no model: frames well above the recording's noise floor are voiced,
+    quieter frames with a high zero-crossing rate count as unvoiced speech
+    (fricatives), and a hangover keeps word endings and short pauses.
+    """
+
+    def __init__(self, frame_ms: int = 30, energy_margin_db: float = 12.0, zcr_threshold: float = 0.25,
+                 hangover_ms: int = 300, min_speech_ms: int = 120, padding_ms: int = 300,
+                 absolute_floor_db: float = -55.0):
+        self.frame_ms = frame_ms
+        self.energy_margin_db = energy_margin_db
+        self.zcr_threshold = zcr_threshold
+        self.hangover_ms = hangover_ms
+        self.min_speech_ms = min_speech_ms
+        self.padding_ms = padding_ms
+        self.absolute_floor_db = absolute_floor_db
+
+    def detect(self, waveform: np.ndarray, sample_rate: int = TARGET_SAMPLE_RATE, noise_floor_db: float = None) -> SpeechTimeline:
+        """
+        Find speech regions in `waveform`. Short streaming windows may contain
+        almost no silence, so callers can pass the session's `noise_floor_db`
+        instead of estimating it from the window alone.
+        """
+        frame = int(sample_rate * self.frame_ms / 1000)
+        num_frames = len(waveform) // frame
+        if num_frames == 0:
+            return SpeechTimeline(np.zeros((0, 2), dtype=np.int64), len(waveform), sample_rate, noise_floor_db)
+        frames = waveform[:num_frames * frame].reshape(num_frames, frame)
+
+        energy_db = 10 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+        signs = np.signbit(frames)
+        zcr = np.mean(signs[:, 1:] != signs[:, :-1], axis=1)
+
+        noise_floor = np.percentile(energy_db, 10)
+        if noise_floor_db is not None:
+            noise_floor = min(noise_floor, noise_floor_db)
+        threshold = max(noise_floor + self.energy_margin_db, self.absolute_floor_db)
+        voiced = energy_db > threshold
+        unvoiced = (energy_db > threshold - self.energy_margin_db / 2) & (zcr > self.zcr_threshold)
+        speech = voiced | unvoiced
+
+        # Drop isolated bursts shorter than min_speech before the hangover smears them out
+        speech = self._remove_short_runs(speech, max(1, self.min_speech_ms // self.frame_ms))
+        hangover = self.hangover_ms // self.frame_ms
+        if hangover:
+            speech = np.convolve(speech, np.ones(hangover + 1), mode="full")[:num_frames] > 0
+
+        edges = np.diff(np.concatenate(([0], speech.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1) * frame
+        ends = np.flatnonzero(edges == -1) * frame
+        padding = int(sample_rate * self.padding_ms / 1000)
+        starts = np.maximum(starts - padding, 0)
+        ends = np.minimum(ends + padding, len(waveform))
+
+        # Merge regions that overlap after padding
+        if len(starts):
+            keep = np.concatenate(([True], starts[1:] > ends[:-1]))
+            group = np.cumsum(keep) - 1
+            merged_ends = np.zeros(keep.sum(), dtype=np.int64)
+            np.maximum.at(merged_ends, group, ends)
+            starts, ends = starts[keep], merged_ends
+        return SpeechTimeline(
+            np.stack((starts, ends), axis=1).astype(np.int64), len(waveform), sample_rate, noise_floor
+        )
+
+    @staticmethod
+    def _remove_short_runs(mask: np.ndarray, min_length: int) -> np.ndarray:
+        edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+        long_enough = ends - starts >= min_length
+        delta = np.zeros(len(mask) + 1, dtype=np.int64)
+        np.add.at(delta, starts[long_enough], 1)
+        np.add.at(delta, ends[long_enough], -1)
+        return np.cumsum(delta)[:-1] > 0
+
+
 class AudioProcessor:
     def __init__(self):
-        pass  # No initialization needed for noisereduce
+        pass
 
-    def reduce_noise(self, pcm_data: bytes, samplerate: int = 192000) -> bytes:
-        try:
-            # Convert PCM bytes to numpy array (assuming 16-bit PCM)
-            data = np.frombuffer(pcm_data, dtype=np.int16).astype(np.float32) / 32768.0
-            logger.info(f"PCM data read successfully with samplerate {samplerate} Hz.")
-
-            # Ensure mono
-            if len(data.shape) > 1:
-                data = data.mean(axis=1)
-                logger.info("Converted stereo to mono.")
+    def ingest_chunk(self, resampler: StreamingResampler, denoiser: StreamingNoiseReducer, pcm_chunk) -> bytes:
+        """
+        Run one incoming 16-bit PCM chunk through the session's streaming stages:
+        resampling to 16 kHz, then (when enabled) noise reduction.
+        """
+        samples = np.frombuffer(pcm_chunk, dtype=np.int16)
+        if resampler.passthrough and denoiser is None:
+            return samples.tobytes()
+        with stage("resample"):
+            samples = resampler.process(samples.astype(np.float32))
+        if denoiser is not None:
+            with stage("noise_reduction"):
+                samples = denoiser.process(samples)
+        return self.float_to_pcm(samples)
 
-            # Apply noise reduction
-            denoised_data = nr.reduce_noise(y=data, sr=samplerate)
-            logger.info("Noise reduction applied.")
+    def flush_ingest(self, resampler: StreamingResampler, denoiser: StreamingNoiseReducer) -> bytes:
+        """Drain the audio the streaming stages still hold back at the end of a recording."""
+        samples = resampler.flush()
+        if denoiser is not None:
+            samples = np.concatenate((denoiser.process(samples), denoiser.flush()))
+        return self.float_to_pcm(samples)
 
-            # Convert back to int16 PCM bytes
-            denoised_data_int16 = (denoised_data * 32768.0).astype(np.int16)
-            denoised_bytes = denoised_data_int16.tobytes()
+    def float_to_pcm(self, samples: np.ndarray) -> bytes:
+        # Values are on the int16 scale already; round and clip instead of wrapping
+        return np.clip(np.rint(samples), -32768, 32767).astype(np.int16).tobytes()
 
-            logger.info("Denoised PCM data converted back to bytes.")
-            return denoised_bytes
+    def pcm_to_waveform(self, pcm_data) -> np.ndarray:
+        """
+        Build a float32 waveform from 16 kHz 16-bit PCM. The int16 view over `pcm_data`
+        is zero-copy; the float conversion is the only full-length allocation.
+        """
+        try:
+            samples = np.frombuffer(pcm_data, dtype=np.int16)
+            waveform = samples.astype(np.float32)
+            waveform *= 1.0 / 32768.0
+            return waveform
         except Exception as e:
-            logger.error(f"Error in noise reduction: {e}")
+            logger.error(f"Error converting PCM data: {e}")
             raise e
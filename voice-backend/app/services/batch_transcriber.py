@@ -0,0 +1,146 @@
+# app/services/batch_transcriber.py
+
+import time
+import asyncio
+import logging
+import concurrent.futures
+import numpy as np
+import soundfile as sf
+from app.config import Config
+from app.services.audio_processor import StreamingResampler, SpeechTimeline, VoiceActivityDetector, TARGET_SAMPLE_RATE
+from app.services.transcription_service import TranscriptionService
+from app.services.admission_controller import AdmissionController
+from app.services.diarization_service import DiarizationService
+from app.services.transcript_assembler import TranscriptAssembler, words_from_segments
+
+logger = logging.getLogger(__name__)
+
+def decode_file(path: str, block_size: int = 65536) -> np.ndarray:
+    """
+    Decode an audio file block by block into a 16 kHz mono float32 waveform.
+    Only one block of the source is in memory at a time; the output is
+    preallocated from the file's frame count.
+    """
+    info = sf.info(path)
+    resampler = StreamingResampler(info.samplerate)
+    waveform = np.empty(-(-info.frames * resampler.up // resampler.down) + 1, dtype=np.float32)
+    position = 0
+    for block in sf.blocks(path, blocksize=block_size, dtype="float32", always_2d=True):
+        samples = resampler.process(block.mean(axis=1))
+        if position + len(samples) > len(waveform):
+            # Compressed formats can report an approximate frame count
+            waveform = np.concatenate((waveform, np.empty(max(len(samples), len(waveform) // 4), dtype=np.float32)))
+        waveform[position:position + len(samples)] = samples
+        position += len(samples)
+    tail = resampler.flush()
+    if position + len(tail) > len(waveform):
+        waveform = np.concatenate((waveform, np.empty(len(tail), dtype=np.float32)))
+    waveform[position:position + len(tail)] = tail
+    return waveform[:position + len(tail)]
+
+class BatchTranscriber:
+    """
+    Transcribes and diarizes an uploaded recording for the job queue, through
+    the same services (and loaded models) as live sessions. Silence is removed
+    first; long speech is split into chunks by WhisperModels.transcribe_long,
+    with progress reported per chunk, while the recording is diarized.
+
+    With an admission controller, transcription and diarization wait for a slot
+    at the lowest tier (`AdmissionController.admit_background`), so jobs queue
+    behind live recordings instead of competing with them. The controller lives
+    on the server's event loop, set as `loop` once it runs.
+    """
+
+    def __init__(self, transcription_service: TranscriptionService, diarization_service: DiarizationService,
+                 voice_activity_detector: VoiceActivityDetector, admission_controller: AdmissionController = None):
+        self.transcription_service = transcription_service
+        self.diarization_service = diarization_service
+        self.voice_activity_detector = voice_activity_detector
+        self.admission_controller = admission_controller
+        self.loop = None
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=2 * Config.JOB_WORKERS)
+
+    def __call__(self, job: dict, report) -> dict:
+        params = job["params"]
+        timings = {}
+        started = time.monotonic()
+
+        report(0.0, "decoding")
+        waveform = decode_file(job["path"])
+        duration = len(waveform) / TARGET_SAMPLE_RATE
+        timings["decode_seconds"] = time.monotonic() - started
+        logger.info(f"Job {job['id']}: decoded {duration:.1f}s of audio.")
+
+        stage_started = time.monotonic()
+        if Config.VAD_ENABLED:
+            timeline = self.voice_activity_detector.detect(waveform)
+        else:
+            timeline = SpeechTimeline(np.array([[0, len(waveform)]], dtype=np.int64), len(waveform))
+        timings["vad_seconds"] = time.monotonic() - stage_started
+        if not timeline.has_speech:
+            return self.result("", [], [], [], duration, timings, started)
+
+        speech_seconds = timeline.speech_samples / TARGET_SAMPLE_RATE
+        report(0.05, "waiting for capacity")
+        stage_started = time.monotonic()
+        ticket = self.admit(speech_seconds)
+        timings["queued_seconds"] = time.monotonic() - stage_started
+        completed = False
+        speakers_future = None
+        try:
+            report(0.1, f"transcribing {speech_seconds:.0f}s of speech")
+            language = params.get("language") or Config.LANGUAGE
+            model_names = ticket.tier["models"] if ticket is not None else None
+            stage_started = time.monotonic()
+            speech = timeline.compact(waveform)
+            speakers_future = self.executor.submit(self.diarize, timeline, speech, params.get("diarization_config", {}))
+            transcription = self.transcription_service.transcribe_audio(
+                speech, language=language, model_names=model_names,
+                progress=lambda done, total: report(0.1 + 0.8 * done / total, f"transcribed {done}/{total} chunk(s)")
+            )
+            segments = timeline.map_segments(transcription["segments"])
+            timings["transcription_seconds"] = time.monotonic() - stage_started
+
+            report(0.9, "diarizing")
+            speakers, timings["diarization_seconds"] = speakers_future.result()
+            completed = True
+        finally:
+            # Diarization must not outlive the job's admission slot
+            if speakers_future is not None and not speakers_future.cancel():
+                concurrent.futures.wait([speakers_future])
+            self.release(ticket, completed)
+
+        report(0.95, "assembling")
+        assembler = TranscriptAssembler()
+        assembler.add_words(words_from_segments(segments))
+        assembler.add_turns(speakers)
+        utterances = assembler.utterances()
+        return self.result(transcription["text"], segments, speakers, utterances, duration, timings, started)
+
+    def admit(self, audio_seconds: float):
+        if self.admission_controller is None or self.loop is None:
+            return None
+        return asyncio.run_coroutine_threadsafe(
+            self.admission_controller.admit_background(audio_seconds), self.loop
+        ).result()
+
+    def release(self, ticket, completed: bool):
+        if ticket is not None:
+            self.loop.call_soon_threadsafe(self.admission_controller.release, ticket, completed)
+
+    def diarize(self, timeline: SpeechTimeline, speech: np.ndarray, config: dict) -> tuple:
+        """Speaker turns on the original timeline, and the seconds diarization took."""
+        started = time.monotonic()
+        speakers = self.diarization_service.diarize_audio(speech, config)
+        return timeline.map_turns(speakers), time.monotonic() - started
+
+    def result(self, text, segments, speakers, utterances, duration, timings, started) -> dict:
+        timings["total_seconds"] = time.monotonic() - started
+        return {
+            "text": text,
+            "segments": segments,
+            "speakers": speakers,
+            "utterances": utterances,
+            "duration_seconds": duration,
+            "timings": {**timings, "real_time_factor": timings["total_seconds"] / duration if duration else None}
+        }
@@ -1,26 +1,140 @@
 # app/services/diarization_service.py
 
 import logging
+import threading
+import numpy as np
 from app.models.diarization_pipeline import DiarizationPipeline
+from app.services.result_cache import ResultCache, cache_key
+from app.utils.hashing import fingerprint_audio
 
 logger = logging.getLogger(__name__)
 
+class SpeakerRegistry:
+    """
+    Per-session speaker centroids. Speakers found in each processed window are
+    matched to the registry by cosine distance (online clustering), so a label such
+    as SPEAKER_01 keeps referring to the same voice for the whole session.
+    """
+
+    def __init__(self):
+        self.centroids = None  # (num_speakers, dimension), unit-normalized
+        self.weights = np.zeros(0)  # seconds of speech behind each centroid
+        self.lock = threading.Lock()
+
+    def label(self, index: int) -> str:
+        return f"SPEAKER_{index:02d}"
+
+    def assign(self, embeddings: np.ndarray, durations: np.ndarray, threshold: float, max_speakers: int = None) -> list:
+        """
+        Map each local speaker embedding to a registry index, one-to-one within the
+        window. Embeddings farther than `threshold` from every centroid open a new
+        speaker unless `max_speakers` is reached. Matched centroids are updated with
+        a duration-weighted running mean. Unusable (zero/NaN) embeddings map to None.
+        """
+        with self.lock:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True) if len(embeddings) else np.zeros((0, 1))
+            valid = np.isfinite(norms[:, 0]) & (norms[:, 0] > 0)
+            normalized = np.where(valid[:, None], embeddings / np.where(norms > 0, norms, 1), 0)
+            assignment = [None] * len(embeddings)
+
+            if self.centroids is not None and len(self.centroids):
+                distances = 1.0 - normalized @ self.centroids.T
+                taken = set()
+                for flat in np.argsort(distances, axis=None):
+                    local, known = np.unravel_index(flat, distances.shape)
+                    if distances[local, known] > threshold:
+                        break
+                    if not valid[local] or assignment[local] is not None or known in taken:
+                        continue
+                    assignment[local] = int(known)
+                    taken.add(known)
+
+            for local in range(len(embeddings)):
+                if assignment[local] is not None or not valid[local]:
+                    continue
+                num_known = 0 if self.centroids is None else len(self.centroids)
+                if max_speakers and num_known >= max_speakers:
+                    assignment[local] = int(np.argmin(1.0 - self.centroids @ normalized[local]))
+                    continue
+                if self.centroids is None:
+                    self.centroids = normalized[local:local + 1].copy()
+                else:
+                    self.centroids = np.vstack((self.centroids, normalized[local]))
+                self.weights = np.append(self.weights, 0.0)
+                assignment[local] = num_known
+
+            for local, known in enumerate(assignment):
+                if known is None or durations[local] <= 0:
+                    continue
+                total = self.weights[known] + durations[local]
+                centroid = (self.centroids[known] * self.weights[known] + normalized[local] * durations[local]) / total
+                self.centroids[known] = centroid / np.linalg.norm(centroid)
+                self.weights[known] = total
+            return assignment
+
 class DiarizationService:
-    def __init__(self, diarization_pipeline: DiarizationPipeline):
+    def __init__(self, diarization_pipeline: DiarizationPipeline, cache: ResultCache = None):
         self.diarization_pipeline = diarization_pipeline
+        self.cache = cache
 
-    def diarize_audio(self, wav_path: str, diarization_config: dict):
+    def local_diarization(self, audio: np.ndarray, diarization_config: dict, return_embeddings: bool,
+                          cache: bool = True) -> dict:
+        """
+        Turns with the pipeline's own labels, plus per-label speech duration and
+        centroid embeddings when requested. Cached by audio content and config
+        unless `cache` is False (streaming windows, never seen twice); mapping to
+        session labels happens afterwards since it depends on the session's registry.
+        """
+        def diarize():
+            return self.diarization_pipeline.diarize_turns(audio, diarization_config, return_embeddings, cache=cache)
+        if self.cache is None or not cache:
+            return diarize()
+        key = cache_key("diarization", fingerprint_audio(audio), diarization_config, return_embeddings)
+        return self.cache.get_or_compute(key, diarize)
+
+    def diarize_audio(self, audio: np.ndarray, diarization_config: dict, registry: SpeakerRegistry = None, offset: float = 0.0,
+                      cache: bool = True):
+        """
+        Diarize `audio`. With a session `registry`, local labels are replaced by the
+        session's stable speaker labels and segment times are shifted by `offset`
+        seconds, so windows can be diarized one at a time as audio arrives.
+        """
         try:
-            diarization = self.diarization_pipeline.diarize(wav_path, diarization_config)
+            local = self.local_diarization(
+                audio, diarization_config, return_embeddings=registry is not None, cache=cache
+            )
+            if registry is None:
+                labels = {label: label for label in local["labels"]}
+            else:
+                threshold = diarization_config.get(
+                    "offset", self.diarization_pipeline.default_config["clustering"]["threshold"]
+                )
+                max_speakers = diarization_config.get("max_speakers") or diarization_config.get("num_speakers")
+                assignment = registry.assign(local["centroids"], local["durations"], threshold, max_speakers)
+                labels = {
+                    label: registry.label(index) if index is not None else "UNKNOWN"
+                    for label, index in zip(local["labels"], assignment)
+                }
             speakers = []
-            for turn, _, speaker in diarization.itertracks(yield_label=True):
+            for start, end, speaker in local["turns"]:
                 speakers.append({
-                    "speaker": speaker,
-                    "start": turn.start,
-                    "end": turn.end
+                    "speaker": labels[speaker],
+                    "start": start + offset,
+                    "end": end + offset
                 })
-            logger.info(f"Speaker segments extracted: {speakers}")
+            logger.info(f"Speaker segments extracted: {len(speakers)}")
             return speakers
         except Exception as e:
             logger.error(f"Error in diarization: {e}")
             raise e
+
+    def diarize_window(self, audio: np.ndarray, diarization_config: dict, registry: SpeakerRegistry, offset: float):
+        """
+        Diarize one newly arrived window for a live session. The speaker count is a
+        ceiling rather than exact, since a short window rarely contains everyone.
+        Windows are never diarized again, so their features are not cached.
+        """
+        window_config = dict(diarization_config)
+        window_config["max_speakers"] = window_config.pop("num_speakers", None)
+        window_config["num_speakers"] = None
+        return self.diarize_audio(audio, window_config, registry=registry, offset=offset, cache=False)
@@ -0,0 +1,109 @@
+# app/services/inference_scheduler.py
+
+import time
+import queue
+import logging
+import threading
+import concurrent.futures
+from collections import deque
+import numpy as np
+import torch
+import whisper
+
+logger = logging.getLogger(__name__)
+
+class DecodeRequest:
+    def __init__(self, mel: np.ndarray, floor: float):
+        self.mel = mel
+        self.floor = floor
+        self.future = concurrent.futures.Future()
+        self.enqueued_at = time.monotonic()
+
+class InferenceScheduler:
+    """
+    Batches 30-second log-mel windows from every active session into single
+    `whisper.decode` calls. Windows are raw LogMelFeatures frames; Whisper's clamp
+    to `floor` and scaling are applied to the stacked batch. One worker thread per (model, language) pair drains its
+    queue, waiting at most `max_wait_ms` to fill a batch of `max_batch_size` windows,
+    and resolves each window's future with its DecodingResult.
+    """
+
+    def __init__(self, whisper_models, max_batch_size: int = 8, max_wait_ms: int = 50, history: int = 1000):
+        self.whisper_models = whisper_models
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.queues = {}
+        self.workers = {}
+        self.lock = threading.Lock()
+        self.batches = deque(maxlen=history)  # (batch size, max queue wait, decode time)
+        self.windows_decoded = 0
+
+    def submit(self, model_name: str, mel: np.ndarray, floor: float, language: str) -> concurrent.futures.Future:
+        key = (model_name, language)
+        with self.lock:
+            if key not in self.queues:
+                self.queues[key] = queue.Queue()
+                worker = threading.Thread(target=self._worker, args=(key,), daemon=True)
+                self.workers[key] = worker
+                worker.start()
+        request = DecodeRequest(mel, floor)
+        self.queues[key].put(request)
+        return request.future
+
+    def _worker(self, key):
+        requests = self.queues[key]
+        while True:
+            batch = [requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(requests.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            self._run_batch(key, batch)
+
+    def _run_batch(self, key, batch):
+        model_name, language = key
+        started = time.monotonic()
+        queue_wait = started - min(request.enqueued_at for request in batch)
+        try:
+            # Workers for other languages may decode on the same model
+            with self.whisper_models.exclusive(model_name) as model:
+                mel = torch.from_numpy(np.stack([request.mel for request in batch])).to(model.device)
+                floors = torch.tensor([request.floor for request in batch], device=model.device).view(-1, 1, 1)
+                mel = (torch.maximum(mel, floors) + 4.0) / 4.0
+                options = whisper.DecodingOptions(language=language, fp16=model.device.type == "cuda")
+                with torch.no_grad():
+                    results = whisper.decode(model, mel, options)
+            for request, result in zip(batch, results):
+                request.future.set_result(result)
+        except Exception as e:
+            logger.error(f"Batched decode failed for model '{model_name}': {e}")
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+        decode_time = time.monotonic() - started
+        with self.lock:
+            self.batches.append((len(batch), queue_wait, decode_time))
+            self.windows_decoded += len(batch)
+        logger.debug(f"Decoded batch of {len(batch)} on '{model_name}' in {decode_time:.2f}s (waited {queue_wait:.3f}s).")
+
+    def stats(self) -> dict:
+        with self.lock:
+            batches = np.array(self.batches, dtype=np.float64).reshape(-1, 3)
+            pending = {f"{name}:{language}": q.qsize() for (name, language), q in self.queues.items()}
+            windows_decoded = self.windows_decoded
+        if len(batches) == 0:
+            return {"batches": 0, "windows_decoded": windows_decoded, "pending": pending}
+        sizes, waits, decode_times = batches.T
+        return {
+            "batches": len(batches),
+            "windows_decoded": windows_decoded,
+            "pending": pending,
+            "batch_size": {"mean": float(sizes.mean()), "max": int(sizes.max())},
+            "queue_wait_seconds": {"p50": float(np.percentile(waits, 50)), "p95": float(np.percentile(waits, 95))},
+            "decode_seconds": {"p50": float(np.percentile(decode_times, 50)), "p95": float(np.percentile(decode_times, 95))},
+        }
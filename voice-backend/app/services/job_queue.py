@@ -0,0 +1,187 @@
+# app/services/job_queue.py
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import asyncio
+import logging
+import threading
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATES = ("completed", "failed")
+
+class JobQueue:
+    """
+    Persistent priority queue of batch jobs backed by sqlite.
+
+    Jobs survive restarts: anything left running when the server stopped is
+    queued again by `start`, which only the server's startup hook calls, never a
+    plain import or construction. Worker threads claim the highest-priority, oldest queued job
+    and run `processor(job, report)`, where `report(progress, stage)` records
+    progress and pushes it to subscribers (the SSE endpoint).
+    """
+
+    def __init__(self, processor, path: str = Config.JOBS_DB, workers: int = Config.JOB_WORKERS):
+        self.processor = processor
+        self.num_workers = workers
+        self.workers = []
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.db_lock = threading.Lock()
+        self.wakeup = threading.Condition()
+        self.subscribers = {}  # job id -> [(event loop, asyncio.Queue)]
+        self.subscribers_lock = threading.Lock()
+        with self.db_lock, self.connection:
+            self.connection.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    priority INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    started REAL,
+                    finished REAL,
+                    path TEXT NOT NULL,
+                    filename TEXT,
+                    params TEXT NOT NULL,
+                    progress REAL NOT NULL DEFAULT 0,
+                    stage TEXT,
+                    result TEXT,
+                    error TEXT
+                )
+            """)
+            self.connection.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority, created)")
+
+    def recover(self):
+        """Queue again the jobs a previous server process left running."""
+        with self.db_lock, self.connection:
+            recovered = self.connection.execute(
+                "UPDATE jobs SET status = 'queued', progress = 0, stage = NULL WHERE status = 'running'"
+            ).rowcount
+        if recovered:
+            logger.info(f"Re-queued {recovered} job(s) interrupted by a restart.")
+
+    def start(self):
+        if not self.workers:
+            self.recover()
+        for index in range(self.num_workers - len(self.workers)):
+            worker = threading.Thread(target=self._worker, name=f"job-worker-{index}", daemon=True)
+            self.workers.append(worker)
+            worker.start()
+        logger.info(f"Job queue started with {len(self.workers)} worker(s).")
+
+    def submit(self, path: str, filename: str, params: dict, priority: int = 0) -> str:
+        job_id = uuid.uuid4().hex
+        with self.db_lock, self.connection:
+            self.connection.execute(
+                "INSERT INTO jobs (id, status, priority, created, path, filename, params) VALUES (?, 'queued', ?, ?, ?, ?, ?)",
+                (job_id, priority, time.time(), path, filename, json.dumps(params))
+            )
+        with self.wakeup:
+            self.wakeup.notify()
+        logger.info(f"Queued job {job_id} ({filename}, priority {priority}).")
+        return job_id
+
+    def get(self, job_id: str, with_result: bool = True) -> dict:
+        with self.db_lock:
+            row = self.connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row, with_result) if row else None
+
+    def list(self, limit: int = 50) -> list:
+        with self.db_lock:
+            rows = self.connection.execute("SELECT * FROM jobs ORDER BY created DESC LIMIT ?", (limit,)).fetchall()
+        return [self._to_dict(row, with_result=False) for row in rows]
+
+    def _to_dict(self, row, with_result: bool) -> dict:
+        job = {
+            "id": row["id"],
+            "status": row["status"],
+            "priority": row["priority"],
+            "filename": row["filename"],
+            "params": json.loads(row["params"]),
+            "progress": row["progress"],
+            "stage": row["stage"],
+            "created": row["created"],
+            "started": row["started"],
+            "finished": row["finished"],
+            "error": row["error"]
+        }
+        if with_result:
+            job["result"] = json.loads(row["result"]) if row["result"] else None
+        return job
+
+    def _claim(self) -> dict:
+        with self.db_lock, self.connection:
+            row = self.connection.execute(
+                "SELECT * FROM jobs WHERE status = 'queued' ORDER BY priority DESC, created ASC LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            self.connection.execute(
+                "UPDATE jobs SET status = 'running', started = ? WHERE id = ?", (time.time(), row["id"])
+            )
+        job = self._to_dict(row, with_result=False)
+        job["path"] = row["path"]
+        return job
+
+    def _worker(self):
+        while True:
+            job = self._claim()
+            if job is None:
+                with self.wakeup:
+                    self.wakeup.wait(timeout=5)
+                continue
+            self._publish(job["id"], {"status": "running", "progress": 0.0, "stage": "started"})
+            try:
+                result = self.processor(job, lambda progress, stage: self.report(job["id"], progress, stage))
+                self._finish(job["id"], "completed", result=result)
+            except Exception as e:
+                logger.error(f"Job {job['id']} failed: {e}")
+                self._finish(job["id"], "failed", error=str(e))
+            finally:
+                if not Config.JOBS_KEEP_UPLOADS:
+                    try:
+                        os.remove(job["path"])
+                    except OSError:
+                        pass
+
+    def report(self, job_id: str, progress: float, stage: str):
+        with self.db_lock, self.connection:
+            self.connection.execute("UPDATE jobs SET progress = ?, stage = ? WHERE id = ?", (progress, stage, job_id))
+        self._publish(job_id, {"status": "running", "progress": round(progress, 3), "stage": stage})
+
+    def _finish(self, job_id: str, status: str, result: dict = None, error: str = None):
+        with self.db_lock, self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET status = ?, finished = ?, progress = COALESCE(?, progress), stage = NULL, result = ?, "
+                "error = ? WHERE id = ?",
+                (status, time.time(), 1.0 if status == "completed" else None, json.dumps(result) if result else None,
+                 error, job_id)
+            )
+        self._publish(job_id, {"status": status, "progress": 1.0 if status == "completed" else None, "error": error})
+        logger.info(f"Job {job_id} {status}.")
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        """Progress events for `job_id`, delivered to the calling event loop."""
+        events = asyncio.Queue()
+        with self.subscribers_lock:
+            self.subscribers.setdefault(job_id, []).append((asyncio.get_running_loop(), events))
+        return events
+
+    def unsubscribe(self, job_id: str, events: asyncio.Queue):
+        with self.subscribers_lock:
+            listeners = [entry for entry in self.subscribers.get(job_id, []) if entry[1] is not events]
+            if listeners:
+                self.subscribers[job_id] = listeners
+            else:
+                self.subscribers.pop(job_id, None)
+
+    def _publish(self, job_id: str, event: dict):
+        with self.subscribers_lock:
+            listeners = list(self.subscribers.get(job_id, []))
+        for loop, events in listeners:
+            loop.call_soon_threadsafe(events.put_nowait, event)
@@ -0,0 +1,163 @@
+# app/services/result_cache.py
+
+import os
+import json
+import pickle
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+def cache_key(namespace: str, *parts) -> str:
+    """Key for `namespace` from an audio fingerprint and any JSON-serializable parameters."""
+    payload = json.dumps(parts, sort_keys=True, default=str).encode()
+    return f"{namespace}-{hashlib.blake2b(payload, digest_size=16).hexdigest()}"
+
+class ResultCache:
+    """
+    Content-addressed store for pipeline results.
+
+    Values are pickled once and kept as bytes, so every hit returns a private
+    copy that callers may mutate. A memory LRU bounded by `memory_mb` sits in
+    front of an on-disk store under `directory` bounded by `disk_mb`; the least
+    recently used files are removed first. An empty `directory` keeps the cache
+    in memory only.
+    """
+
+    def __init__(self, memory_mb: float = Config.RESULT_CACHE_MEMORY_MB, directory: str = Config.RESULT_CACHE_DIR,
+                 disk_mb: float = Config.RESULT_CACHE_DISK_MB, enabled: bool = Config.RESULT_CACHE_ENABLED):
+        self.enabled = enabled
+        self.memory_limit = memory_mb * 1024 * 1024
+        self.disk_limit = disk_mb * 1024 * 1024
+        self.directory = directory
+        self.memory = OrderedDict()  # key -> pickled value, least recently used first
+        self.memory_bytes = 0
+        self.disk = OrderedDict()  # key -> file size, least recently used first
+        self.disk_bytes = 0
+        self.counters = {}
+        self.lock = threading.Lock()
+        if self.enabled and self.directory:
+            self._scan_disk()
+
+    def _scan_disk(self):
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".pkl"):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(entries):
+            self.disk[key] = size
+            self.disk_bytes += size
+        logger.info(f"Result cache: {len(self.disk)} entries ({self.disk_bytes / 1e6:.1f} MB) on disk.")
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def _count(self, key: str, outcome: str):
+        namespace = key.split("-", 1)[0]
+        counters = self.counters.setdefault(namespace, {"memory_hits": 0, "disk_hits": 0, "misses": 0})
+        counters[outcome] += 1
+
+    def get(self, key: str):
+        """The cached value for `key`, or None."""
+        if not self.enabled:
+            return None
+        with self.lock:
+            data = self.memory.get(key)
+            if data is not None:
+                self.memory.move_to_end(key)
+                self._count(key, "memory_hits")
+                return pickle.loads(data)
+            on_disk = key in self.disk
+        if on_disk:
+            try:
+                with open(self._path(key), "rb") as f:
+                    data = f.read()
+                os.utime(self._path(key))
+                value = pickle.loads(data)
+            except (OSError, pickle.UnpicklingError, EOFError) as e:
+                logger.warning(f"Dropping unreadable cache entry {key}: {e}")
+                self._remove_file(key)
+            else:
+                with self.lock:
+                    if key in self.disk:
+                        self.disk.move_to_end(key)
+                    self._count(key, "disk_hits")
+                    self._store_memory(key, data)
+                return value
+        with self.lock:
+            self._count(key, "misses")
+        return None
+
+    def put(self, key: str, value):
+        if not self.enabled:
+            return
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self._store_memory(key, data)
+        if self.directory:
+            self._store_disk(key, data)
+
+    def get_or_compute(self, key: str, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def _store_memory(self, key: str, data: bytes):
+        if len(data) > self.memory_limit:
+            return
+        if key in self.memory:
+            self.memory_bytes -= len(self.memory.pop(key))
+        self.memory[key] = data
+        self.memory_bytes += len(data)
+        while self.memory_bytes > self.memory_limit:
+            _, evicted = self.memory.popitem(last=False)
+            self.memory_bytes -= len(evicted)
+
+    def _store_disk(self, key: str, data: bytes):
+        if len(data) > self.disk_limit:
+            return
+        try:
+            # Write then rename, so readers never see a partial file
+            temporary = f"{self._path(key)}.{threading.get_ident()}.tmp"
+            with open(temporary, "wb") as f:
+                f.write(data)
+            os.replace(temporary, self._path(key))
+        except OSError as e:
+            logger.warning(f"Could not write cache entry {key}: {e}")
+            return
+        with self.lock:
+            self.disk_bytes += len(data) - self.disk.pop(key, 0)
+            self.disk[key] = len(data)
+            evicted = []
+            while self.disk_bytes > self.disk_limit:
+                old_key, size = self.disk.popitem(last=False)
+                self.disk_bytes -= size
+                evicted.append(old_key)
+        for old_key in evicted:
+            self._remove_file(old_key, tracked=False)
+
+    def _remove_file(self, key: str, tracked: bool = True):
+        if tracked:
+            with self.lock:
+                self.disk_bytes -= self.disk.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "enabled": self.enabled,
+                "memory": {"entries": len(self.memory), "bytes": self.memory_bytes, "limit_bytes": int(self.memory_limit)},
+                "disk": {"entries": len(self.disk), "bytes": self.disk_bytes, "limit_bytes": int(self.disk_limit),
+                         "directory": self.directory or None},
+                "namespaces": {namespace: dict(counters) for namespace, counters in self.counters.items()}
+            }
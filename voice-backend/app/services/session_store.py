@@ -0,0 +1,191 @@
+# app/services/session_store.py
+
+import os
+import uuid
+import logging
+import threading
+import numpy as np
+from app.config import Config
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000  # sessions store 16 kHz 16-bit PCM, resampled at ingest
+
+class SessionAudio:
+    """
+    Append-only recording of one session. The newest samples live in a
+    preallocated in-memory block; when it fills up, its contents are appended to
+    a spill file and a fresh block takes its place. Reads return zero-copy views
+    of the spill file (np.memmap) or the block, so memory per session stays at
+    the block size however long the session runs.
+    """
+
+    def __init__(self, store, name: str, capacity: int):
+        self.store = store
+        self.name = name
+        self.buffer = np.empty(capacity, dtype=np.int16)
+        self.buffered = 0  # samples in self.buffer
+        self.spilled = 0  # samples in the spill file
+        self.path = None
+        self.file = None
+        self.spill_map = None
+
+    def __len__(self) -> int:
+        return self.spilled + self.buffered
+
+    @property
+    def memory_bytes(self) -> int:
+        return self.buffer.nbytes
+
+    @property
+    def disk_bytes(self) -> int:
+        return self.spilled * 2
+
+    @property
+    def seconds(self) -> float:
+        return len(self) / SAMPLE_RATE
+
+    def append(self, pcm):
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        while len(samples):
+            if self.buffered == len(self.buffer):
+                self.spill()
+            count = min(len(samples), len(self.buffer) - self.buffered)
+            self.buffer[self.buffered:self.buffered + count] = samples[:count]
+            self.buffered += count
+            samples = samples[count:]
+
+    def spill(self):
+        if self.file is None:
+            self.path = self.store.spill_path(self.name)
+            self.file = open(self.path, "ab")
+        self.file.write(memoryview(self.buffer[:self.buffered]))
+        self.file.flush()
+        self.spilled += self.buffered
+        self.spill_map = None
+        # Readers may still hold views of the old block, so it is replaced rather than reused
+        self.buffer = np.empty(len(self.buffer), dtype=np.int16)
+        self.buffered = 0
+
+    def pieces(self, start: int = 0, end: int = None) -> list:
+        """Zero-copy int16 views covering samples [start, end)."""
+        end = len(self) if end is None else min(end, len(self))
+        pieces = []
+        if start < self.spilled and end > start:
+            if self.spill_map is None:
+                self.spill_map = np.memmap(self.path, dtype=np.int16, mode="r", shape=(self.spilled,))
+            pieces.append(self.spill_map[start:min(end, self.spilled)])
+        if end > self.spilled and end > start:
+            pieces.append(self.buffer[max(start - self.spilled, 0):end - self.spilled])
+        return pieces
+
+    def read(self, start: int = 0, end: int = None) -> np.ndarray:
+        """Samples [start, end) as int16; a view unless the range spans the file and the block."""
+        pieces = self.pieces(start, end)
+        if len(pieces) == 1:
+            return pieces[0]
+        return np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.int16)
+
+    def waveform(self, start: int = 0, end: int = None) -> np.ndarray:
+        """Samples [start, end) as a float32 waveform, converted straight from the stored pieces."""
+        pieces = self.pieces(start, end)
+        waveform = np.empty(sum(len(piece) for piece in pieces), dtype=np.float32)
+        position = 0
+        for piece in pieces:
+            np.multiply(piece, 1.0 / 32768.0, out=waveform[position:position + len(piece)], casting="unsafe")
+            position += len(piece)
+        return waveform
+
+    def close(self):
+        """Release the memory block and delete the spill file."""
+        self.spill_map = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+            try:
+                os.remove(self.path)
+            except OSError as e:
+                logger.warning(f"Could not remove spill file {self.path}: {e}")
+        self.buffer = np.empty(0, dtype=np.int16)
+        self.buffered = 0
+        self.spilled = 0
+        self.store.release(self)
+
+class SessionAudioStore:
+    """
+    Creates session recordings and enforces the memory and disk caps.
+
+    Each session gets an in-memory block of `session_seconds`, shrunk (down to
+    one second) when the blocks of all sessions would exceed `memory_mb`. Spill
+    files count against `disk_mb`, and each recording is capped at
+    `max_session_seconds`. `pressure` reports "throttle" near a cap and "stop"
+    at it, for the socket layer to relay to the client.
+    """
+
+    def __init__(self, memory_mb: float = Config.SESSION_STORE_MEMORY_MB, disk_mb: float = Config.SESSION_STORE_DISK_MB,
+                 session_seconds: float = Config.SESSION_MEMORY_SECONDS,
+                 max_session_seconds: float = Config.SESSION_MAX_SECONDS, directory: str = Config.SESSION_SPILL_DIR):
+        self.memory_limit = memory_mb * 1024 * 1024
+        self.disk_limit = disk_mb * 1024 * 1024
+        self.session_samples = int(session_seconds * SAMPLE_RATE)
+        self.max_session_samples = int(max_session_seconds * SAMPLE_RATE)
+        self.directory = directory
+        self.recordings = set()
+        self.lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def spill_path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}-{uuid.uuid4().hex}.pcm")
+
+    def create(self, name: str) -> SessionAudio:
+        with self.lock:
+            free = (self.memory_limit - self.memory_bytes()) // 2
+            capacity = int(max(min(self.session_samples, free), SAMPLE_RATE))
+            recording = SessionAudio(self, name, capacity)
+            self.recordings.add(recording)
+        if capacity < self.session_samples:
+            logger.warning(f"Session memory budget is tight; {name} gets a {capacity / SAMPLE_RATE:.0f}s block.")
+        return recording
+
+    def release(self, recording: SessionAudio):
+        with self.lock:
+            self.recordings.discard(recording)
+
+    def memory_bytes(self) -> int:
+        return sum(recording.memory_bytes for recording in self.recordings)
+
+    def disk_bytes(self) -> int:
+        return sum(recording.disk_bytes for recording in self.recordings)
+
+    def pressure(self, recording: SessionAudio):
+        """("ok" | "throttle" | "stop", reason) for appending more audio to `recording`."""
+        with self.lock:
+            disk = self.disk_bytes()
+            memory = self.memory_bytes()
+        if len(recording) >= self.max_session_samples:
+            return "stop", "session_length"
+        if disk >= self.disk_limit:
+            return "stop", "server_disk"
+        if len(recording) >= 0.9 * self.max_session_samples:
+            return "throttle", "session_length"
+        if disk >= 0.9 * self.disk_limit:
+            return "throttle", "server_disk"
+        if memory > self.memory_limit:
+            return "throttle", "server_memory"
+        return "ok", None
+
+    def stats(self) -> dict:
+        with self.lock:
+            recordings = list(self.recordings)
+        return {
+            "memory_bytes": sum(recording.memory_bytes for recording in recordings),
+            "memory_limit_bytes": int(self.memory_limit),
+            "disk_bytes": sum(recording.disk_bytes for recording in recordings),
+            "disk_limit_bytes": int(self.disk_limit),
+            "recordings": [{
+                "session": recording.name,
+                "seconds": round(recording.seconds, 1),
+                "memory_bytes": recording.memory_bytes,
+                "disk_bytes": recording.disk_bytes
+            } for recording in recordings]
+        }
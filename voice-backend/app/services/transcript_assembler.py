@@ -0,0 +1,166 @@
+# app/services/transcript_assembler.py
+
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def merge_intervals(starts: np.ndarray, ends: np.ndarray):
+    """Union of intervals as sorted, disjoint (starts, ends) arrays."""
+    order = np.argsort(starts, kind="stable")
+    starts, ends = starts[order], ends[order]
+    running_end = np.maximum.accumulate(ends)
+    new_group = np.concatenate(([True], starts[1:] > running_end[:-1]))
+    last_of_group = np.concatenate((new_group[1:], [True]))
+    return starts[new_group], running_end[last_of_group]
+
+def covered_before(times: np.ndarray, starts: np.ndarray, ends: np.ndarray, cumulative: np.ndarray) -> np.ndarray:
+    """Total length of the disjoint sorted intervals lying before each of `times`."""
+    index = np.searchsorted(starts, times, side="right")
+    previous = np.maximum(index - 1, 0)
+    partial = np.clip(np.minimum(times, ends[previous]) - starts[previous], 0, None)
+    return np.where(index > 0, cumulative[previous] + partial, 0.0)
+
+def assign_speakers(word_starts, word_ends, turn_starts, turn_ends, turn_speakers, num_speakers: int) -> np.ndarray:
+    """
+    Speaker index for each word: the speaker whose turns overlap the word the most.
+
+    Each speaker's turns are merged into disjoint sorted intervals with a prefix sum
+    of their lengths, so the overlap of every word with that speaker is two binary
+    searches. Total cost is O((W + T) log T) per speaker instead of O(W * T). Words
+    that overlap no turn go to the nearest turn in time. Returns -1 when there are
+    no turns.
+    """
+    word_starts = np.asarray(word_starts, dtype=np.float64)
+    word_ends = np.asarray(word_ends, dtype=np.float64)
+    turn_starts = np.asarray(turn_starts, dtype=np.float64)
+    turn_ends = np.asarray(turn_ends, dtype=np.float64)
+    turn_speakers = np.asarray(turn_speakers, dtype=np.int64)
+    if len(turn_starts) == 0:
+        return np.full(len(word_starts), -1, dtype=np.int64)
+
+    overlap = np.zeros((len(word_starts), num_speakers))
+    for speaker in range(num_speakers):
+        mask = turn_speakers == speaker
+        if not mask.any():
+            continue
+        starts, ends = merge_intervals(turn_starts[mask], turn_ends[mask])
+        cumulative = np.concatenate(([0.0], np.cumsum(ends - starts)[:-1]))
+        # cumulative[i] = covered length of intervals before interval i
+        overlap[:, speaker] = (covered_before(word_ends, starts, ends, cumulative)
+                               - covered_before(word_starts, starts, ends, cumulative))
+    assignment = overlap.argmax(axis=1)
+
+    # Gaps between turns: fall back to the closest turn around the word's midpoint
+    gaps = overlap.max(axis=1) <= 0
+    if gaps.any():
+        order = np.argsort(turn_starts, kind="stable")
+        starts, ends, speakers = turn_starts[order], turn_ends[order], turn_speakers[order]
+        latest_end = np.maximum.accumulate(ends)
+        latest_index = np.maximum.accumulate(np.where(ends >= latest_end, np.arange(len(ends)), 0))
+        midpoints = (word_starts[gaps] + word_ends[gaps]) / 2
+        before = np.searchsorted(starts, midpoints, side="right") - 1
+        after = before + 1
+        distance_before = np.where(before >= 0, midpoints - latest_end[np.maximum(before, 0)], np.inf)
+        distance_after = np.where(after < len(starts), starts[np.minimum(after, len(starts) - 1)] - midpoints, np.inf)
+        nearest = np.where(
+            distance_before <= distance_after,
+            speakers[latest_index[np.maximum(before, 0)]],
+            speakers[np.minimum(after, len(starts) - 1)],
+        )
+        assignment[gaps] = nearest
+    return assignment
+
+def words_from_segments(segments: list) -> list:
+    """Word timings from Whisper segments; segments without word timestamps count as one word."""
+    words = []
+    for segment in segments:
+        if segment.get("words"):
+            words.extend(segment["words"])
+        elif segment["text"].strip():
+            words.append({"word": segment["text"], "start": segment["start"], "end": segment["end"]})
+    return words
+
+class TranscriptAssembler:
+    """
+    Joins Whisper words with diarization turns into speaker-labelled utterances.
+    Words and turns can be added as they arrive; only the words at or after the
+    earliest new item are re-assigned.
+    """
+
+    def __init__(self, max_gap: float = 1.5):
+        self.max_gap = max_gap  # silence (seconds) that splits one speaker's utterance
+        self.word_text = []
+        self.word_starts = np.zeros(0)
+        self.word_ends = np.zeros(0)
+        self.word_speakers = np.zeros(0, dtype=np.int64)
+        self.turn_starts = np.zeros(0)
+        self.turn_ends = np.zeros(0)
+        self.turn_speakers = np.zeros(0, dtype=np.int64)
+        self.speaker_labels = []
+        self.speaker_index = {}
+        self.stale_from = np.inf
+
+    def add_words(self, words: list):
+        if not words:
+            return
+        self.word_text.extend(word["word"] for word in words)
+        starts = np.array([word["start"] for word in words], dtype=np.float64)
+        self.word_starts = np.concatenate((self.word_starts, starts))
+        self.word_ends = np.concatenate((self.word_ends, [word["end"] for word in words]))
+        self.word_speakers = np.concatenate((self.word_speakers, np.full(len(words), -1, dtype=np.int64)))
+        self.stale_from = min(self.stale_from, starts.min())
+
+    def add_turns(self, turns: list):
+        if not turns:
+            return
+        for turn in turns:
+            if turn["speaker"] not in self.speaker_index:
+                self.speaker_index[turn["speaker"]] = len(self.speaker_labels)
+                self.speaker_labels.append(turn["speaker"])
+        starts = np.array([turn["start"] for turn in turns], dtype=np.float64)
+        # Words in the gap before the new turns may now be nearer to them, so
+        # everything after the last turn that ended before them is stale
+        earlier_ends = self.turn_ends[self.turn_ends <= starts.min()]
+        self.stale_from = min(self.stale_from, earlier_ends.max() if len(earlier_ends) else -np.inf)
+        self.turn_starts = np.concatenate((self.turn_starts, starts))
+        self.turn_ends = np.concatenate((self.turn_ends, [turn["end"] for turn in turns]))
+        self.turn_speakers = np.concatenate(
+            (self.turn_speakers, [self.speaker_index[turn["speaker"]] for turn in turns])
+        )
+
+    def update(self) -> float:
+        """Re-assign stale words; returns the time from which utterances may have changed."""
+        changed_from = self.stale_from
+        if self.stale_from < np.inf and len(self.word_starts):
+            stale = self.word_ends >= self.stale_from
+            self.word_speakers[stale] = assign_speakers(
+                self.word_starts[stale], self.word_ends[stale],
+                self.turn_starts, self.turn_ends, self.turn_speakers, len(self.speaker_labels)
+            )
+        self.stale_from = np.inf
+        return changed_from
+
+    def utterances(self, since: float = None) -> list:
+        """Speaker-labelled utterances, optionally only those ending at or after `since`."""
+        self.update()
+        if len(self.word_starts) == 0:
+            return []
+        order = np.argsort(self.word_starts, kind="stable")
+        starts, ends, speakers = self.word_starts[order], self.word_ends[order], self.word_speakers[order]
+        breaks = np.flatnonzero((speakers[1:] != speakers[:-1]) | (starts[1:] - ends[:-1] > self.max_gap)) + 1
+        bounds = np.concatenate(([0], breaks, [len(order)]))
+
+        utterances = []
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            end = float(ends[first:last].max())
+            if since is not None and end < since:
+                continue
+            speaker = speakers[first]
+            utterances.append({
+                "speaker": self.speaker_labels[speaker] if speaker >= 0 else "UNKNOWN",
+                "start": float(starts[first]),
+                "end": end,
+                "text": "".join(self.word_text[i] for i in order[first:last]).strip()
+            })
+        return utterances
@@ -1,20 +1,37 @@
 # app/services/transcription_service.py
 
 import logging
+import numpy as np
 from app.models.whisper_model import WhisperModels
+from app.services.result_cache import ResultCache, cache_key
+from app.utils.hashing import fingerprint_audio
 
 logger = logging.getLogger(__name__)
 
 class TranscriptionService:
-    def __init__(self, whisper_models: WhisperModels):
+    def __init__(self, whisper_models: WhisperModels, cache: ResultCache = None):
         self.whisper_models = whisper_models
+        self.cache = cache
 
-    def transcribe_audio(self, wav_path: str, language: str = "en") -> str:
+    def transcribe_audio(self, audio: np.ndarray, language: str = "en", model_names: list = None,
+                         word_timestamps: bool = True, progress=None, cache: bool = True) -> dict:
+        # Partial flushes pass cache=False: their audio is never transcribed twice
         try:
-            transcription_result = self.whisper_models.transcribe(wav_path, language)
-            transcription_text = transcription_result['text']
-            logger.info(f"Transcription result: {transcription_text}")
-            return transcription_text
+            def transcribe():
+                return self.whisper_models.transcribe(
+                    audio, language, model_names=model_names, word_timestamps=word_timestamps, progress=progress
+                )
+            if self.cache is None or not cache:
+                transcription_result = transcribe()
+            else:
+                key = cache_key("whisper", fingerprint_audio(audio), language, model_names, word_timestamps,
+                                self.whisper_models.settings())
+                transcription_result = self.cache.get_or_compute(key, transcribe)
+            logger.info(f"Transcription result: {len(transcription_result['segments'])} segments")
+            # The full text is large for long recordings; only format it when asked for
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Transcription text: {transcription_result['text']}")
+            return transcription_result
         except Exception as e:
             logger.error(f"Error in transcription: {e}")
             raise e
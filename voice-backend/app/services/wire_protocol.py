@@ -0,0 +1,180 @@
+# app/services/wire_protocol.py
+
+import struct
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PROTOCOL_VERSION = 1
+
+# Every audio_frame payload starts with this little-endian header:
+# version (u8), codec id (u8), flags (u16, reserved), sequence number (u32),
+# offset of the frame's first sample in the stream (u32), capture time in ms (u32)
+FRAME_HEADER = struct.Struct("<BBHIII")
+
+CODECS = {
+    0: "pcm16",  # 16-bit little-endian PCM
+    1: "mulaw",  # G.711 mu-law, 8 bits per sample
+}
+CODEC_IDS = {name: codec_id for codec_id, name in CODECS.items()}
+
+def mulaw_decode_table() -> np.ndarray:
+    """int16 value of each of the 256 G.711 mu-law codes."""
+    codes = ~np.arange(256, dtype=np.uint8)
+    exponent = (codes >> 4) & 0x07
+    mantissa = codes & 0x0F
+    magnitude = (((mantissa.astype(np.int32) << 3) + 0x84) << exponent) - 0x84
+    return np.where(codes & 0x80, -magnitude, magnitude).astype(np.int16)
+
+MULAW_TABLE = mulaw_decode_table()
+
+class StreamFormat:
+    """Audio format negotiated once per session with the audio_start event."""
+
+    def __init__(self, sample_rate: int, codec: str, version: int = PROTOCOL_VERSION):
+        self.sample_rate = sample_rate
+        self.codec = codec
+        self.version = version
+
+    @classmethod
+    def negotiate(cls, params: dict) -> "StreamFormat":
+        version = params.get("version", PROTOCOL_VERSION)
+        if version != PROTOCOL_VERSION:
+            raise ValueError(f"Unsupported protocol version {version}; the server speaks version {PROTOCOL_VERSION}.")
+        codec = params.get("codec", "pcm16")
+        if codec not in CODEC_IDS:
+            raise ValueError(f"Unsupported codec '{codec}'. Choose from {list(CODEC_IDS)}.")
+        if params.get("channels", 1) != 1:
+            raise ValueError("Only mono audio is supported.")
+        sample_rate = params.get("sample_rate")
+        if not isinstance(sample_rate, int) or not 8000 <= sample_rate <= 192000:
+            raise ValueError(f"Invalid sample rate {sample_rate}.")
+        return cls(sample_rate, codec, version)
+
+    def describe(self) -> dict:
+        return {"version": self.version, "codec": self.codec, "sample_rate": self.sample_rate}
+
+class Frame:
+    def __init__(self, seq: int, sample_offset: int, timestamp_ms: int, samples: np.ndarray):
+        self.seq = seq
+        self.sample_offset = sample_offset
+        self.timestamp_ms = timestamp_ms
+        self.samples = samples  # int16 at the negotiated sample rate
+
+def decode_frame(data: bytes, stream: StreamFormat) -> Frame:
+    """Parse one audio_frame payload and decode its samples to int16 PCM."""
+    if len(data) < FRAME_HEADER.size:
+        raise ValueError(f"Frame of {len(data)} bytes is shorter than its header.")
+    version, codec_id, _, seq, sample_offset, timestamp_ms = FRAME_HEADER.unpack_from(data)
+    if version != stream.version:
+        raise ValueError(f"Frame version {version} does not match the negotiated version {stream.version}.")
+    if CODECS.get(codec_id) != stream.codec:
+        raise ValueError(f"Frame codec {codec_id} does not match the negotiated codec '{stream.codec}'.")
+    payload = memoryview(data)[FRAME_HEADER.size:]
+    if stream.codec == "mulaw":
+        samples = MULAW_TABLE[np.frombuffer(payload, dtype=np.uint8)]
+    else:
+        if len(payload) % 2:
+            raise ValueError("PCM16 payload has an odd number of bytes.")
+        samples = np.frombuffer(payload, dtype="<i2").astype(np.int16, copy=False)
+    return Frame(seq, sample_offset, timestamp_ms, samples)
+
+class FrameAssembler:
+    """
+    Turns frames that may arrive duplicated, overlapping or out of order into a
+    contiguous stream. Frames are placed by their sample offset: anything before
+    the stream position is dropped, early frames wait in a small reorder buffer,
+    and once more than `max_pending` frames are waiting for a missing one, the
+    gap is filled with silence so the timeline stays aligned.
+
+    Sequence numbers tell a resent frame from a late one and name the frames a
+    gap stands for: a seq seen before is a duplicate, one below the highest seen
+    arrived out of order, and the seqs skipped over are reported as lost when
+    their gap is filled, along with the capture time of the frame after it.
+    """
+
+    def __init__(self, max_pending: int = 16):
+        self.max_pending = max_pending
+        self.next_offset = 0
+        self.pending = {}  # sample offset -> (seq, capture time in ms, samples)
+        self.highest_seq = -1
+        self.missing = set()  # seqs skipped over that have not arrived yet
+        self.frames = 0
+        self.duplicates = 0
+        self.reordered = 0
+        self.lost_frames = 0
+        self.gap_samples = 0
+
+    def push(self, frame: Frame) -> list:
+        """Add `frame`; returns the int16 chunks that are now contiguous, in order."""
+        self.frames += 1
+        if frame.seq > self.highest_seq:
+            self.missing.update(range(self.highest_seq + 1, frame.seq))
+            self.highest_seq = frame.seq
+        elif frame.seq in self.missing:
+            self.missing.discard(frame.seq)
+            self.reordered += 1
+        else:
+            self.duplicates += 1
+            return []
+        offset, samples = frame.sample_offset, frame.samples
+        if offset + len(samples) <= self.next_offset or offset in self.pending:
+            self.duplicates += 1
+            return []
+        if offset < self.next_offset:
+            samples = samples[self.next_offset - offset:]
+            offset = self.next_offset
+        self.pending[offset] = (frame.seq, frame.timestamp_ms, samples)
+        return self._drain(force=False)
+
+    def flush(self) -> list:
+        """Everything still waiting, with silence in place of frames that never arrived."""
+        chunks = self._drain(force=True)
+        if self.missing:
+            self.lost_frames += len(self.missing)
+            logger.warning(f"Audio frames {sorted(self.missing)} never arrived.")
+            self.missing.clear()
+        return chunks
+
+    def _drain(self, force: bool) -> list:
+        chunks = []
+        while self.pending:
+            earliest = min(self.pending)
+            if earliest < self.next_offset:
+                # Overlaps audio already delivered by a differently sized frame
+                seq, timestamp_ms, samples = self.pending.pop(earliest)
+                samples = samples[self.next_offset - earliest:]
+                if len(samples) and self.next_offset not in self.pending:
+                    self.pending[self.next_offset] = (seq, timestamp_ms, samples)
+                continue
+            if earliest > self.next_offset:
+                if not force and len(self.pending) <= self.max_pending:
+                    break
+                gap = earliest - self.next_offset
+                chunks.append(np.zeros(gap, dtype=np.int16))
+                self.gap_samples += gap
+                self.give_up(*self.pending[earliest][:2], gap)
+                self.next_offset = earliest
+            samples = self.pending.pop(self.next_offset)[2]
+            chunks.append(samples)
+            self.next_offset += len(samples)
+        return chunks
+
+    def give_up(self, seq: int, timestamp_ms: int, gap: int):
+        """Count the frames sent before `seq` that are still missing as lost, now that their gap is silence."""
+        lost = sorted(missing for missing in self.missing if missing < seq)
+        self.missing.difference_update(lost)
+        self.lost_frames += len(lost)
+        logger.warning(f"Filled a gap of {gap} samples before audio frame {seq} (captured at {timestamp_ms} ms); "
+                       f"frames {lost} never arrived.")
+
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "duplicates": self.duplicates,
+            "reordered": self.reordered,
+            "lost_frames": self.lost_frames,
+            "gap_samples": self.gap_samples,
+            "pending": len(self.pending)
+        }
@@ -0,0 +1,312 @@
+# app/services/worker_pool.py
+
+import os
+import time
+import uuid
+import queue
+import logging
+import threading
+import concurrent.futures
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from app.config import Config
+from app.utils import metrics
+from app.models.whisper_model import is_long_audio, transcribe_in_chunks
+
+logger = logging.getLogger(__name__)
+
+# Model families a worker process can own, matching the registry key prefixes
+WORKER_GROUPS = ("whisper", "pyannote", "combiner")
+
+def build_handlers(group: str, preload: list, streaming_model: str) -> tuple:
+    """Load one model family in a worker process; returns its task handlers by name and its registry."""
+    import torch
+    from app.models.model_registry import ModelRegistry
+
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    registry = ModelRegistry(budget_mb=Config.MODEL_MEMORY_BUDGET_MB)
+    if group == "whisper":
+        from app.models.whisper_model import WhisperModels
+        whisper_models = WhisperModels(device=device, registry=registry)
+        registry.pin(whisper_models.key(streaming_model))
+        handlers = {"transcribe": whisper_models.transcribe, "transcribe_chunk": whisper_models.transcribe_chunk}
+    elif group == "pyannote":
+        from app.models.diarization_pipeline import DiarizationPipeline
+        pipeline = DiarizationPipeline(device=device, registry=registry)
+        handlers = {"diarize_turns": pipeline.diarize_turns, "default_config": lambda: pipeline.default_config}
+    elif group == "combiner":
+        from app.models.transcript_combiner import TranscriptCombiner
+        combiner = TranscriptCombiner(registry=registry, device=device)
+        handlers = {"combine_transcripts": combiner.combine_transcripts}
+    else:
+        raise ValueError(f"Unknown worker group '{group}'. Choose from {list(WORKER_GROUPS)}.")
+    registry.warm_up([name for name in preload if name.split(":")[0] == group])
+    return handlers, registry
+
+def loaded_sizes(registry) -> dict:
+    """Estimated MB of each model the registry has loaded."""
+    return {name: model["size_mb"] for name, model in registry.status()["models"].items() if model["state"] == "loaded"}
+
+def worker_main(worker_id: str, group: str, preload: list, streaming_model: str, num_threads: int, tasks, results):
+    """
+    Entry point of a worker process: owns the models of `group` and runs tasks
+    from its group's queue one at a time. Audio arrives as the name of a shared
+    memory block, which is mapped rather than copied.
+    """
+    from app.utils.logger import setup_logger
+    from app.models.inference_engine import configure_threads
+
+    setup_logger()
+    configure_threads(num_threads)
+    handlers, registry = build_handlers(group, preload, streaming_model)
+    results.put(("ready", worker_id, None, loaded_sizes(registry)))
+    logger.info(f"Inference worker {worker_id} ready.")
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        task_id, method, audio_spec, kwargs = task
+        results.put(("started", worker_id, task_id, None))
+        block = None
+        args = ()
+        try:
+            if audio_spec is not None:
+                name, shape, dtype = audio_spec
+                block = shared_memory.SharedMemory(name=name)
+                args = (np.ndarray(shape, dtype=dtype, buffer=block.buf),)
+            result = handlers[method](*args, **kwargs)
+            # Model timings and loaded model sizes travel back to the gateway's /metrics
+            results.put(("done", worker_id, task_id, (True, result, metrics.drain(), loaded_sizes(registry))))
+        except Exception as e:
+            logger.error(f"Worker {worker_id} failed on '{method}': {e}")
+            results.put(("done", worker_id, task_id,
+                         (False, f"{type(e).__name__}: {e}", metrics.drain(), loaded_sizes(registry))))
+        finally:
+            args = None
+            if block is not None:
+                try:
+                    block.close()
+                except BufferError:
+                    # A tensor still wraps the buffer; the mapping goes when it is collected
+                    pass
+
+class InferencePool:
+    """
+    Pool of inference worker processes, `workers_per_model[group]` per model
+    family. The gateway process keeps only the event loop and I/O: audio is
+    written once to a shared memory block, the task (block name, shape and
+    arguments) goes to the group's queue, and whichever worker is free maps the
+    block and puts the result on a shared results queue. A collector thread
+    resolves the matching future, frees the block and restarts crashed workers.
+    """
+
+    def __init__(self, workers_per_model: dict, preload: list, streaming_model: str):
+        self.context = multiprocessing.get_context("spawn")  # CUDA cannot be used in forked children
+        self.workers_per_model = {group: workers_per_model.get(group, 1) for group in WORKER_GROUPS}
+        self.preload = preload
+        self.streaming_model = streaming_model
+        total = sum(self.workers_per_model.values())
+        self.num_threads = Config.TORCH_NUM_THREADS or max(1, (os.cpu_count() or 1) // max(total, 1))
+        self.tasks = {group: self.context.Queue() for group in WORKER_GROUPS}
+        self.results = self.context.Queue()
+        self.processes = {}  # worker id -> (group, Process)
+        self.ready = set()
+        self.model_memory = {}  # worker id -> {registry key: MB} as last reported
+        self.running = {}  # worker id -> task id
+        self.pending = {}  # task id -> (Future, SharedMemory or None, group)
+        self.completed = {group: 0 for group in WORKER_GROUPS}
+        self.failed = {group: 0 for group in WORKER_GROUPS}
+        self.restarts = 0
+        self.lock = threading.Lock()
+        self.collector = None
+
+    def start(self):
+        for group, count in self.workers_per_model.items():
+            for index in range(count):
+                self._spawn(f"{group}-{index}", group)
+        self.collector = threading.Thread(target=self._collect, name="inference-pool-collector", daemon=True)
+        self.collector.start()
+        logger.info(f"Started inference workers: {self.workers_per_model}, {self.num_threads} torch thread(s) each.")
+
+    def _spawn(self, worker_id: str, group: str):
+        process = self.context.Process(
+            target=worker_main,
+            args=(worker_id, group, self.preload, self.streaming_model, self.num_threads,
+                  self.tasks[group], self.results),
+            name=f"inference-{worker_id}",
+            daemon=True
+        )
+        process.start()
+        self.processes[worker_id] = (group, process)
+
+    def submit(self, group: str, method: str, audio: np.ndarray = None, **kwargs) -> concurrent.futures.Future:
+        if self.workers_per_model.get(group, 0) == 0:
+            raise RuntimeError(f"No inference workers are configured for '{group}'.")
+        future = concurrent.futures.Future()
+        task_id = uuid.uuid4().hex
+        block = None
+        audio_spec = None
+        if audio is not None:
+            block = shared_memory.SharedMemory(create=True, size=max(audio.nbytes, 1))
+            np.ndarray(audio.shape, dtype=audio.dtype, buffer=block.buf)[...] = audio
+            audio_spec = (block.name, audio.shape, audio.dtype.str)
+        with self.lock:
+            self.pending[task_id] = (future, block, group)
+        self.tasks[group].put((task_id, method, audio_spec, kwargs))
+        return future
+
+    def run(self, group: str, method: str, audio: np.ndarray = None, **kwargs):
+        """Submit a task and wait for its result; worker errors are raised as RuntimeError."""
+        return self.submit(group, method, audio, **kwargs).result()
+
+    def _collect(self):
+        checked = time.monotonic()
+        while True:
+            if time.monotonic() - checked >= 1.0:
+                self._check_workers()
+                checked = time.monotonic()
+            try:
+                kind, worker_id, task_id, payload = self.results.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            with self.lock:
+                if kind == "ready":
+                    self.ready.add(worker_id)
+                    self.model_memory[worker_id] = payload
+                elif kind == "started":
+                    self.running[worker_id] = task_id
+                elif kind == "done":
+                    ok, result, observed, sizes = payload
+                    metrics.merge(observed)
+                    self.model_memory[worker_id] = sizes
+                    self.running.pop(worker_id, None)
+                    self._resolve(task_id, ok, result)
+
+    def _resolve(self, task_id: str, ok: bool, result):
+        entry = self.pending.pop(task_id, None)
+        if entry is None:
+            return
+        future, block, group = entry
+        if block is not None:
+            block.close()
+            block.unlink()
+        if ok:
+            self.completed[group] += 1
+            future.set_result(result)
+        else:
+            self.failed[group] += 1
+            future.set_exception(RuntimeError(result))
+
+    def _check_workers(self):
+        with self.lock:
+            for worker_id, (group, process) in list(self.processes.items()):
+                if process.is_alive():
+                    continue
+                logger.error(f"Inference worker {worker_id} exited with code {process.exitcode}; restarting it.")
+                self.ready.discard(worker_id)
+                self.model_memory.pop(worker_id, None)
+                task_id = self.running.pop(worker_id, None)
+                if task_id is not None:
+                    self._resolve(task_id, False, f"Inference worker {worker_id} crashed.")
+                self.restarts += 1
+                self._spawn(worker_id, group)
+
+    def model_memory_mb(self) -> dict:
+        """Estimated MB per loaded model, summed over the workers that hold a copy."""
+        totals = {}
+        with self.lock:
+            for sizes in self.model_memory.values():
+                for name, size_mb in sizes.items():
+                    totals[name] = totals.get(name, 0.0) + size_mb
+        return totals
+
+    def is_ready(self) -> bool:
+        with self.lock:
+            return len(self.ready) == len(self.processes) > 0
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "workers": {
+                    worker_id: {
+                        "group": group,
+                        "pid": process.pid,
+                        "ready": worker_id in self.ready,
+                        "busy": worker_id in self.running
+                    } for worker_id, (group, process) in self.processes.items()
+                },
+                "queued": {
+                    group: sum(1 for _, _, task_group in self.pending.values() if task_group == group)
+                    - sum(1 for worker_id in self.running if self.processes[worker_id][0] == group)
+                    for group in WORKER_GROUPS
+                },
+                "completed": dict(self.completed),
+                "failed": dict(self.failed),
+                "restarts": self.restarts
+            }
+
+    def shutdown(self, timeout: float = 5.0):
+        for group, count in self.workers_per_model.items():
+            for _ in range(count):
+                self.tasks[group].put(None)
+        deadline = time.monotonic() + timeout
+        for _, process in self.processes.values():
+            process.join(max(deadline - time.monotonic(), 0))
+            if process.is_alive():
+                process.terminate()
+
+class RemoteModel:
+    """
+    Stands in for a model object in the gateway: attributes (names, settings,
+    engine choice) come from the local object, which is never loaded, while
+    inference methods run in the pool.
+    """
+
+    def __init__(self, pool: InferencePool, local):
+        self.pool = pool
+        self.local = local
+
+    def __getattr__(self, name):
+        return getattr(self.local, name)
+
+class RemoteWhisperModels(RemoteModel):
+    def transcribe(self, audio: np.ndarray, language: str = "en", model_names: list = None,
+                   word_timestamps: bool = False, progress=None) -> dict:
+        if is_long_audio(audio):
+            # Chunks fan out over the whisper workers, each with its own model instances
+            names = [name for name in self.local.model_names if model_names is None or name in model_names]
+            return transcribe_in_chunks(
+                audio,
+                lambda chunk: self.pool.run(
+                    "whisper", "transcribe_chunk", chunk, language=language, model_names=names, word_timestamps=word_timestamps
+                ),
+                min(Config.LONG_AUDIO_WORKERS, self.pool.workers_per_model["whisper"]), progress=progress
+            )
+        # A callback cannot cross into the worker process; callers only see the call finish
+        result = self.pool.run(
+            "whisper", "transcribe", audio, language=language, model_names=model_names, word_timestamps=word_timestamps
+        )
+        if progress is not None:
+            progress(1, 1)
+        return result
+
+class RemoteDiarizationPipeline(RemoteModel):
+    def diarize_turns(self, audio: np.ndarray, config: dict, return_embeddings: bool = False, cache: bool = True) -> dict:
+        return self.pool.run(
+            "pyannote", "diarize_turns", audio, config=config, return_embeddings=return_embeddings, cache=cache
+        )
+
+    @property
+    def default_config(self) -> dict:
+        if self.local._default_config is None:
+            self.local._default_config = self.pool.run("pyannote", "default_config")
+        return self.local._default_config
+
+class RemoteCombiner(RemoteModel):
+    def combine_transcripts(self, real_time_transcript: str, whisper_transcript: str, mode: str = None) -> dict:
+        return self.pool.run(
+            "combiner", "combine_transcripts", real_time_transcript=real_time_transcript,
+            whisper_transcript=whisper_transcript, mode=mode
+        )
@@ -0,0 +1,8 @@
+# app/utils/hashing.py
+
+import hashlib
+import numpy as np
+
+def fingerprint_audio(audio: np.ndarray) -> str:
+    """Content hash of a waveform buffer, computed over its memory without copying."""
+    return hashlib.blake2b(np.ascontiguousarray(audio), digest_size=16).hexdigest()
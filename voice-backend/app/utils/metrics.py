@@ -0,0 +1,229 @@
+# app/utils/metrics.py
+
+import time
+import bisect
+import threading
+import contextlib
+from collections import OrderedDict, deque
+from app.config import Config
+
+# Seconds; from a 250 ms chunk's resampling up to a long recording's transcription
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+REGISTRY = []
+
+def escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+class Metric:
+    """
+    A metric family in the Prometheus text format. Values are kept per label
+    combination; `labels` names the label keys in order.
+    """
+
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(label, "")) for label in self.labels)
+
+    def format_labels(self, key: tuple, extra: dict = None) -> str:
+        pairs = list(zip(self.labels, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in pairs) + "}"
+
+    def drain(self) -> dict:
+        """Take the values recorded so far, leaving the metric empty."""
+        with self.lock:
+            values, self.values = self.values, {}
+        return values
+
+    def merge(self, values: dict):
+        """Add values drained from the same metric in another process."""
+        with self.lock:
+            for key, amount in values.items():
+                self.values[key] = self.values.get(key, 0.0) + amount
+
+    def samples(self) -> list:
+        """(metric name, label string, value) lines."""
+        with self.lock:
+            return [(self.name, self.format_labels(key), value) for key, value in self.values.items()]
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(f"{name}{labels} {float(value)!r}" for name, labels, value in self.samples())
+        return "\n".join(lines)
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+class Gauge(Metric):
+    """
+    Either set directly, or read at scrape time from `function`, which returns a
+    number, or a dict of label-value tuples to numbers for a labelled gauge.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), function=None):
+        super().__init__(name, documentation, labels)
+        self.function = function
+
+    def set(self, value: float, **labels):
+        with self.lock:
+            self.values[self.key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def merge(self, values: dict):
+        """A gauge is a current reading: another process's values replace these rather than add up."""
+        with self.lock:
+            self.values.update(values)
+
+    def samples(self) -> list:
+        if self.function is None:
+            return super().samples()
+        values = self.function()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [(self.name, self.format_labels(tuple(map(str, key))), value) for key, value in values.items()]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self.key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts, total = self.values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self.values[key] = (counts, total + value)
+
+    def merge(self, values: dict):
+        with self.lock:
+            for key, (counts, total) in values.items():
+                own_counts, own_total = self.values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+                self.values[key] = ([own + other for own, other in zip(own_counts, counts)], own_total + total)
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self) -> list:
+        with self.lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self.values.items()]
+        samples = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(float(bound))
+                samples.append((f"{self.name}_bucket", self.format_labels(key, {"le": le}), cumulative))
+            samples.append((f"{self.name}_sum", self.format_labels(key), total))
+            samples.append((f"{self.name}_count", self.format_labels(key), cumulative))
+        return samples
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+def drain() -> dict:
+    """
+    Counter and histogram values recorded since the last drain, by metric name.
+    Inference worker processes send these back with each result, so model
+    timings recorded there show up in the gateway's /metrics.
+    """
+    drained = {}
+    for metric in REGISTRY:
+        if isinstance(metric, (Counter, Histogram)):
+            values = metric.drain()
+            if values:
+                drained[metric.name] = values
+    return drained
+
+def merge(drained: dict):
+    """Add values from `drain` in another process to this process's metrics."""
+    metrics = {metric.name: metric for metric in REGISTRY}
+    for name, values in drained.items():
+        if name in metrics:
+            metrics[name].merge(values)
+
+class Tracer:
+    """
+    Recent timed spans per session id, for following one request through the
+    pipeline (/traces/{sid}). Keeps the last `max_spans` spans of the
+    `max_sessions` most recently active sessions.
+    """
+
+    def __init__(self, enabled: bool = Config.TRACING_ENABLED, max_sessions: int = Config.TRACE_MAX_SESSIONS,
+                 max_spans: int = 500):
+        self.enabled = enabled
+        self.max_sessions = max_sessions
+        self.max_spans = max_spans
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+
+    def record(self, sid: str, name: str, start: float, duration: float):
+        if not self.enabled or sid is None:
+            return
+        with self.lock:
+            spans = self.sessions.get(sid)
+            if spans is None:
+                spans = self.sessions[sid] = deque(maxlen=self.max_spans)
+                while len(self.sessions) > self.max_sessions:
+                    self.sessions.popitem(last=False)
+            self.sessions.move_to_end(sid)
+            spans.append({"name": name, "start": start, "duration": duration})
+
+    def spans(self, sid: str) -> list:
+        with self.lock:
+            return list(self.sessions.get(sid, ()))
+
+STAGE_SECONDS = Histogram("pipeline_stage_seconds", "Time spent in each processing stage.", ("stage",))
+EXECUTOR_WAIT_SECONDS = Histogram(
+    "executor_wait_seconds", "Time a stage waited for a free processing thread.", ("stage",)
+)
+WHISPER_SECONDS = Histogram("whisper_inference_seconds", "Whisper transcription time per model.", ("model",))
+DIARIZATION_SECONDS = Histogram("diarization_inference_seconds", "pyannote diarization time.")
+AUDIO_SECONDS = Counter("audio_processed_seconds_total", "Seconds of recorded audio processed after stop.")
+ADMISSION_DECISIONS = Counter("admission_decisions_total", "Recordings admitted per quality tier, or rejected.", ("tier",))
+tracer = Tracer()
+
+@contextlib.contextmanager
+def stage(name: str, sid: str = None):
+    """Time a pipeline stage into STAGE_SECONDS and, when tracing, into the session's spans."""
+    started = time.time()
+    started_counter = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started_counter
+        STAGE_SECONDS.observe(duration, stage=name)
+        tracer.record(sid, name, started, duration)
@@ -0,0 +1,29 @@
+# app/utils/text_utils.py
+
+import re
+
+_NON_WORD = re.compile(r"[^\w']+")
+
+def normalize_word(word: str) -> str:
+    return _NON_WORD.sub("", word.lower())
+
+def dedupe_overlap(previous_words: list, new_words: list, max_skip: int = 2, min_match: int = 2) -> list:
+    """
+    Drop the words at the start of `new_words` that repeat the tail of `previous_words`.
+
+    Consecutive flush windows share an overlap of audio, so the longest suffix of the
+    previous window that reappears as a prefix of the new one marks the seam. Up to
+    `max_skip` leading words of the new window may be fragments of a word cut by the
+    overlap boundary and are skipped when a match follows them. A match must be at
+    least `min_match` words: a single repeated word ("the ... the") is as likely to
+    be spoken twice as to be overlap.
+    """
+    previous = [normalize_word(w) for w in previous_words]
+    new = [normalize_word(w) for w in new_words]
+    seam = 0
+    for skip in range(min(max_skip, len(new)) + 1):
+        for k in range(min(len(previous), len(new) - skip), min_match - 1, -1):
+            if previous[-k:] == new[skip:skip + k]:
+                seam = max(seam, skip + k)
+                break
+    return new_words[seam:]
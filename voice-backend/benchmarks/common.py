@@ -0,0 +1,71 @@
+# benchmarks/common.py
+"""Measurement and reporting helpers shared by the benchmark scripts."""
+
+import os
+import sys
+import json
+import time
+import platform
+import resource
+import subprocess
+import numpy as np
+from app.config import Config
+
+def percentiles(samples: list) -> dict:
+    """Summary of latency `samples` in seconds."""
+    if not samples:
+        return {"count": 0}
+    values = np.asarray(samples, dtype=np.float64)
+    return {
+        "count": len(values),
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p90": float(np.percentile(values, 90)),
+        "p99": float(np.percentile(values, 99)),
+        "max": float(values.max())
+    }
+
+def peak_rss_mb(pid: int = None) -> float:
+    """Peak resident set size of this process, or of `pid` from /proc (Linux)."""
+    if pid is None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment() -> dict:
+    """What the numbers depend on besides the code: machine and the settings under test."""
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {
+            "WHISPER_MODELS": Config.WHISPER_MODELS,
+            "WHISPER_SELECTION_MODE": Config.WHISPER_SELECTION_MODE,
+            "INFERENCE_ENGINE": Config.INFERENCE_ENGINE,
+            "INFERENCE_MODE": Config.INFERENCE_MODE,
+            "TORCH_NUM_THREADS": Config.TORCH_NUM_THREADS,
+            "MAX_THREADS_FOR_PROCESSING": int(os.getenv("MAX_THREADS_FOR_PROCESSING", 5)),
+            "BUFFER_FLUSH_INTERVAL": Config.BUFFER_FLUSH_INTERVAL,
+            "NOISE_REDUCTION": Config.NOISE_REDUCTION,
+            "VAD_ENABLED": Config.VAD_ENABLED
+        }
+    }
+
+def write_json(path: str, report: dict):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {path}")
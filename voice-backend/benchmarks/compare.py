@@ -0,0 +1,78 @@
+# benchmarks/compare.py
+"""
+Compare two benchmark reports (from benchmarks.pipeline or benchmarks.socket_load).
+
+    cd voice-backend
+    python -m benchmarks.compare baseline.json current.json --threshold 10 --fail-on-regression
+
+Every numeric metric present in both reports is listed with its relative change.
+Latencies, RTF and memory are better when lower; throughput is better when
+higher. Changes worse than --threshold percent are marked as regressions, and
+--fail-on-regression makes the exit status non-zero when there are any, for CI.
+"""
+
+import sys
+import json
+import argparse
+
+# Sections and fields that are settings or counts rather than measurements
+IGNORED_SECTIONS = ("environment", "parameters")
+IGNORED_FIELDS = ("count", "sessions", "clients", "completed", "concurrency")
+
+def flatten(report, prefix: str = "") -> dict:
+    """{"stages.vad.p50": 0.01, ...}; lists of levels are keyed by their concurrency."""
+    values = {}
+    if isinstance(report, dict):
+        for key, value in report.items():
+            values.update(flatten(value, f"{prefix}{key}."))
+    elif isinstance(report, list):
+        for index, item in enumerate(report):
+            label = item.get("concurrency", item.get("clients", index)) if isinstance(item, dict) else index
+            values.update(flatten(item, f"{prefix}{label}."))
+    elif isinstance(report, (int, float)) and not isinstance(report, bool):
+        values[prefix.rstrip(".")] = float(report)
+    return values
+
+def higher_is_better(path: str) -> bool:
+    return "throughput" in path
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Percent change that counts as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline_report = json.load(f)
+    with open(args.current) as f:
+        current_report = json.load(f)
+    baseline = flatten(baseline_report)
+    current = flatten(current_report)
+    print(f"baseline {baseline_report.get('environment', {}).get('commit')} -> "
+          f"current {current_report.get('environment', {}).get('commit')}")
+
+    regressions = 0
+    print(f"{'metric':<55} {'baseline':>12} {'current':>12} {'change':>9}")
+    for path in sorted(baseline.keys() & current.keys()):
+        parts = path.split(".")
+        if parts[0] in IGNORED_SECTIONS or parts[-1] in IGNORED_FIELDS:
+            continue
+        before, after = baseline[path], current[path]
+        change = (after - before) / before * 100 if before else 0.0
+        worse = -change if higher_is_better(path) else change
+        marker = ""
+        if worse > args.threshold:
+            marker = "  REGRESSION"
+            regressions += 1
+        elif worse < -args.threshold:
+            marker = "  improved"
+        print(f"{path:<55} {before:>12.4g} {after:>12.4g} {change:>+8.1f}%{marker}")
+
+    print(f"{regressions} regression(s) beyond {args.threshold:.0f}%")
+    if args.fail_on_regression and regressions:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
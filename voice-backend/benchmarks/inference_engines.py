@@ -0,0 +1,102 @@
+# benchmarks/inference_engines.py
+"""
+Compare Whisper inference engines on real recordings.
+
+    cd voice-backend
+    python -m benchmarks.inference_engines --audio meeting.wav --models base small --engines int8 faster-whisper
+
+For every model, the fp32 torch engine on CPU runs first as the baseline. Each
+engine then reports load time, real-time factor (median processing time divided
+by audio duration; below 1.0 is faster than real time) and the word error rate of
+its transcript measured against the baseline transcript.
+"""
+
+import argparse
+import json
+import time
+import numpy as np
+import soundfile as sf
+import torch
+from app.models.inference_engine import ENGINES, TorchEngine, configure_threads
+from app.services.audio_processor import StreamingResampler
+from app.utils.text_utils import normalize_word
+
+def load_audio(path: str) -> np.ndarray:
+    audio, sample_rate = sf.read(path, dtype="float32", always_2d=True)
+    audio = audio.mean(axis=1)
+    resampler = StreamingResampler(sample_rate)
+    return np.concatenate((resampler.process(audio), resampler.flush()))
+
+def word_error_rate(reference: str, hypothesis: str) -> float:
+    reference_words = [word for word in map(normalize_word, reference.split()) if word]
+    hypothesis_words = [word for word in map(normalize_word, hypothesis.split()) if word]
+    distances = np.arange(len(hypothesis_words) + 1)
+    for i, reference_word in enumerate(reference_words, 1):
+        previous = distances.copy()
+        distances[0] = i
+        for j, hypothesis_word in enumerate(hypothesis_words, 1):
+            distances[j] = min(previous[j] + 1, distances[j - 1] + 1,
+                               previous[j - 1] + (reference_word != hypothesis_word))
+    return float(distances[-1]) / max(len(reference_words), 1)
+
+def run_engine(engine, model_name: str, audio: np.ndarray, language: str, repeats: int, model_dir: str) -> dict:
+    started = time.perf_counter()
+    model = engine.load_whisper(model_name, model_dir)
+    engine.warm_up_whisper(model)
+    load_seconds = time.perf_counter() - started
+
+    timings = []
+    text = ""
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = model.transcribe(audio, language=language, temperature=0.0, fp16=engine.device == "cuda")
+        timings.append(time.perf_counter() - started)
+        text = result["text"]
+    del model
+    return {
+        "load_seconds": load_seconds,
+        "rtf": float(np.median(timings)) / (len(audio) / 16000),
+        "text": text,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", nargs="+", required=True, help="Recordings to transcribe (any rate soundfile reads)")
+    parser.add_argument("--models", nargs="+", default=["base"])
+    parser.add_argument("--engines", nargs="+", default=["int8"], choices=list(ENGINES))
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--language", default="en")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--model-dir", default="./models")
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    configure_threads()
+    audio = np.concatenate([load_audio(path) for path in args.audio])
+    print(f"{len(audio) / 16000:.1f}s of audio, {torch.get_num_threads()} torch threads")
+
+    results = []
+    for model_name in args.models:
+        baseline = run_engine(TorchEngine("cpu"), model_name, audio, args.language, args.repeats, args.model_dir)
+        results.append({"model": model_name, "engine": "torch-fp32", "device": "cpu",
+                        "load_seconds": baseline["load_seconds"], "rtf": baseline["rtf"], "wer_vs_fp32": 0.0})
+        for engine_name in args.engines:
+            engine = ENGINES[engine_name](args.device)
+            if engine_name == TorchEngine.name and engine.device == "cpu":
+                continue  # identical to the baseline
+            run = run_engine(engine, model_name, audio, args.language, args.repeats, args.model_dir)
+            results.append({"model": model_name, "engine": engine_name, "device": engine.device,
+                            "load_seconds": run["load_seconds"], "rtf": run["rtf"],
+                            "wer_vs_fp32": word_error_rate(baseline["text"], run["text"])})
+
+    print(f"{'model':<10} {'engine':<15} {'device':<6} {'load s':>8} {'RTF':>7} {'speedup':>8} {'WER vs fp32':>12}")
+    for result in results:
+        baseline_rtf = next(r["rtf"] for r in results if r["model"] == result["model"] and r["engine"] == "torch-fp32")
+        print(f"{result['model']:<10} {result['engine']:<15} {result['device']:<6} {result['load_seconds']:>8.1f} "
+              f"{result['rtf']:>7.3f} {baseline_rtf / result['rtf']:>7.2f}x {result['wer_vs_fp32'] * 100:>11.2f}%")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
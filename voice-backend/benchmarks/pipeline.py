@@ -0,0 +1,247 @@
+# benchmarks/pipeline.py
+"""
+Stage-by-stage benchmark of the recording pipeline, in-process.
+
+    cd voice-backend
+    python -m benchmarks.pipeline --stub --duration 120 --concurrency 1 2 4 --json pipeline.json
+    WHISPER_MODELS=tiny python -m benchmarks.pipeline --duration 60 --json pipeline-tiny.json
+
+Each run replays a synthetic conversation (benchmarks.synthetic_audio) through
+the server's own Socket.IO handlers in app.routes.socket_events, with no network
+in between: 250 ms PCM chunks go to audio_data (resampler, denoiser, session
+store), every BUFFER_FLUSH_INTERVAL seconds of audio to flush_partial (streaming
+transcription and, with STREAMING_DIARIZATION, streaming speaker windows), and
+the end of the recording to stop_recording, which runs process_audio with its
+admission control, VAD, transcription, diarization and assembly. Events the
+handlers emit are captured instead of sent. Flushes follow the audio rather than
+the wall clock, so sessions replay as fast as the pipeline allows.
+
+Stage latency percentiles come from the session traces of the runs at the
+lowest concurrency level. Overall it reports the real-time factor from
+stop_recording to the final transcription, time to the first partial transcript,
+peak RSS and throughput at each concurrency level (sessions run concurrently on
+one event loop and the server's processing threads, as in the server). The
+result cache is switched off: seeded recordings repeat across invocations, and
+its files outlive the process.
+
+--stub replaces the models with deterministic stand-ins that cost --stub-rtf
+seconds per second of audio (see benchmarks.stub_models); without it, the models
+in WHISPER_MODELS and pyannote run as the server would load them (use the
+smallest, e.g. WHISPER_MODELS=tiny).
+"""
+
+import time
+import asyncio
+import argparse
+import logging
+from collections import defaultdict
+from scipy.signal import resample_poly
+from app.config import Config
+from app.utils import metrics
+from benchmarks.common import percentiles, peak_rss_mb, environment, write_json
+from benchmarks.synthetic_audio import SAMPLE_RATE, synthesize, to_pcm16
+
+CHUNK_SECONDS = 0.25
+STREAMING_STAGES = ("partial_transcription", "partial_diarization")
+POST_RECORDING_STAGES = ("pcm_to_waveform", "vad", "transcription", "diarization", "assembly")
+
+def client_chunks(audio, client_rate: int) -> list:
+    """The recording as the client sends it: 16-bit PCM at the client rate, in 250 ms chunks."""
+    if client_rate != SAMPLE_RATE:
+        audio = resample_poly(audio, client_rate, SAMPLE_RATE)
+    pcm = to_pcm16(audio)
+    step = int(client_rate * CHUNK_SECONDS)
+    return [pcm[start:start + step].tobytes() for start in range(0, len(pcm), step)]
+
+def capture_events(socket_events) -> dict:
+    """Replace sio.emit with a recorder; returns {sid: [(time, event, data)]}."""
+    events = defaultdict(list)
+
+    async def emit(event, data=None, to=None, **kwargs):
+        events[to].append((time.perf_counter(), event, data))
+
+    socket_events.sio.emit = emit
+    return events
+
+def load_models(socket_events):
+    """Load every model before timing anything, in the process that will run it."""
+    started = time.perf_counter()
+    if socket_events.inference_pool is not None:
+        socket_events.inference_pool.start()
+        while not socket_events.inference_pool.is_ready():
+            time.sleep(0.5)
+    else:
+        whisper_models = socket_events.whisper_models
+        socket_events.model_registry.warm_up([whisper_models.key(name) for name in whisper_models.model_names]
+                                             + [socket_events.DiarizationPipeline.REGISTRY_KEY])
+    print(f"Loaded models in {time.perf_counter() - started:.1f}s")
+
+async def run_session(socket_events, events: dict, sid: str, chunks: list, client_rate: int, duration: float) -> dict:
+    """One session through the socket handlers; returns its timings in seconds."""
+    socket_events.audio_buffers[sid] = socket_events.new_audio_buffer(sid)
+    socket_events.buffer_locks[sid] = asyncio.Lock()
+    timings = {"ingest_chunk": [], "partial_flush": [], "first_partial": None}
+    flush_every = Config.BUFFER_FLUSH_INTERVAL * SAMPLE_RATE
+    next_flush = flush_every
+    for chunk in chunks:
+        started = time.perf_counter()
+        await socket_events.audio_data(sid, client_rate, chunk)
+        timings["ingest_chunk"].append(time.perf_counter() - started)
+        if Config.STREAMING_TRANSCRIPTION and len(socket_events.audio_buffers[sid]["audio"]) >= next_flush:
+            # What flush_buffer_periodically does every BUFFER_FLUSH_INTERVAL seconds of real time
+            next_flush += flush_every
+            emitted = len(events[sid])
+            started = time.perf_counter()
+            await socket_events.flush_partial(sid)
+            elapsed = time.perf_counter() - started
+            timings["partial_flush"].append(elapsed)
+            if timings["first_partial"] is None and any(
+                    event == "transcription_partial" for _, event, _ in events[sid][emitted:]):
+                timings["first_partial"] = elapsed
+
+    emitted = len(events[sid])
+    stopped = time.perf_counter()
+    await socket_events.stop_recording(sid)
+    finished, outcome = None, "missing"
+    for at, event, _ in events[sid][emitted:]:
+        if event in ("transcription", "processing_rejected", "error"):
+            finished, outcome = at, event
+            break
+    timings["outcome"] = outcome
+    timings["final_latency"] = (finished or time.perf_counter()) - stopped
+    timings["rtf"] = timings["final_latency"] / duration
+
+    spans = defaultdict(float)
+    for span in metrics.tracer.spans(sid):
+        spans[span["name"]] += span["duration"]
+    timings.update({stage: spans[stage] for stage in STREAMING_STAGES + POST_RECORDING_STAGES if stage in spans})
+
+    await socket_events.disconnect(sid)
+    del events[sid]
+    return timings
+
+async def run_level(socket_events, events: dict, recordings: list, concurrency: int, args) -> tuple:
+    """Run one session per recording, `concurrency` at a time; returns (timings, wall seconds)."""
+    slots = asyncio.Semaphore(concurrency)
+
+    async def session(index, chunks):
+        async with slots:
+            return await run_session(socket_events, events, f"bench-{concurrency}-{index}", chunks,
+                                     args.client_rate, args.duration)
+
+    started = time.perf_counter()
+    runs = await asyncio.gather(*(session(index, chunks) for index, chunks in enumerate(recordings)))
+    return runs, time.perf_counter() - started
+
+def stage_summary(runs: list, stage: str) -> dict:
+    return percentiles([run[stage] for run in runs if stage in run])
+
+async def benchmark(socket_events, args) -> dict:
+    events = capture_events(socket_events)
+    counts = [max(args.repeats, concurrency) for concurrency in args.concurrency]
+    # One distinct recording per session, generated up front so synthesis is not timed
+    recordings = [
+        client_chunks(synthesize(args.duration, args.speakers, args.seed + index)[0], args.client_rate)
+        for index in range(1 + sum(counts))
+    ]
+    metrics.tracer.enabled = True
+    metrics.tracer.max_sessions = len(recordings)
+
+    # Warm-up run: first-call costs (allocations, lazy imports) are not what we measure
+    await run_session(socket_events, events, "bench-warmup", recordings.pop(), args.client_rate, args.duration)
+
+    runs_by_level = {}
+    levels = []
+    for concurrency, count in zip(args.concurrency, counts):
+        level_recordings, recordings = recordings[:count], recordings[count:]
+        runs, wall = await run_level(socket_events, events, level_recordings, concurrency, args)
+        runs_by_level[concurrency] = runs
+        completed = [run for run in runs if run["outcome"] == "transcription"]
+        levels.append({
+            "concurrency": concurrency,
+            "sessions": count,
+            "completed": len(completed),
+            "rejected": sum(run["outcome"] == "processing_rejected" for run in runs),
+            "wall_seconds": wall,
+            "throughput_audio_seconds_per_second": len(completed) * args.duration / wall,
+            "final_latency": percentiles([run["final_latency"] for run in completed]),
+            "rtf": percentiles([run["rtf"] for run in completed])
+        })
+
+    # Per-stage latencies from the lowest level only, so contention does not blur them
+    stage_runs = runs_by_level[min(args.concurrency)]
+    completed = [run for run in stage_runs if run["outcome"] == "transcription"]
+    stages = {
+        "ingest_chunk": percentiles([value for run in stage_runs for value in run["ingest_chunk"]]),
+        "partial_flush": percentiles([value for run in stage_runs for value in run["partial_flush"]]),
+        **{stage: stage_summary(stage_runs, stage) for stage in STREAMING_STAGES + POST_RECORDING_STAGES}
+    }
+    return {
+        "benchmark": "pipeline",
+        "environment": environment(),
+        "parameters": {**vars(args), "models": "stub" if args.stub else Config.WHISPER_MODELS},
+        "stages": {stage: summary for stage, summary in stages.items() if summary["count"]},
+        "time_to_first_result": percentiles([run["first_partial"] for run in stage_runs
+                                             if run["first_partial"] is not None]),
+        "final_latency": percentiles([run["final_latency"] for run in completed]),
+        "rtf": percentiles([run["rtf"] for run in completed]),
+        "concurrency": levels,
+        "peak_rss_mb": peak_rss_mb()
+    }
+
+def print_report(report: dict, args):
+    print(f"{args.duration:.0f}s sessions, {'stub' if args.stub else ', '.join(Config.WHISPER_MODELS)} models")
+    print(f"{'stage':<22} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9}")
+    for stage, summary in list(report["stages"].items()) + [("first partial", report["time_to_first_result"]),
+                                                             ("final latency", report["final_latency"])]:
+        if not summary["count"]:
+            continue
+        print(f"{stage:<22} {summary['p50'] * 1000:>9.1f} {summary['p90'] * 1000:>9.1f} {summary['p99'] * 1000:>9.1f}")
+    print(f"{'concurrency':>11} {'sessions':>9} {'rejected':>9} {'audio s/s':>10} {'p50 RTF':>8} {'p90 latency s':>14}")
+    for level in report["concurrency"]:
+        rtf = f"{level['rtf']['p50']:>8.3f}" if level["rtf"]["count"] else f"{'-':>8}"
+        latency = f"{level['final_latency']['p90']:>14.2f}" if level["final_latency"]["count"] else f"{'-':>14}"
+        print(f"{level['concurrency']:>11} {level['sessions']:>9} {level['rejected']:>9} "
+              f"{level['throughput_audio_seconds_per_second']:>10.1f} {rtf} {latency}")
+    print(f"Peak RSS: {report['peak_rss_mb']:.0f} MB")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of audio per session")
+    parser.add_argument("--speakers", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=3, help="Sessions per concurrency level (at least the level)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1])
+    parser.add_argument("--client-rate", type=int, default=16000, help="Sample rate the simulated client sends")
+    parser.add_argument("--stub", action="store_true", help="Use stub models instead of real ones")
+    parser.add_argument("--stub-rtf", type=float, default=0.05)
+    parser.add_argument("--json", help="Write the report to this file")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+
+    if args.stub:
+        # The diarization pipeline refuses to start without a token, even though the stub never uses it
+        Config.PYANNOTE_TOKEN = Config.PYANNOTE_TOKEN or "stub"
+    # Imported here: the module builds the server's models and services from the environment
+    from app.routes import socket_events
+    if args.stub:
+        from benchmarks.stub_models import install
+        install(socket_events, args.stub_rtf)
+    else:
+        load_models(socket_events)
+    # Repeated runs must do the work
+    socket_events.transcription_service.cache = None
+    socket_events.diarization_service.cache = None
+
+    try:
+        report = asyncio.run(benchmark(socket_events, args))
+    finally:
+        if not args.stub and socket_events.inference_pool is not None:
+            socket_events.inference_pool.shutdown()
+    print_report(report, args)
+    if args.json:
+        write_json(args.json, report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+# benchmarks/socket_load.py
+"""
+End-to-end load test: N simulated Socket.IO clients stream audio in real time.
+
+    cd voice-backend
+    python -m benchmarks.stub_server --port 5000 &
+    python -m benchmarks.socket_load --url http://127.0.0.1:5000 --clients 1 4 8 --duration 60 \\
+        --server-pid $! --json load.json
+
+Each client connects, negotiates the framed protocol with audio_start (or uses
+the legacy audio_data event with --protocol legacy), sends a synthetic
+conversation in 250 ms chunks paced at real time (--speed to replay faster),
+then stops recording and waits for the final transcription. Per concurrency
+level it reports time to the first partial transcript, latency from
+stop_recording to the final transcription, throughput in audio seconds per
+wall second, backpressure and error counts, and the server's peak RSS when
+--server-pid is given. Needs the async Socket.IO client
+(pip install "python-socketio[asyncio_client]").
+"""
+
+import argparse
+import asyncio
+import time
+import socketio
+from app.services.wire_protocol import FRAME_HEADER, PROTOCOL_VERSION, CODEC_IDS
+from benchmarks.common import percentiles, peak_rss_mb, environment, write_json
+from benchmarks.synthetic_audio import SAMPLE_RATE, synthesize, to_pcm16
+
+CHUNK_SECONDS = 0.25
+
+async def run_client(url: str, index: int, pcm, args) -> dict:
+    client = socketio.AsyncClient(reconnection=False)
+    result = {"first_partial": None, "final_latency": None, "backpressure": 0, "errors": 0}
+    final = asyncio.get_running_loop().create_future()
+    started = None
+
+    @client.on("transcription_partial")
+    async def on_partial(data):
+        if result["first_partial"] is None:
+            result["first_partial"] = time.perf_counter() - started
+
+    @client.on("backpressure")
+    async def on_backpressure(data):
+        result["backpressure"] += 1
+
+    @client.on("error")
+    async def on_error(data):
+        result["errors"] += 1
+
+    @client.on("transcription")
+    async def on_transcription(data):
+        if not final.done():
+            final.set_result(data)
+
+    await client.connect(url, transports=["websocket"])
+    try:
+        await client.emit("diarization_config", {"num_speakers": args.speakers})
+        if args.protocol == "frames":
+            ack = await client.call("audio_start", {
+                "version": PROTOCOL_VERSION, "codec": "pcm16", "sample_rate": SAMPLE_RATE, "channels": 1
+            })
+            if not ack.get("accepted"):
+                raise RuntimeError(f"audio_start rejected: {ack.get('error')}")
+
+        step = int(SAMPLE_RATE * CHUNK_SECONDS)
+        started = time.perf_counter()
+        for seq, offset in enumerate(range(0, len(pcm), step)):
+            chunk = pcm[offset:offset + step].tobytes()
+            if args.protocol == "frames":
+                header = FRAME_HEADER.pack(PROTOCOL_VERSION, CODEC_IDS["pcm16"], 0, seq, offset,
+                                           int((time.perf_counter() - started) * 1000))
+                await client.emit("audio_frame", header + chunk)
+            else:
+                await client.emit("audio_data", (SAMPLE_RATE, chunk))
+            # Pace against the clock, not per chunk, so send overhead does not accumulate
+            delay = started + (offset + step) / SAMPLE_RATE / args.speed - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        stopped = time.perf_counter()
+        await client.emit("stop_recording")
+        await asyncio.wait_for(final, timeout=args.timeout)
+        result["final_latency"] = time.perf_counter() - stopped
+    except Exception as e:
+        print(f"Client {index} failed: {e}")
+        result["errors"] += 1
+    finally:
+        await client.disconnect()
+    return result
+
+async def run_level(args, clients: int, recordings: list) -> dict:
+    started = time.perf_counter()
+    results = await asyncio.gather(*[
+        run_client(args.url, index, recordings[index], args) for index in range(clients)
+    ])
+    wall = time.perf_counter() - started
+    completed = [result for result in results if result["final_latency"] is not None]
+    return {
+        "clients": clients,
+        "completed": len(completed),
+        "wall_seconds": wall,
+        "throughput_audio_seconds_per_second": len(completed) * args.duration / wall,
+        "time_to_first_result": percentiles([r["first_partial"] for r in results if r["first_partial"] is not None]),
+        "final_latency": percentiles([result["final_latency"] for result in completed]),
+        "backpressure_events": sum(result["backpressure"] for result in results),
+        "errors": sum(result["errors"] for result in results),
+        "server_peak_rss_mb": peak_rss_mb(args.server_pid) if args.server_pid else None
+    }
+
+async def run(args) -> list:
+    levels = []
+    seed = args.seed
+    for clients in args.clients:
+        # Fresh recordings per level, or the server's result cache would answer repeats
+        recordings = [to_pcm16(synthesize(args.duration, args.speakers, seed + index)[0]) for index in range(clients)]
+        seed += clients
+        level = await run_level(args, clients, recordings)
+        levels.append(level)
+        print(f"{clients:>3} clients: {level['completed']}/{clients} completed, "
+              f"first partial p50 {level['time_to_first_result'].get('p50', float('nan')):.2f}s, "
+              f"final p50 {level['final_latency'].get('p50', float('nan')):.2f}s "
+              f"p90 {level['final_latency'].get('p90', float('nan')):.2f}s, "
+              f"{level['throughput_audio_seconds_per_second']:.1f} audio s/s, {level['errors']} errors")
+    return levels
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:5000")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of audio per client")
+    parser.add_argument("--speakers", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed; 1.0 is real time")
+    parser.add_argument("--protocol", choices=["frames", "legacy"], default="frames")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Seconds to wait for the final transcription")
+    parser.add_argument("--server-pid", type=int, help="Server process to read the peak RSS of (Linux)")
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+
+    levels = asyncio.run(run(args))
+    if args.json:
+        write_json(args.json, {
+            "benchmark": "socket_load",
+            "environment": environment(),
+            "parameters": vars(args),
+            "concurrency": levels
+        })
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# benchmarks/stub_models.py
+"""
+Stand-ins for Whisper, pyannote and the combiner with the same interfaces and
+deterministic output. Each call sleeps in proportion to the audio length
+(`rtf` seconds per second of audio), so the benchmarks measure everything
+around the models, plus a predictable model cost, without downloading weights.
+"""
+
+import time
+import numpy as np
+
+class StubWhisperModels:
+    """Duck-types WhisperModels.transcribe/settings: one word every `word_seconds`."""
+
+    def __init__(self, rtf: float = 0.05, word_seconds: float = 0.4, segment_words: int = 12):
+        self.rtf = rtf
+        self.word_seconds = word_seconds
+        self.segment_words = segment_words
+        self.model_names = ["stub"]
+        self.scheduler = None
+
+    def settings(self) -> dict:
+        return {"models": ["stub"], "rtf": self.rtf}
+
+    def fastest_model(self) -> str:
+        return "stub"
+
+    def transcribe(self, audio: np.ndarray, language: str = "en", model_names: list = None,
+                   word_timestamps: bool = False, progress=None) -> dict:
+        duration = len(audio) / 16000
+        time.sleep(duration * self.rtf)
+        starts = np.arange(0, max(duration - self.word_seconds, 0), self.word_seconds)
+        segments = []
+        for first in range(0, len(starts), self.segment_words):
+            words = [{
+                "word": f" w{index}",
+                "start": float(start),
+                "end": float(start + self.word_seconds * 0.8),
+                "probability": 0.9
+            } for index, start in enumerate(starts[first:first + self.segment_words], first)]
+            segments.append({
+                "start": words[0]["start"],
+                "end": words[-1]["end"],
+                "text": "".join(word["word"] for word in words),
+                "avg_logprob": -0.2,
+                "no_speech_prob": 0.01,
+                "compression_ratio": 1.2,
+                "words": words if word_timestamps else [],
+                "model": "stub"
+            })
+        if progress is not None:
+            progress(1, 1)
+        return {"text": "".join(segment["text"] for segment in segments).strip(), "segments": segments}
+
+class StubDiarizationPipeline:
+    """Duck-types DiarizationPipeline.diarize_turns: speakers take fixed-length turns in rotation."""
+
+    def __init__(self, rtf: float = 0.05, turn_seconds: float = 4.0, embedding_size: int = 192):
+        self.rtf = rtf
+        self.turn_seconds = turn_seconds
+        self.embedding_size = embedding_size
+        self.default_config = {"clustering": {"threshold": 0.7}}
+
+    def diarize_turns(self, audio: np.ndarray, config: dict, return_embeddings: bool = False, cache: bool = True) -> dict:
+        duration = len(audio) / 16000
+        time.sleep(duration * self.rtf)
+        num_speakers = config.get("num_speakers") or 2
+        turns = []
+        for index, start in enumerate(np.arange(0, duration, self.turn_seconds)):
+            turns.append((float(start), float(min(start + self.turn_seconds, duration)), f"SPEAKER_{index % num_speakers:02d}"))
+        labels = sorted({speaker for _, _, speaker in turns})
+        durations = np.array([sum(end - start for start, end, speaker in turns if speaker == label) for label in labels])
+        centroids = None
+        if return_embeddings:
+            # Fixed, well separated direction per label so session registries match them up
+            centroids = np.eye(len(labels), self.embedding_size, dtype=np.float32)
+        return {"turns": turns, "labels": labels, "durations": durations, "centroids": centroids}
+
+class StubCombiner:
+    mode = "stub"
+    window_words = 0
+    num_beams = 0
+    engine = type("StubEngine", (), {"name": "stub"})()
+
+    def __init__(self, rtf_per_word: float = 0.001):
+        self.rtf_per_word = rtf_per_word
+
+    def combine_transcripts(self, real_time_transcript: str, whisper_transcript: str, mode: str = None) -> dict:
+        time.sleep(len(whisper_transcript.split()) * self.rtf_per_word)
+        return {"text": whisper_transcript}
+
+def install(socket_events, rtf: float = 0.05):
+    """Swap the stubs into the running server's services (see benchmarks.stub_server)."""
+    whisper_models = StubWhisperModels(rtf)
+    socket_events.whisper_models = whisper_models
+    socket_events.transcription_service.whisper_models = whisper_models
+    socket_events.diarization_service.diarization_pipeline = StubDiarizationPipeline(rtf)
+    socket_events.combiner = StubCombiner()
+    socket_events.STREAMING_MODEL = "stub"
+    socket_events.PRELOAD_MODELS = []
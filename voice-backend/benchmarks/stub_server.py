@@ -0,0 +1,35 @@
+# benchmarks/stub_server.py
+"""
+Run the server with stub models, for load tests without model weights.
+
+    cd voice-backend
+    python -m benchmarks.stub_server --port 5000 --stub-rtf 0.05
+
+Everything except the models is the real server: Socket.IO handling, ingest,
+session store, VAD, streaming flushes, assembly. See benchmarks.stub_models.
+"""
+
+import os
+import argparse
+import uvicorn
+
+# The diarization pipeline refuses to start without a token, even though the stub never uses it
+os.environ.setdefault("PYANNOTE_TOKEN", "stub")
+
+from app.routes import socket_events  # noqa: E402
+from benchmarks.stub_models import install  # noqa: E402
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--stub-rtf", type=float, default=0.05, help="Stub model seconds per second of audio")
+    args = parser.parse_args()
+
+    install(socket_events, args.stub_rtf)
+    from app.main import create_app
+    print(f"Serving stub models on {args.host}:{args.port} (pid {os.getpid()})")
+    uvicorn.run(create_app(), host=args.host, port=args.port, log_level="warning")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# tests/test_audio_processor.py
+
+import numpy as np
+import pytest
+from scipy.signal import resample_poly
+from app.services.audio_processor import (
+    StreamingResampler, StreamingNoiseReducer, VoiceActivityDetector, SpeechTimeline, TARGET_SAMPLE_RATE
+)
+
+def tone(seconds: float, sample_rate: int = TARGET_SAMPLE_RATE, frequency: float = 440.0, amplitude: float = 0.5):
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.float32)
+
+def stream(processor, audio: np.ndarray, chunk_size: int) -> np.ndarray:
+    chunks = [processor.process(audio[start:start + chunk_size]) for start in range(0, len(audio), chunk_size)]
+    return np.concatenate(chunks + [processor.flush()])
+
+@pytest.mark.parametrize("input_rate", [8000, 22050, 44100, 48000])
+@pytest.mark.parametrize("chunk_size", [1000, 4096])
+def test_resampler_matches_resample_poly(input_rate, chunk_size):
+    audio = np.random.default_rng(0).standard_normal(int(1.3 * input_rate)).astype(np.float32) * 0.1
+    resampler = StreamingResampler(input_rate)
+    expected = resample_poly(audio.astype(np.float64), resampler.up, resampler.down)
+    output = stream(resampler, audio, chunk_size)
+    assert len(output) == len(expected)
+    np.testing.assert_allclose(output, expected, atol=1e-5)
+
+def test_resampler_passthrough_at_target_rate():
+    resampler = StreamingResampler(TARGET_SAMPLE_RATE)
+    audio = tone(0.5)
+    assert resampler.passthrough
+    np.testing.assert_array_equal(stream(resampler, audio, 1000), audio)
+
+def test_resampler_flush_resets_the_stream():
+    resampler = StreamingResampler(48000)
+    audio = tone(0.5, 48000)
+    first = stream(resampler, audio, 4096)
+    second = stream(resampler, audio, 4096)
+    np.testing.assert_array_equal(first, second)
+
+@pytest.mark.parametrize("chunk_size", [512, 4000, 16000])
+def test_denoiser_preserves_length(chunk_size):
+    rng = np.random.default_rng(1)
+    audio = rng.standard_normal(3 * TARGET_SAMPLE_RATE).astype(np.float32) * 0.01
+    audio[TARGET_SAMPLE_RATE:2 * TARGET_SAMPLE_RATE] += tone(1.0)
+    output = stream(StreamingNoiseReducer(), audio, chunk_size)
+    assert len(output) == len(audio)
+
+def test_denoiser_shorter_than_profile_preserves_length():
+    audio = np.random.default_rng(2).standard_normal(TARGET_SAMPLE_RATE // 2).astype(np.float32) * 0.01
+    output = stream(StreamingNoiseReducer(), audio, 1000)
+    assert len(output) == len(audio)
+
+def test_denoiser_attenuates_stationary_noise():
+    rng = np.random.default_rng(3)
+    noise = rng.standard_normal(4 * TARGET_SAMPLE_RATE).astype(np.float32) * 0.01
+    audio = noise.copy()
+    audio[2 * TARGET_SAMPLE_RATE:3 * TARGET_SAMPLE_RATE] += tone(1.0)
+    output = stream(StreamingNoiseReducer(), audio, 4000)
+    # Noise-only stretch after the profile window, away from the tone
+    quiet = slice(int(1.6 * TARGET_SAMPLE_RATE), int(1.9 * TARGET_SAMPLE_RATE))
+    assert np.std(output[quiet]) < 0.5 * np.std(audio[quiet])
+
+def test_vad_finds_speech_between_silence():
+    rng = np.random.default_rng(4)
+    audio = rng.standard_normal(5 * TARGET_SAMPLE_RATE).astype(np.float32) * 0.001
+    audio[2 * TARGET_SAMPLE_RATE:3 * TARGET_SAMPLE_RATE] += tone(1.0)
+    timeline = VoiceActivityDetector().detect(audio)
+    assert timeline.has_speech
+    assert len(timeline.regions) == 1
+    start, end = timeline.regions[0] / TARGET_SAMPLE_RATE
+    # Padded by 300 ms on each side, plus the 300 ms hangover at the end
+    assert 1.6 <= start <= 2.0
+    assert 3.0 <= end <= 3.7
+    assert 20 < timeline.skipped_percent < 80
+
+def test_vad_silence_has_no_speech():
+    audio = np.random.default_rng(5).standard_normal(2 * TARGET_SAMPLE_RATE).astype(np.float32) * 1e-4
+    timeline = VoiceActivityDetector().detect(audio)
+    assert not timeline.has_speech
+    assert len(timeline.compact(audio)) == 0
+
+def test_vad_short_input():
+    timeline = VoiceActivityDetector().detect(np.zeros(100, dtype=np.float32))
+    assert not timeline.has_speech
+    assert timeline.total_samples == 100
+
+def test_speech_timeline_compacts_and_maps_back():
+    regions = np.array([[16000, 32000], [48000, 64000]], dtype=np.int64)
+    waveform = np.arange(80000, dtype=np.float32)
+    timeline = SpeechTimeline(regions, len(waveform))
+    compact = timeline.compact(waveform)
+    assert timeline.speech_samples == len(compact) == 32000
+    np.testing.assert_array_equal(compact[:16000], waveform[16000:32000])
+    np.testing.assert_array_equal(compact[16000:], waveform[48000:64000])
+    assert timeline.skipped_percent == pytest.approx(60.0)
+
+    segments = timeline.map_segments([{
+        "start": 0.5, "end": 1.0, "words": [{"word": " a", "start": 0.5, "end": 1.0}, {"word": " b", "start": 1.0, "end": 1.5}]
+    }])
+    # A time on the boundary closes the first region and opens the second
+    assert segments[0]["start"] == pytest.approx(1.5)
+    assert segments[0]["end"] == pytest.approx(2.0)
+    assert segments[0]["words"][1]["start"] == pytest.approx(3.0)
+    turns = timeline.map_turns([{"start": 0.25, "end": 1.75, "speaker": "SPEAKER_00"}])
+    assert turns[0]["start"] == pytest.approx(1.25)
+    assert turns[0]["end"] == pytest.approx(3.75)
@@ -0,0 +1,64 @@
+# tests/test_socket_events.py
+
+import asyncio
+import numpy as np
+import pytest
+
+# Importing the handlers builds the (lazily loaded) model objects: needs the full backend environment
+socket_events = pytest.importorskip("app.routes.socket_events")
+from app.services.admission_controller import AdmissionRejected
+
+SID = "test-session"
+
+@pytest.fixture
+def session(monkeypatch):
+    emitted = []
+
+    async def emit(event, data=None, to=None):
+        emitted.append((event, data))
+
+    monkeypatch.setattr(socket_events.sio, "emit", emit)
+    socket_events.audio_buffers[SID] = socket_events.new_audio_buffer(SID)
+    socket_events.buffer_locks[SID] = asyncio.Lock()
+    yield emitted
+    buffer_info = socket_events.audio_buffers.pop(SID, None)
+    if buffer_info is not None:
+        buffer_info["audio"].close()
+        if "rejected_recording" in buffer_info:
+            buffer_info["rejected_recording"].close()
+    socket_events.buffer_locks.pop(SID, None)
+
+def test_rejected_recording_is_retried_with_audio_recorded_since(session, monkeypatch):
+    async def reject(audio_seconds):
+        raise AdmissionRejected(12.0)
+
+    processed = []
+
+    async def process(sid, recording):
+        processed.append(recording.read().copy())
+        recording.close()
+
+    async def scenario():
+        buffer_info = socket_events.audio_buffers[SID]
+        buffer_info["audio"].append(np.full(16000, 100, dtype=np.int16))
+        monkeypatch.setattr(socket_events.admission_controller, "admit", reject)
+        await socket_events.stop_recording(SID)
+
+        event, data = session[-1]
+        assert event == "processing_rejected"
+        assert data["retry_after"] == 12
+        assert len(buffer_info["rejected_recording"]) == 16000
+        assert len(buffer_info["audio"]) == 0
+
+        # Audio that arrives before the retry is processed with the rejected recording
+        buffer_info["audio"].append(np.full(8000, 200, dtype=np.int16))
+        monkeypatch.setattr(socket_events, "process_audio", process)
+        await socket_events.stop_recording(SID)
+
+        assert "rejected_recording" not in buffer_info
+        assert len(buffer_info["audio"]) == 0
+
+    asyncio.run(scenario())
+    assert len(processed) == 1
+    np.testing.assert_array_equal(processed[0][:16000], 100)
+    np.testing.assert_array_equal(processed[0][16000:], 200)
@@ -0,0 +1,40 @@
+# tests/test_text_utils.py
+
+import pytest
+from app.utils.text_utils import normalize_word, dedupe_overlap
+
+def test_normalize_word_ignores_case_and_punctuation():
+    assert normalize_word(" Hello,") == "hello"
+    assert normalize_word("don't.") == "don't"
+
+@pytest.mark.parametrize("previous, new, expected", [
+    # The tail of the previous window repeats at the start of the new one
+    (["the", "quick", "brown"], ["quick", "brown", "fox"], ["fox"]),
+    # Case, punctuation and Whisper's leading spaces do not hide a repeat
+    ([" Hello,", " world."], [" hello", " world", " again"], [" again"]),
+    # The longest repeated suffix wins
+    (["a", "b", "a", "b"], ["a", "b", "a", "b", "c"], ["c"]),
+    # A new window that is all overlap adds nothing
+    (["jumps", "over", "the"], ["over", "the"], []),
+    # No overlap
+    (["the", "quick"], ["lazy", "dog"], ["lazy", "dog"]),
+    # Nothing before or nothing new
+    ([], ["lazy", "dog"], ["lazy", "dog"]),
+    (["lazy", "dog"], [], []),
+])
+def test_dedupe_overlap(previous, new, expected):
+    assert dedupe_overlap(previous, new) == expected
+
+def test_single_repeated_word_is_not_overlap():
+    # "the ... the" is as likely to be spoken twice as to be overlap
+    assert dedupe_overlap(["over", "the"], ["the", "cat"]) == ["the", "cat"]
+    assert dedupe_overlap(["over", "the"], ["the", "cat"], min_match=1) == ["cat"]
+
+def test_fragments_cut_by_the_window_boundary_are_skipped():
+    assert dedupe_overlap(["jumps", "over", "the"], ["mps", "over", "the", "lazy"]) == ["lazy"]
+    assert dedupe_overlap(["jumps", "over", "the"], ["ju", "mps", "over", "the", "lazy"]) == ["lazy"]
+
+def test_no_more_than_max_skip_leading_words_are_skipped():
+    new = ["a", "b", "c", "over", "the", "lazy"]
+    assert dedupe_overlap(["jumps", "over", "the"], new) == new
+    assert dedupe_overlap(["jumps", "over", "the"], new, max_skip=3) == ["lazy"]
@@ -0,0 +1,124 @@
+# tests/test_transcript_assembler.py
+
+import numpy as np
+from app.services.transcript_assembler import assign_speakers, words_from_segments, TranscriptAssembler
+
+def word(text: str, start: float, end: float) -> dict:
+    return {"word": f" {text}", "start": start, "end": end}
+
+def turn(speaker: str, start: float, end: float) -> dict:
+    return {"speaker": speaker, "start": start, "end": end}
+
+WORDS = [
+    word("hello", 0.0, 0.4), word("there", 0.5, 0.9),
+    word("hi", 1.2, 1.5), word("back", 1.6, 2.0),
+    word("how", 2.3, 2.6), word("are", 2.7, 2.9), word("you", 3.0, 3.3),
+]
+TURNS = [turn("SPEAKER_00", 0.0, 1.0), turn("SPEAKER_01", 1.1, 2.1), turn("SPEAKER_00", 2.2, 3.4)]
+
+def brute_force(word_starts, word_ends, turn_starts, turn_ends, turn_speakers, num_speakers):
+    """Reference assignment: overlap with the union of each speaker's turns, nearest turn in gaps."""
+    assignment = []
+    for start, end in zip(word_starts, word_ends):
+        overlap = np.zeros(num_speakers)
+        for speaker in range(num_speakers):
+            # A speaker's overlapping turns count once: walk their union
+            covered_until = -np.inf
+            mask = turn_speakers == speaker
+            for turn_start, turn_end in sorted(zip(turn_starts[mask], turn_ends[mask])):
+                turn_start = max(turn_start, covered_until)
+                overlap[speaker] += max(0.0, min(end, turn_end) - max(start, turn_start))
+                covered_until = max(covered_until, turn_end)
+        if overlap.max() > 0:
+            assignment.append(overlap.argmax())
+            continue
+        midpoint = (start + end) / 2
+        distances = [max(turn_start - midpoint, midpoint - turn_end, 0.0)
+                     for turn_start, turn_end in zip(turn_starts, turn_ends)]
+        assignment.append(turn_speakers[int(np.argmin(distances))])
+    return np.array(assignment)
+
+def test_utterances_follow_speaker_turns():
+    assembler = TranscriptAssembler()
+    assembler.add_words(WORDS)
+    assembler.add_turns(TURNS)
+    assert assembler.utterances() == [
+        {"speaker": "SPEAKER_00", "start": 0.0, "end": 0.9, "text": "hello there"},
+        {"speaker": "SPEAKER_01", "start": 1.2, "end": 2.0, "text": "hi back"},
+        {"speaker": "SPEAKER_00", "start": 2.3, "end": 3.3, "text": "how are you"},
+    ]
+
+def test_overlapping_turns_give_each_word_to_the_speaker_overlapping_it_most():
+    assembler = TranscriptAssembler()
+    assembler.add_words([word("one", 0.0, 1.0), word("two", 1.0, 2.0)])
+    assembler.add_turns([turn("A", 0.0, 1.3), turn("B", 0.8, 2.0)])
+    assert [utterance["speaker"] for utterance in assembler.utterances()] == ["A", "B"]
+
+def test_long_silence_splits_one_speakers_utterance():
+    assembler = TranscriptAssembler(max_gap=1.0)
+    assembler.add_words([word("before", 0.0, 0.5), word("after", 2.0, 2.5)])
+    assembler.add_turns([turn("A", 0.0, 3.0)])
+    assert [utterance["text"] for utterance in assembler.utterances()] == ["before", "after"]
+
+def test_words_without_turns_are_unknown():
+    assembler = TranscriptAssembler()
+    assembler.add_words(WORDS[:2])
+    assert assembler.utterances() == [{"speaker": "UNKNOWN", "start": 0.0, "end": 0.9, "text": "hello there"}]
+
+def test_words_between_turns_go_to_the_nearest_turn():
+    assembler = TranscriptAssembler()
+    assembler.add_words([word("early", 1.0, 1.2), word("late", 3.6, 3.8)])
+    assembler.add_turns([turn("A", 0.0, 1.0), turn("B", 4.0, 5.0)])
+    assert [utterance["speaker"] for utterance in assembler.utterances()] == ["A", "B"]
+
+def test_incremental_appends_match_assembling_everything_at_once():
+    everything = TranscriptAssembler()
+    everything.add_words(WORDS)
+    everything.add_turns(TURNS)
+
+    incremental = TranscriptAssembler()
+    incremental.add_words(WORDS[:2])
+    incremental.add_turns(TURNS[:1])
+    assert incremental.utterances() == everything.utterances()[:1]
+    # Words land before the turn that covers them, then the rest of the turns
+    incremental.add_words(WORDS[2:5])
+    incremental.add_turns(TURNS[1:2])
+    incremental.utterances()
+    incremental.add_words(WORDS[5:])
+    incremental.add_turns(TURNS[2:])
+    assert incremental.utterances() == everything.utterances()
+
+def test_new_turn_reassigns_gap_words_that_are_now_nearer_to_it():
+    assembler = TranscriptAssembler()
+    assembler.add_words([word("hello", 0.0, 0.5), word("drift", 2.5, 2.8)])
+    assembler.add_turns([turn("A", 0.0, 1.0)])
+    assert [utterance["speaker"] for utterance in assembler.utterances()] == ["A", "A"]
+    assembler.add_turns([turn("B", 3.0, 4.0)])
+    assert [utterance["speaker"] for utterance in assembler.utterances()] == ["A", "B"]
+
+def test_utterances_since_returns_only_those_ending_after_it():
+    assembler = TranscriptAssembler()
+    assembler.add_words(WORDS)
+    assembler.add_turns(TURNS)
+    assert [utterance["text"] for utterance in assembler.utterances(since=2.0)] == ["hi back", "how are you"]
+
+def test_assign_speakers_matches_brute_force():
+    rng = np.random.default_rng(0)
+    word_starts = np.sort(rng.uniform(0, 60, 300))
+    word_ends = word_starts + rng.uniform(0.05, 0.6, 300)
+    turn_starts = np.sort(rng.uniform(0, 60, 40))
+    turn_ends = turn_starts + rng.uniform(0.2, 3.0, 40)
+    turn_speakers = rng.integers(0, 3, 40)
+    np.testing.assert_array_equal(
+        assign_speakers(word_starts, word_ends, turn_starts, turn_ends, turn_speakers, 3),
+        brute_force(word_starts, word_ends, turn_starts, turn_ends, turn_speakers, 3),
+    )
+    assert list(assign_speakers([0.0], [1.0], [], [], [], 0)) == [-1]
+
+def test_words_from_segments_falls_back_to_segment_text():
+    segments = [
+        {"text": " hello there", "start": 0.0, "end": 0.9, "words": WORDS[:2]},
+        {"text": " no words", "start": 1.0, "end": 1.5},
+        {"text": "  ", "start": 1.5, "end": 1.6, "words": []},
+    ]
+    assert words_from_segments(segments) == WORDS[:2] + [{"word": " no words", "start": 1.0, "end": 1.5}]
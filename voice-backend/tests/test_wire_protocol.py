@@ -0,0 +1,111 @@
+# tests/test_wire_protocol.py
+
+import numpy as np
+import pytest
+from app.services.wire_protocol import (
+    FRAME_HEADER, CODEC_IDS, PROTOCOL_VERSION, MULAW_TABLE, StreamFormat, Frame, FrameAssembler, decode_frame
+)
+
+def encode_frame(samples, seq: int = 0, sample_offset: int = 0, timestamp_ms: int = 0, codec: str = "pcm16",
+                 version: int = PROTOCOL_VERSION) -> bytes:
+    header = FRAME_HEADER.pack(version, CODEC_IDS[codec], 0, seq, sample_offset, timestamp_ms)
+    if codec == "mulaw":
+        return header + bytes(samples)
+    return header + np.asarray(samples, dtype="<i2").tobytes()
+
+def frames_of(audio: np.ndarray, size: int) -> list:
+    return [Frame(index, start, index * 20, audio[start:start + size])
+            for index, start in enumerate(range(0, len(audio), size))]
+
+def assemble(assembler: FrameAssembler, frames: list) -> np.ndarray:
+    chunks = [chunk for frame in frames for chunk in assembler.push(frame)] + assembler.flush()
+    return np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.int16)
+
+@pytest.fixture
+def audio():
+    return np.random.default_rng(0).integers(-32768, 32767, 3200, dtype=np.int16)
+
+def test_negotiate_rejects_unsupported_formats():
+    assert StreamFormat.negotiate({"sample_rate": 48000}).describe() == {
+        "version": PROTOCOL_VERSION, "codec": "pcm16", "sample_rate": 48000
+    }
+    for params in ({"sample_rate": 16000, "version": PROTOCOL_VERSION + 1}, {"sample_rate": 16000, "codec": "opus"},
+                   {"sample_rate": 16000, "channels": 2}, {"sample_rate": 100}, {}):
+        with pytest.raises(ValueError):
+            StreamFormat.negotiate(params)
+
+def test_decode_pcm16_frame():
+    samples = np.array([0, 1, -1, 32767, -32768], dtype=np.int16)
+    frame = decode_frame(encode_frame(samples, seq=7, sample_offset=320, timestamp_ms=40), StreamFormat(16000, "pcm16"))
+    assert (frame.seq, frame.sample_offset, frame.timestamp_ms) == (7, 320, 40)
+    assert frame.samples.dtype == np.int16
+    np.testing.assert_array_equal(frame.samples, samples)
+
+@pytest.mark.parametrize("data", [
+    b"\x01\x00",  # shorter than the header
+    encode_frame([0, 0], version=PROTOCOL_VERSION + 1),
+    encode_frame([0, 0], codec="mulaw"),
+    encode_frame([0]) + b"\x00",  # odd PCM16 payload
+])
+def test_decode_rejects_malformed_frames(data):
+    with pytest.raises(ValueError):
+        decode_frame(data, StreamFormat(16000, "pcm16"))
+
+def test_mulaw_table_matches_g711():
+    # Reference values from the G.711 decoding table
+    assert MULAW_TABLE[0xFF] == 0 and MULAW_TABLE[0x7F] == 0
+    assert MULAW_TABLE[0x00] == -32124 and MULAW_TABLE[0x80] == 32124
+    assert MULAW_TABLE[0xF0] == 120 and MULAW_TABLE[0x70] == -120
+    positive = MULAW_TABLE[0x80:]
+    assert np.all(np.diff(positive.astype(np.int32)) <= 0)
+    np.testing.assert_array_equal(MULAW_TABLE[:0x80], -MULAW_TABLE[0x80:])
+
+def test_decode_mulaw_frame():
+    codes = list(range(256))
+    frame = decode_frame(encode_frame(codes, codec="mulaw"), StreamFormat(8000, "mulaw"))
+    assert frame.samples.dtype == np.int16
+    np.testing.assert_array_equal(frame.samples, MULAW_TABLE)
+
+def test_in_order_frames_pass_straight_through(audio):
+    assembler = FrameAssembler()
+    np.testing.assert_array_equal(assemble(assembler, frames_of(audio, 320)), audio)
+    assert assembler.stats() == {"frames": 10, "duplicates": 0, "reordered": 0, "lost_frames": 0,
+                                 "gap_samples": 0, "pending": 0}
+
+def test_reordered_and_duplicated_frames_are_reassembled_by_offset(audio):
+    frames = frames_of(audio, 320)
+    arrival = [frames[0], frames[2], frames[1], frames[1], frames[4], frames[3]] + frames[5:] + [frames[9]]
+    assembler = FrameAssembler()
+    np.testing.assert_array_equal(assemble(assembler, arrival), audio)
+    stats = assembler.stats()
+    assert stats["reordered"] == 2
+    assert stats["duplicates"] == 2
+    assert stats["lost_frames"] == 0 and stats["gap_samples"] == 0
+
+def test_resent_frame_with_new_seq_is_trimmed_to_unseen_samples(audio):
+    # A resend that straddles the stream position under a new seq: only its new tail is kept
+    assembler = FrameAssembler()
+    first = assembler.push(Frame(0, 0, 0, audio[:320]))
+    resent = assembler.push(Frame(1, 160, 10, audio[160:640]))
+    np.testing.assert_array_equal(np.concatenate(first + resent), audio[:640])
+
+def test_missing_frame_becomes_silence_once_the_reorder_buffer_fills(audio):
+    frames = frames_of(audio, 320)
+    assembler = FrameAssembler(max_pending=2)
+    output = assemble(assembler, frames[:3] + frames[4:])
+    expected = audio.copy()
+    expected[960:1280] = 0
+    np.testing.assert_array_equal(output, expected)
+    stats = assembler.stats()
+    assert stats["lost_frames"] == 1
+    assert stats["gap_samples"] == 320
+    # The frame that finally turns up is behind the stream position and dropped
+    assert assembler.push(frames[3]) == []
+
+def test_flush_fills_gaps_and_counts_frames_that_never_arrived(audio):
+    frames = frames_of(audio, 320)
+    assembler = FrameAssembler()
+    output = assemble(assembler, [frames[0], frames[3]])
+    assert len(output) == 1280
+    np.testing.assert_array_equal(output[320:960], 0)
+    assert assembler.stats()["lost_frames"] == 2